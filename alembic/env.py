@@ -13,7 +13,8 @@ from app.models import *
 config = context.config
 
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # Keep loggers configured by a caller (e.g. app.db.startup) enabled
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # Use database URL from settings
 config.set_main_option("sqlalchemy.url", settings.database_url)
@@ -22,7 +23,11 @@ target_metadata = Base.metadata
 
 def run_migrations_offline():
     url = config.get_main_option("sqlalchemy.url")
-    context.configure(url=url, target_metadata=target_metadata, literal_binds=True)
+    # Named paramstyle so literal % in raw SQL (format('%I', ...)) is not doubled
+    context.configure(
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
     with context.begin_transaction():
         context.run_migrations()
 
@@ -0,0 +1,29 @@
+"""add user profile version
+
+Revision ID: 1d9e4b7a2c63
+Revises: f2d7a9c41e05
+Create Date: 2026-10-19 10:24:51.607138
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d9e4b7a2c63'
+down_revision: Union[str, Sequence[str], None] = 'f2d7a9c41e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant default: no table rewrite on Postgres 11+
+    op.add_column('users', sa.Column('profile_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'profile_version')
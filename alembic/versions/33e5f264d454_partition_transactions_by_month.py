@@ -0,0 +1,156 @@
+"""partition transactions by month and offload gateway payloads
+
+Revision ID: 33e5f264d454
+Revises: 041e416375ed
+Create Date: 2026-10-18 11:40:02.553871
+
+Rebuilds ``transactions`` as a table range-partitioned on ``created_at`` with
+one partition per month plus a default partition. Postgres requires the
+partition key in every unique constraint, so the primary key becomes
+``(id, created_at)`` and reference uniqueness is ``(reference, created_at)``;
+``reference`` keeps a plain index for lookups.
+
+``gateway_response`` moves to ``transaction_payloads``. Future partitions are
+created by ``ensure_transaction_partitions()``, which the Celery beat schedule
+calls daily.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '33e5f264d454'
+down_revision: Union[str, Sequence[str], None] = '041e416375ed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "id, user_id, reference, paystack_transaction_id, amount, currency, status, "
+    "plan_id, payment_channel, paid_at, created_at, updated_at"
+)
+
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION ensure_transaction_partitions(
+    months_ahead integer DEFAULT 3,
+    start_month date DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    month_start date := date_trunc('month', COALESCE(start_month, (now() AT TIME ZONE 'UTC')::date));
+    last_month date := date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead);
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := format('transactions_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_payloads',
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('gateway_response', sa.Text(), nullable=True),
+    sa.Column('raw_payload', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.execute(
+        "INSERT INTO transaction_payloads (transaction_id, gateway_response) "
+        "SELECT id, gateway_response FROM transactions WHERE gateway_response IS NOT NULL"
+    )
+
+    # Move the old table aside, freeing its index and constraint names
+    op.rename_table('transactions', 'transactions_legacy')
+    op.execute("ALTER TABLE transactions_legacy RENAME CONSTRAINT transactions_pkey TO transactions_legacy_pkey")
+    op.execute("ALTER TABLE transactions_legacy RENAME CONSTRAINT transactions_user_id_fkey TO transactions_legacy_user_id_fkey")
+    op.execute("ALTER INDEX ix_transactions_reference RENAME TO ix_transactions_legacy_reference")
+    op.execute("ALTER INDEX ix_transactions_user_id RENAME TO ix_transactions_legacy_user_id")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id UUID NOT NULL,
+            user_id UUID NOT NULL REFERENCES users (id),
+            reference VARCHAR(255) NOT NULL,
+            paystack_transaction_id VARCHAR(255),
+            amount NUMERIC(10, 2) NOT NULL,
+            currency VARCHAR(3),
+            status transactionstatus,
+            plan_id VARCHAR(50) NOT NULL,
+            payment_channel VARCHAR(50),
+            paid_at TIMESTAMP WITH TIME ZONE,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            updated_at TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT uq_transactions_reference_created_at UNIQUE (reference, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.create_index(op.f('ix_transactions_reference'), 'transactions', ['reference'], unique=False)
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    op.execute(
+        "SELECT ensure_transaction_partitions(3, "
+        "(SELECT min(created_at) AT TIME ZONE 'UTC' FROM transactions_legacy)::date)"
+    )
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    op.execute(
+        f"INSERT INTO transactions ({COLUMNS}) "
+        f"SELECT {COLUMNS.replace('created_at,', 'COALESCE(created_at, now()),')} FROM transactions_legacy"
+    )
+    op.drop_table('transactions_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('transactions', 'transactions_partitioned')
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.execute("ALTER INDEX ix_transactions_reference RENAME TO ix_transactions_partitioned_reference")
+    op.execute("ALTER INDEX ix_transactions_user_id RENAME TO ix_transactions_partitioned_user_id")
+
+    op.create_table('transactions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('reference', sa.String(length=255), nullable=False),
+    sa.Column('paystack_transaction_id', sa.String(length=255), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('status', postgresql.ENUM('PENDING', 'SUCCESS', 'FAILED', 'ABANDONED', name='transactionstatus', create_type=False), nullable=True),
+    sa.Column('plan_id', sa.String(length=50), nullable=False),
+    sa.Column('payment_channel', sa.String(length=50), nullable=True),
+    sa.Column('paid_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('gateway_response', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='transactions_user_id_fkey'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        f"INSERT INTO transactions ({COLUMNS}, gateway_response) "
+        f"SELECT {', '.join('t.' + c.strip() for c in COLUMNS.split(','))}, p.gateway_response "
+        "FROM transactions_partitioned t "
+        "LEFT JOIN transaction_payloads p ON p.transaction_id = t.id"
+    )
+    op.create_index(op.f('ix_transactions_reference'), 'transactions', ['reference'], unique=True)
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+
+    op.drop_table('transactions_partitioned')
+    op.execute("DROP FUNCTION IF EXISTS ensure_transaction_partitions(integer, date)")
+    op.drop_table('transaction_payloads')
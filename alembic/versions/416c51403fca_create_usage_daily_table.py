@@ -0,0 +1,36 @@
+"""create usage daily table
+
+Revision ID: 416c51403fca
+Revises: 63b4ad1a3086
+Create Date: 2026-10-18 23:46:34.965167
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '416c51403fca'
+down_revision: Union[str, Sequence[str], None] = '63b4ad1a3086'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('usage_daily',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('route', sa.String(length=128), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'route')
+    )
+    op.create_index('ix_usage_daily_day', 'usage_daily', ['day'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_usage_daily_day', table_name='usage_daily')
+    op.drop_table('usage_daily')
@@ -0,0 +1,84 @@
+"""create subscription history tables
+
+Revision ID: 5f3b99a66975
+Revises: 416c51403fca
+Create Date: 2026-10-19 00:12:41.508230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3b99a66975'
+down_revision: Union[str, Sequence[str], None] = '416c51403fca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('subscription_events',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('from_tier', sa.String(length=16), nullable=True),
+    sa.Column('to_tier', sa.String(length=16), nullable=False),
+    sa.Column('start_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('end_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('mrr_delta', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_subscription_events_occurred_at', 'subscription_events', ['occurred_at'], unique=False)
+    op.create_index('ix_subscription_events_user_id_occurred_at', 'subscription_events', ['user_id', 'occurred_at'], unique=False)
+
+    op.create_table('subscription_snapshots',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('tier', sa.String(length=16), nullable=False),
+    sa.Column('active_users', sa.Integer(), nullable=False),
+    sa.Column('mrr', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('new', sa.Integer(), nullable=False),
+    sa.Column('churned', sa.Integer(), nullable=False),
+    sa.Column('upgraded_in', sa.Integer(), nullable=False),
+    sa.Column('upgraded_out', sa.Integer(), nullable=False),
+    sa.Column('downgraded_in', sa.Integer(), nullable=False),
+    sa.Column('downgraded_out', sa.Integer(), nullable=False),
+    sa.Column('renewals', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'tier')
+    )
+
+    op.create_table('subscription_cohort_snapshots',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('cohort', sa.Date(), nullable=False),
+    sa.Column('cohort_size', sa.Integer(), nullable=False),
+    sa.Column('active_users', sa.Integer(), nullable=False),
+    sa.Column('mrr', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'cohort')
+    )
+
+    # Seed one event per current paid subscriber so cohorts include them
+    op.execute("""
+        INSERT INTO subscription_events
+            (id, user_id, kind, source, from_tier, to_tier, start_date, end_date, mrr_delta, occurred_at)
+        SELECT gen_random_uuid(), id, 'new', 'backfill', 'free', lower(subscription_tier::text),
+               subscription_start_date, subscription_end_date,
+               CASE subscription_tier
+                   WHEN 'BASIC' THEN 5000 WHEN 'PRO' THEN 15000 WHEN 'ENTERPRISE' THEN 50000 ELSE 0
+               END,
+               coalesce(subscription_start_date, created_at, now())
+        FROM users
+        WHERE subscription_tier <> 'FREE'
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('subscription_cohort_snapshots')
+    op.drop_table('subscription_snapshots')
+    op.drop_index('ix_subscription_events_user_id_occurred_at', table_name='subscription_events')
+    op.drop_index('ix_subscription_events_occurred_at', table_name='subscription_events')
+    op.drop_table('subscription_events')
@@ -0,0 +1,29 @@
+"""add transaction authorization url
+
+Revision ID: 7a2c4e91b3d8
+Revises: 5f3b99a66975
+Create Date: 2026-10-19 00:41:17.203554
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2c4e91b3d8'
+down_revision: Union[str, Sequence[str], None] = '5f3b99a66975'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable with no default: a catalog-only change, partitions included
+    op.add_column('transactions', sa.Column('authorization_url', sa.String(length=512), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transactions', 'authorization_url')
@@ -0,0 +1,112 @@
+"""add hot query indexes
+
+Revision ID: 9b184532f581
+Revises: 33e5f264d454
+Create Date: 2026-10-18 14:05:51.902417
+
+Indexes are built without blocking writes. ``transactions`` is partitioned and
+Postgres cannot build an index concurrently on a partitioned table, so each
+index is declared ON ONLY the parent, built concurrently on every partition
+and then attached; new partitions inherit it automatically.
+
+Offline (``alembic upgrade --sql``) the partitions are not known when the
+script is written, so a DO block finds them at run time. Its CREATE INDEX
+cannot be CONCURRENTLY inside that block and takes write locks on each
+partition.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b184532f581'
+down_revision: Union[str, Sequence[str], None] = '33e5f264d454'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRANSACTION_INDEXES = {
+    'ix_transactions_user_id_created_at': 'user_id, created_at DESC',
+    'ix_transactions_status_created_at': 'status, created_at',
+    'ix_transactions_plan_id_created_at': 'plan_id, created_at',
+    'ix_transactions_created_at': 'created_at',
+}
+
+
+PARTITIONS_QUERY = (
+    "SELECT c.relname FROM pg_inherits i "
+    "JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = 'transactions'::regclass"
+)
+
+
+def _transaction_partitions(conn):
+    return conn.execute(sa.text(PARTITIONS_QUERY)).scalars().all()
+
+
+def _partition_indexes_offline():
+    """Build and attach the partition indexes from SQL, for ``--sql`` scripts"""
+    statements = []
+    for name, columns in TRANSACTION_INDEXES.items():
+        suffix = name[len('ix_transactions_'):]
+        statements.append(
+            f"EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I ({columns})', part || '_{suffix}', part);\n"
+            f"        EXECUTE format('ALTER INDEX {name} ATTACH PARTITION %I', part || '_{suffix}');"
+        )
+    body = "\n        ".join(statements)
+    op.execute(
+        "DO $$\n"
+        "DECLARE part text;\n"
+        "BEGIN\n"
+        f"    FOR part IN {PARTITIONS_QUERY} LOOP\n"
+        f"        {body}\n"
+        "    END LOOP;\n"
+        "END $$"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    offline = context.is_offline_mode()
+    partitions = [] if offline else _transaction_partitions(op.get_bind())
+
+    for name, columns in TRANSACTION_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY transactions ({columns})")
+    if offline:
+        _partition_indexes_offline()
+
+    with op.get_context().autocommit_block():
+        for name, columns in TRANSACTION_INDEXES.items():
+            for partition in partitions:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_{name[len('ix_transactions_'):]} "
+                    f"ON {partition} ({columns})"
+                )
+
+        op.create_index(
+            'ix_users_expiry', 'users', ['subscription_end_date'], unique=False,
+            postgresql_where=sa.text("subscription_tier <> 'FREE' AND auto_renew = false"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_users_paid_subscription_end', 'users', ['subscription_end_date'], unique=False,
+            postgresql_where=sa.text("subscription_tier <> 'FREE'"),
+            postgresql_concurrently=True,
+        )
+
+    for name in TRANSACTION_INDEXES:
+        for partition in partitions:
+            op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition}_{name[len('ix_transactions_'):]}")
+
+    # (user_id, created_at) makes the single-column user_id index redundant
+    op.drop_index('ix_transactions_user_id', table_name='transactions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+    op.drop_index('ix_users_paid_subscription_end', table_name='users')
+    op.drop_index('ix_users_expiry', table_name='users')
+    for name in TRANSACTION_INDEXES:
+        op.drop_index(name, table_name='transactions')
@@ -0,0 +1,43 @@
+"""create transaction references
+
+Revision ID: b8e1f0c2d4a6
+Revises: 7a2c4e91b3d8
+Create Date: 2026-10-19 09:02:44.118305
+
+Partitioning made ``transactions.reference`` unique only together with
+``created_at``. This unpartitioned table restores global uniqueness and is
+what lookups by reference join through. Existing duplicates keep their
+oldest row.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e1f0c2d4a6'
+down_revision: Union[str, Sequence[str], None] = '7a2c4e91b3d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_references',
+    sa.Column('reference', sa.String(length=255), nullable=False),
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('reference')
+    )
+    op.execute("""
+        INSERT INTO transaction_references (reference, transaction_id, created_at)
+        SELECT DISTINCT ON (reference) reference, id, created_at
+        FROM transactions
+        ORDER BY reference, created_at, id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('transaction_references')
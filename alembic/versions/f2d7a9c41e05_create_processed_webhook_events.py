@@ -0,0 +1,33 @@
+"""create processed webhook events
+
+Revision ID: f2d7a9c41e05
+Revises: b8e1f0c2d4a6
+Create Date: 2026-10-19 09:41:05.372915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2d7a9c41e05'
+down_revision: Union[str, Sequence[str], None] = 'b8e1f0c2d4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('processed_webhook_events',
+    sa.Column('event', sa.String(length=64), nullable=False),
+    sa.Column('event_key', sa.String(length=255), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('event', 'event_key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('processed_webhook_events')
@@ -1,15 +1,24 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+import re
+from typing import Callable, Generator, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from jose import JWTError
+from app.core.config import settings
+from app.core.plans import get_daily_quota
 from app.db.session import SessionLocal
 from app.core.security import decode_token
 from app.models.user import User
 from app.schemas.user import TokenPayload
+from app.services.auth import AuthService
+from app.services.idempotency import (
+    DONE, MAX_KEY_LENGTH, IdempotentReplay, fingerprint, idempotency_store
+)
+from app.services.usage import seconds_until_reset, usage_meter
 
 security = HTTPBearer()
 
+_ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")')
+
 def get_db() -> Generator:
     db = SessionLocal()
     try:
@@ -17,7 +26,36 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether If-None-Match matches ``etag``.
+
+    The header may list several tags or be ``*``; tags are compared weakly
+    (``W/"a"`` matches ``"a"``), as If-None-Match requires.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = _ENTITY_TAG.match(etag)
+    return opaque is not None and opaque.group(1) in _ENTITY_TAG.findall(header)
+
+def enforce_usage_quota(request: Request, user: User):
+    """Reject the call if the user's plan quota for today is used up, else meter it"""
+    if not settings.usage_metering_enabled:
+        return
+    quota = None if user.is_superuser else get_daily_quota(user.subscription_tier)
+    if quota is not None and usage_meter.used_today(user.id) >= quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Daily API quota of {quota} calls exceeded",
+            headers={"Retry-After": str(seconds_until_reset())},
+        )
+    # Counted by UsageMeterMiddleware once the response is sent
+    request.state.usage_user_id = user.id
+
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
@@ -29,26 +67,30 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = decode_token(token)
-        if payload is None:
-            raise credentials_exception
-        
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        
-        token_data = TokenPayload(sub=user_id)
-    except JWTError:
+    # decode_token returns None for any invalid or expired token
+    payload = decode_token(token)
+    if payload is None:
+        raise credentials_exception
+    
+    user_id: str = payload.get("sub")
+    if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    token_data = TokenPayload(sub=user_id)
+    
+    if "ver" in payload:
+        # Claims token: trusted without a users lookup unless revoked or stale
+        user = AuthService.user_from_claims(db, payload)
+    else:
+        user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
+    # For the access log
+    request.state.user_id = user.id
     return user
 
 def get_current_active_user(
@@ -65,3 +107,45 @@ def get_current_admin(
             detail="Admin access required"
         )
     return current_user
+
+def metered(user_dependency: Callable[..., User] = get_current_active_user) -> Callable[..., User]:
+    """Router dependency for routes that serve a plan's API access.
+
+    Counts the call against the caller's daily quota and answers 429 once it
+    is used up. Billing, auth and the caller's own profile are not metered, so
+    a user at their quota can still check and upgrade their plan.
+    """
+    def metered_user(request: Request, user: User = Depends(user_dependency)) -> User:
+        enforce_usage_quota(request, user)
+        return user
+    return metered_user
+
+async def idempotency_key(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Honour an ``Idempotency-Key`` header; see ``app.services.idempotency``"""
+    key = request.headers.get("idempotency-key")
+    if key is None:
+        return
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    store_key = f"{current_user.id}:{key}"
+    request_fingerprint = fingerprint(
+        request.method, request.url.path, request.url.query, await request.body()
+    )
+    record = await idempotency_store.claim_or_wait(store_key, request_fingerprint)
+    if record is None:
+        # Stored by IdempotencyMiddleware once the response is sent
+        request.state.idempotency = (store_key, request_fingerprint)
+        return
+    if record["fingerprint"] != request_fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if record["state"] == DONE:
+        raise IdempotentReplay(record)
+    raise HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": "1"}
+    )
@@ -0,0 +1,145 @@
+import logging
+import re
+import time
+import uuid
+from app.core.logs import request_id_var
+from app.services.idempotency import IdempotencyStore, idempotency_store
+from app.services.usage import UsageMeter, usage_meter
+
+class UsageMeterMiddleware:
+    """Counts calls to metered routes, per user and route template.
+
+    The ``metered()`` dependency marks the request by setting
+    ``usage_user_id`` on its state once the caller is authenticated and
+    within quota; anything else (unmetered routes, rejected, 429) is not
+    counted, nor are 304 replies to conditional polls. Plain ASGI rather than
+    ``BaseHTTPMiddleware`` so the response is streamed through untouched.
+    """
+
+    def __init__(self, app, meter: UsageMeter = usage_meter):
+        self.app = app
+        self.meter = meter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": None}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_with_status)
+
+        user_id = scope.get("state", {}).get("usage_user_id")
+        if user_id is not None and status["code"] != 304:
+            route = scope.get("route")
+            self.meter.record(user_id, f"{scope['method']} {getattr(route, 'path', scope['path'])}")
+
+class IdempotencyMiddleware:
+    """Stores the response of a request that claimed an Idempotency-Key.
+
+    The ``idempotency_key`` dependency sets ``idempotency`` on the request
+    state when it claims a key. The response is passed through as it is sent
+    and saved once complete; a 5xx, or an error before the response finished,
+    releases the key instead so the client can retry.
+    """
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PATCH", "PUT", "DELETE"):
+            await self.app(scope, receive, send)
+            return
+
+        response = {"status": None, "headers": [], "body": bytearray(), "complete": False}
+
+        async def capture(message):
+            if scope.get("state", {}).get("idempotency") is not None:
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                    response["headers"] = [
+                        (name.decode("latin-1"), value.decode("latin-1"))
+                        for name, value in message.get("headers", [])
+                    ]
+                elif message["type"] == "http.response.body":
+                    response["body"] += message.get("body", b"")
+                    response["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            claim = scope.get("state", {}).get("idempotency")
+            if claim is not None:
+                key, request_fingerprint = claim
+                if response["complete"] and response["status"] < 500:
+                    self.store.complete(key, request_fingerprint, response["status"],
+                                        response["headers"], bytes(response["body"]))
+                else:
+                    self.store.release(key)
+
+access_logger = logging.getLogger("app.access")
+
+# Accepted from clients as is; anything else gets a fresh id
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+class RequestContextMiddleware:
+    """Gives each request an id and writes one access log line for it.
+
+    The id comes from the ``X-Request-ID`` header when it looks sane, is set
+    in ``request_id_var`` for every record logged while handling the
+    request (thread-pool endpoints included), and is echoed back in the
+    response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        status = {"code": 500}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            route = scope.get("route")
+            user_id = scope.get("state", {}).get("user_id")
+            access_logger.info(
+                "%s %s %d", scope["method"], scope["path"], status["code"],
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status["code"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "user_id": str(user_id) if user_id else None,
+                }
+            )
+            request_id_var.reset(token)
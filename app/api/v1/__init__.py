@@ -1,5 +1,6 @@
-from fastapi import APIRouter
-from app.api.v1 import auth, users, subscriptions, webhooks, admin
+from fastapi import APIRouter, Depends
+from app.api.deps import get_current_admin, metered
+from app.api.v1 import access, auth, users, subscriptions, webhooks, admin
 
 api_router = APIRouter()
 
@@ -7,4 +8,14 @@ api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(subscriptions.router, prefix="/subscriptions", tags=["subscriptions"])
 api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
-api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
+# Routers serving plan "API access" are included with a metered() dependency;
+# auth, profile, billing and webhooks are not, so a user at quota can upgrade
+api_router.include_router(
+    access.router, prefix="/access", tags=["api access"],
+    dependencies=[Depends(metered())]
+)
+# Admins have no quota; their calls are counted for the usage report
+api_router.include_router(
+    admin.router, prefix="/admin", tags=["admin"],
+    dependencies=[Depends(metered(get_current_admin))]
+)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from app.api.deps import get_current_active_user
+from app.core.plans import get_daily_quota
+from app.models.user import User
+from app.services.usage import seconds_until_reset, usage_meter
+
+# Plan "API access": every route here is counted against the caller's daily
+# quota (the router is included with metered()). New API-access routes belong
+# on this router; billing, auth and profile routes stay unmetered.
+router = APIRouter()
+
+@router.get("/account")
+def read_account(current_user: User = Depends(get_current_active_user)):
+    """The caller's plan and today's quota, as seen by the metered API"""
+    tier = current_user.subscription_tier
+    quota = None if current_user.is_superuser else get_daily_quota(tier)
+    # This call is counted once its response is sent
+    used_today = usage_meter.used_today(current_user.id) + 1
+    return {
+        "user_id": str(current_user.id),
+        "subscription_tier": tier.value if hasattr(tier, "value") else tier,
+        "daily_quota": quota,
+        "used_today": used_today,
+        "remaining_today": max(quota - used_today, 0) if quota is not None else None,
+        "resets_in_seconds": seconds_until_reset(),
+    }
@@ -1,11 +1,23 @@
+import io
+import tempfile
 from typing import Optional
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
-from app.api.deps import get_current_admin, get_db
+from app.api.deps import get_current_admin, get_db, idempotency_key
+from app.core.config import settings
 from app.models.user import User, SubscriptionTier
 from app.models.transaction import Transaction, TransactionStatus
+from app.services.audit import AuditService, audit_log
+from app.services.subscription_analytics import SubscriptionAnalytics
+from app.services.subscription_history import ADMIN, set_event_source
+from app.services.transaction_history import TransactionHistoryService
+from app.services.transactions import TransactionLookup
+from app.services.usage import UsageService, usage_meter, utc_today
+from app.services.user_import import FORMATS, UserImporter, format_for, read_records
+from app.tasks.scheduler import schedule_subscription_deadlines
 
 router = APIRouter()
 
@@ -125,9 +137,58 @@ def list_users(
         ]
     }
 
+@router.post("/users/import")
+async def import_users(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson; default from Content-Type"),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Bulk create users from a CSV or NDJSON request body.
+
+    The body is spooled to a temporary file and imported in batches; rows that
+    fail validation or hit an existing email are reported, not fatal.
+    """
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    fmt = format or format_for("", request.headers.get("content-type"))
+    
+    limit = settings.user_import_max_body_bytes
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Import body too large")
+    
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=413, detail="Import body too large")
+            spool.write(chunk)
+        spool.seek(0)
+        ip_address = request.client.host if request.client else None
+        return await run_in_threadpool(_run_import, spool, fmt, current_admin, ip_address)
+    finally:
+        spool.close()
+
+def _run_import(spool, fmt: str, current_admin: User, ip_address: Optional[str]) -> dict:
+    lines = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    report = UserImporter().run(read_records(lines, fmt)).to_dict()
+    lines.detach()
+    
+    audit_log.record(
+        "user.import", "user",
+        actor=current_admin,
+        changes={key: report[key] for key in ("total", "created", "duplicates", "failed")},
+        ip_address=ip_address
+    )
+    return report
+
 @router.get("/users/{user_id}")
 def get_user_details(
     user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -137,10 +198,11 @@ def get_user_details(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get user's transactions
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == user_id
-    ).order_by(Transaction.created_at.desc()).all()
+    # One page of the user's transactions, plus totals over all of them
+    try:
+        transactions, next_cursor = TransactionHistoryService.page(db, user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "user": {
@@ -159,26 +221,16 @@ def get_user_details(
             "updated_at": user.updated_at.isoformat() if user.updated_at else None,
             "last_login": user.last_login.isoformat() if user.last_login else None
         },
-        "transactions": [
-            {
-                "id": str(t.id),
-                "reference": t.reference,
-                "amount": float(t.amount),
-                "currency": t.currency,
-                "status": t.status.value if hasattr(t.status, 'value') else t.status,
-                "plan_id": t.plan_id,
-                "payment_channel": t.payment_channel,
-                "paid_at": t.paid_at.isoformat() if t.paid_at else None,
-                "created_at": t.created_at.isoformat() if t.created_at else None
-            }
-            for t in transactions
-        ]
+        "summary": TransactionHistoryService.summary(db, user.id),
+        "transactions": [TransactionHistoryService.serialize(t) for t in transactions],
+        "next_cursor": next_cursor
     }
 
-@router.patch("/users/{user_id}/subscription")
+@router.patch("/users/{user_id}/subscription", dependencies=[Depends(idempotency_key)])
 def update_user_subscription(
     user_id: str,
     subscription_tier: SubscriptionTier,
+    request: Request,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -189,6 +241,7 @@ def update_user_subscription(
         raise HTTPException(status_code=404, detail="User not found")
     
     old_tier = user.subscription_tier
+    set_event_source(db, ADMIN)
     user.subscription_tier = subscription_tier
     
     # Update dates if upgrading from free
@@ -201,18 +254,29 @@ def update_user_subscription(
         user.subscription_end_date = None
     
     db.commit()
+    schedule_subscription_deadlines(user)
+    
+    old_tier = old_tier.value if hasattr(old_tier, 'value') else old_tier
+    new_tier = subscription_tier.value if hasattr(subscription_tier, 'value') else subscription_tier
+    audit_log.record(
+        "user.subscription.update", "user", user.id,
+        actor=current_admin,
+        changes={"subscription_tier": [old_tier, new_tier]},
+        ip_address=request.client.host if request.client else None
+    )
     
     return {
         "message": "Subscription updated",
         "user_id": str(user.id),
         "email": user.email,
-        "old_tier": old_tier.value if hasattr(old_tier, 'value') else old_tier,
-        "new_tier": subscription_tier.value if hasattr(subscription_tier, 'value') else subscription_tier
+        "old_tier": old_tier,
+        "new_tier": new_tier
     }
 
-@router.post("/users/{user_id}/verify")
+@router.post("/users/{user_id}/verify", dependencies=[Depends(idempotency_key)])
 def verify_user(
     user_id: str,
+    request: Request,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -222,15 +286,118 @@ def verify_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    was_verified = user.is_verified
     user.is_verified = True
     db.commit()
     
+    audit_log.record(
+        "user.verify", "user", user.id,
+        actor=current_admin,
+        changes={"is_verified": [was_verified, True]},
+        ip_address=request.client.host if request.client else None
+    )
+    
     return {
         "message": "User verified",
         "user_id": str(user.id),
         "email": user.email
     }
 
+@router.get("/audit-logs")
+def list_audit_logs(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    actor_id: Optional[str] = None,
+    action: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Admin actions, newest first, with optional filters"""
+    
+    # Include actions still waiting in this process's buffer
+    audit_log.flush()
+    
+    try:
+        logs, next_cursor = AuditService.page(
+            db, limit, cursor,
+            actor_id=actor_id, action=action, target_type=target_type, target_id=target_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "limit": limit,
+        "audit_logs": [AuditService.serialize(log) for log in logs],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/usage")
+def get_usage_report(
+    day: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Heaviest API users for a UTC day (default today)"""
+    
+    usage_meter.flush()
+    day = day or utc_today()
+    
+    return {
+        "date": day.isoformat(),
+        "users": UsageService.top_users(db, day, limit)
+    }
+
+@router.get("/users/{user_id}/usage")
+def get_user_usage(
+    user_id: str,
+    days: int = Query(7, ge=1, le=90),
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """A user's API calls per day and route"""
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    usage_meter.flush()
+    
+    return {
+        "user_id": str(user.id),
+        "email": user.email,
+        "days": UsageService.daily(db, user.id, days)
+    }
+
+@router.get("/analytics/subscriptions")
+def get_subscription_analytics(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Daily MRR, paying users, churn and net movement per tier (default: last 30 days)"""
+    
+    end_date = end_date or utc_today() - timedelta(days=1)
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    if (end_date - start_date).days > 731:
+        raise HTTPException(status_code=400, detail="Date range is limited to two years")
+    
+    return SubscriptionAnalytics.overview(db, start_date, end_date)
+
+@router.get("/analytics/cohorts")
+def get_cohort_analytics(
+    months: int = Query(12, ge=1, le=36),
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Retention and MRR by month of first paid plan"""
+    return SubscriptionAnalytics.cohorts(db, months)
+
 @router.get("/transactions")
 def list_transactions(
     skip: int = 0,
@@ -277,6 +444,36 @@ def list_transactions(
         ]
     }
 
+@router.get("/transactions/{reference}")
+def get_transaction_details(
+    reference: str,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Get a single transaction including its raw gateway payload"""
+    
+    transaction = TransactionLookup.by_reference(db, reference, joinedload(Transaction.payload))
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    payload = transaction.payload
+    return {
+        "id": str(transaction.id),
+        "user_id": str(transaction.user_id),
+        "reference": transaction.reference,
+        "paystack_transaction_id": transaction.paystack_transaction_id,
+        "amount": float(transaction.amount),
+        "currency": transaction.currency,
+        "status": transaction.status.value if hasattr(transaction.status, 'value') else transaction.status,
+        "plan_id": transaction.plan_id,
+        "payment_channel": transaction.payment_channel,
+        "paid_at": transaction.paid_at.isoformat() if transaction.paid_at else None,
+        "created_at": transaction.created_at.isoformat() if transaction.created_at else None,
+        "updated_at": transaction.updated_at.isoformat() if transaction.updated_at else None,
+        "gateway_response": payload.gateway_response if payload else None,
+        "raw_payload": payload.raw_payload if payload else None
+    }
+
 @router.get("/revenue")
 def get_revenue_report(
     start_date: Optional[datetime] = None,
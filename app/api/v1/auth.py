@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.api.deps import get_db
-from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
+from app.api.deps import get_current_user, get_db
+from app.models.user import User
+from app.schemas.user import UserCreate, UserLogin, UserResponse, Token, RefreshRequest
 from app.services.auth import AuthService
 
 router = APIRouter()
@@ -29,4 +30,30 @@ def login(user_in: UserLogin, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return {"access_token": result["access_token"], "token_type": "bearer"}
\ No newline at end of file
+    return {
+        "access_token": result["access_token"],
+        "token_type": "bearer",
+        "refresh_token": result.get("refresh_token"),
+        "expires_in": result.get("expires_in")
+    }
+
+@router.post("/refresh", response_model=Token)
+def refresh(body: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new token pair (claims tokens only).
+
+    Each refresh token works once; reusing one revokes every session.
+    """
+    result = AuthService.refresh_tokens(db, body.refresh_token)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or revoked refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return result
+
+@router.post("/logout-all")
+def logout_all(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Revoke every claims and refresh token issued to the current user"""
+    AuthService.revoke_tokens(db, current_user)
+    return {"message": "All sessions revoked"}
\ No newline at end of file
@@ -1,12 +1,23 @@
 import uuid
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from app.api.deps import get_current_active_user, get_db
+from app.api.deps import get_current_active_user, get_db, idempotency_key, not_modified
+from app.core.cache import TTLCache
+from app.core.circuit_breaker import DependencyUnavailable
+from app.core.config import settings
 from app.core.plans import get_all_plans, get_plan
+from app.core.singleflight import SingleFlight
 from app.services.paystack import PaystackService
+from app.services.principal_cache import principal_cache
+from app.services.subscription import SubscriptionService
+from app.services.subscription_history import TEST, USER, VERIFY, set_event_source
+from app.services.transaction_history import TransactionHistoryService
+from app.services.transactions import TransactionLookup
 from app.models.user import User
 from app.models.transaction import Transaction, TransactionStatus
+from app.tasks.scheduler import schedule_subscription_deadlines
 
 router = APIRouter()
 
@@ -21,7 +32,19 @@ SUBSCRIPTION_PERIOD_DAYS = {
 def list_plans():
     return get_all_plans()
 
-@router.post("/subscribe/{plan_id}")
+def _checkout_response(reference: str, authorization_url: str, plan_id: str, plan: dict,
+                       end_date: datetime) -> dict:
+    return {
+        "message": "Payment initialized. Complete payment at the URL below.",
+        "authorization_url": authorization_url,
+        "reference": reference,
+        "plan": plan_id,
+        "amount": plan["price"],
+        "period_days": SUBSCRIPTION_PERIOD_DAYS.get(plan_id, 30),
+        "valid_until": end_date.isoformat()
+    }
+
+@router.post("/subscribe/{plan_id}", dependencies=[Depends(idempotency_key)])
 def subscribe_to_plan(
     plan_id: str, 
     current_user: User = Depends(get_current_active_user), 
@@ -33,10 +56,12 @@ def subscribe_to_plan(
         raise HTTPException(status_code=404, detail="Plan not found")
     
     if plan_id == "free":
+        set_event_source(db, USER)
         current_user.subscription_tier = plan_id
         current_user.subscription_start_date = None
         current_user.subscription_end_date = None
         db.commit()
+        schedule_subscription_deadlines(current_user)
         return {"message": "Subscribed to Free plan", "plan": plan}
     
     # Calculate subscription dates
@@ -44,6 +69,22 @@ def subscribe_to_plan(
     period_days = SUBSCRIPTION_PERIOD_DAYS.get(plan_id, 30)
     end_date = start_date + timedelta(days=period_days)
     
+    # A repeat (double click, retry) reuses the user's recent pending checkout
+    # for this plan instead of creating another transaction
+    pending = db.query(Transaction).filter(
+        Transaction.user_id == current_user.id,
+        Transaction.plan_id == plan_id,
+        Transaction.status == TransactionStatus.PENDING,
+        Transaction.authorization_url.isnot(None),
+        Transaction.amount == plan["price"],
+        Transaction.created_at >= start_date - timedelta(minutes=settings.subscribe_reuse_pending_minutes)
+    ).order_by(Transaction.created_at.desc()).first()
+    if pending is not None:
+        return _checkout_response(pending.reference, pending.authorization_url, plan_id, plan, end_date)
+    
+    # Fail fast while Paystack's circuit is open, before creating a transaction
+    PaystackService.ensure_available()
+
     # Initialize Paystack payment
     amount_kobo = plan["price"] * 100
     reference = f"sub_{current_user.id}_{uuid.uuid4().hex[:8]}"
@@ -60,75 +101,87 @@ def subscribe_to_plan(
     db.add(transaction)
     db.commit()
     
-    result = PaystackService.initialize_transaction(
-        email=current_user.email,
-        amount=amount_kobo,
-        reference=reference,
-        callback_url=f"http://localhost:8000/api/v1/subscriptions/verify?reference={reference}",
-        metadata={
-            "user_id": str(current_user.id), 
-            "plan_id": plan_id,
-            "reference": reference,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat()
-        }
-    )
+    try:
+        result = PaystackService.initialize_transaction(
+            email=current_user.email,
+            amount=amount_kobo,
+            reference=reference,
+            callback_url=f"http://localhost:8000/api/v1/subscriptions/verify?reference={reference}",
+            metadata={
+                "user_id": str(current_user.id), 
+                "plan_id": plan_id,
+                "reference": reference,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat()
+            }
+        )
+    except DependencyUnavailable as e:
+        # Refused before sending: Paystack never saw this reference. A request
+        # that failed in flight stays PENDING for reconciliation to settle
+        if e.__cause__ is None:
+            transaction.status = TransactionStatus.FAILED
+            transaction.gateway_response = str(e)
+            db.commit()
+        raise
     
     if result.get("status"):
-        return {
-            "message": "Payment initialized. Complete payment at the URL below.",
-            "authorization_url": result["data"]["authorization_url"],
-            "reference": reference,
-            "plan": plan_id,
-            "amount": plan["price"],
-            "period_days": period_days,
-            "valid_until": end_date.isoformat()
-        }
+        transaction.authorization_url = result["data"]["authorization_url"]
+        db.commit()
+        return _checkout_response(reference, transaction.authorization_url, plan_id, plan, end_date)
     else:
         transaction.status = TransactionStatus.FAILED
         transaction.gateway_response = result.get("message")
         db.commit()
         raise HTTPException(status_code=400, detail=f"Payment initialization failed: {result.get('message')}")
 
-@router.get("/verify")
-def verify_payment(reference: str, db: Session = Depends(get_db)):
-    """Verify payment and activate subscription"""
+# Responses for settled references; callback-page refreshes are answered from here
+_settled_responses = TTLCache(maxsize=10000, ttl=600)
+_verify_flight = SingleFlight()
+
+FINAL_STATUSES = (TransactionStatus.SUCCESS, TransactionStatus.FAILED, TransactionStatus.ABANDONED)
+SETTLED_RESPONSE_STATUSES = ("active", "failed", "reversed", "abandoned")
+
+def _settled_response(transaction: Transaction, db: Session) -> dict:
+    """Answer for a transaction that is already settled, without Paystack"""
+    if transaction.status != TransactionStatus.SUCCESS:
+        return {"message": "Payment not successful", "status": transaction.status.value}
+    
+    user = db.query(User).filter(User.id == transaction.user_id).first()
+    valid_from = user.subscription_start_date if user else None
+    valid_until = user.subscription_end_date if user else None
+    return {
+        "message": "Payment successful! Subscription activated.",
+        "plan": transaction.plan_id,
+        "valid_from": valid_from.isoformat() if valid_from else None,
+        "valid_until": valid_until.isoformat() if valid_until else None,
+        "status": "active"
+    }
+
+def _verify_with_paystack(reference: str, db: Session) -> dict:
     result = PaystackService.verify_transaction(reference)
     
     if not result.get("status"):
         raise HTTPException(status_code=400, detail="Verification failed")
     
     data = result["data"]
-    transaction = db.query(Transaction).filter(Transaction.reference == reference).first()
+    transaction = TransactionLookup.by_reference(db, reference)
     
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    # Transaction and user changes go out in a single commit
+    set_event_source(db, VERIFY)
+    user = SubscriptionService.apply_verification(db, transaction, data)
+    db.commit()
+    
     if data["status"] != "success":
-        transaction.status = TransactionStatus.FAILED
-        db.commit()
         return {"message": "Payment not successful", "status": data["status"]}
     
-    # Get metadata
-    metadata = data.get("metadata", {})
-    start_date = datetime.fromisoformat(metadata.get("start_date", datetime.utcnow().isoformat()))
-    end_date = datetime.fromisoformat(metadata.get("end_date", (datetime.utcnow() + timedelta(days=30)).isoformat()))
-    
-    # Update transaction
-    transaction.status = TransactionStatus.SUCCESS
-    transaction.paystack_transaction_id = str(data.get("id"))
-    transaction.payment_channel = data.get("channel")
-    transaction.paid_at = data.get("paid_at")
-    db.commit()
-    
-    # Update user subscription with dates
-    user = db.query(User).filter(User.id == transaction.user_id).first()
     if user:
-        user.subscription_tier = transaction.plan_id
-        user.subscription_start_date = start_date
-        user.subscription_end_date = end_date
-        db.commit()
-    
+        schedule_subscription_deadlines(user)
+        start_date, end_date = user.subscription_start_date, user.subscription_end_date
+    else:
+        start_date, end_date = SubscriptionService.subscription_window(data.get("metadata"))
     return {
         "message": "Payment successful! Subscription activated.",
         "plan": transaction.plan_id,
@@ -137,55 +190,89 @@ def verify_payment(reference: str, db: Session = Depends(get_db)):
         "status": "active"
     }
 
-@router.get("/status")
-def get_subscription_status(current_user: User = Depends(get_current_active_user)):
-    """Get current subscription status"""
-    is_active = current_user.is_subscription_active()
+@router.get("/verify")
+def verify_payment(reference: str, db: Session = Depends(get_db)):
+    """Verify payment and activate subscription"""
+    cached = _settled_responses.get(reference)
+    if cached is not None:
+        return cached
+    
+    transaction = TransactionLookup.by_reference(db, reference)
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    # Already settled (e.g. by the webhook): no Paystack round trip
+    if transaction.status in FINAL_STATUSES:
+        response = _settled_response(transaction, db)
+    else:
+        # Concurrent verifies of one reference share a single Paystack call
+        response = _verify_flight.do(reference, lambda: _verify_with_paystack(reference, db))
     
+    if response["status"] in SETTLED_RESPONSE_STATUSES:
+        _settled_responses.set(reference, response)
+    return response
+
+@router.get("/status")
+def get_subscription_status(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get current subscription status; send the ETag back as If-None-Match to get a 304"""
+    subscription = principal_cache.subscription(db, current_user)
+    etag = principal_cache.status_etag(db, current_user, subscription)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    is_active, days_remaining = principal_cache.subscription_state(subscription)
+    start_date = subscription["subscription_start_date"]
+    end_date = subscription["subscription_end_date"]
+    response.headers["ETag"] = etag
     return {
         "user_id": str(current_user.id),
-        "email": current_user.email,
-        "subscription_tier": current_user.subscription_tier,
+        "email": subscription["email"],
+        "subscription_tier": subscription["subscription_tier"],
         "is_active": is_active,
-        "valid_from": current_user.subscription_start_date.isoformat() if current_user.subscription_start_date else None,
-        "valid_until": current_user.subscription_end_date.isoformat() if current_user.subscription_end_date else None,
-        "auto_renew": current_user.auto_renew,
-        "days_remaining": (
-            (current_user.subscription_end_date - datetime.now(current_user.subscription_end_date.tzinfo)).days 
-            if current_user.subscription_end_date and current_user.subscription_tier != "free"
-            else None
-        )
+        "valid_from": start_date.isoformat() if start_date else None,
+        "valid_until": end_date.isoformat() if end_date else None,
+        "auto_renew": subscription["auto_renew"],
+        "days_remaining": days_remaining
     }
 
 @router.get("/history")
 def get_payment_history(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get payment history"""
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).order_by(Transaction.created_at.desc()).all()
-    
+    """Get payment history, newest first; pass ``next_cursor`` back as ``cursor`` for the next page"""
+    summary = TransactionHistoryService.summary(db, current_user.id)
+    tier = current_user.subscription_tier
+    etag = TransactionHistoryService.etag(
+        current_user.id, summary, tier.value if hasattr(tier, "value") else tier, limit, cursor
+    )
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        transactions, next_cursor = TransactionHistoryService.page(db, current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response.headers["ETag"] = etag
     return {
         "user_id": str(current_user.id),
         "subscription_tier": current_user.subscription_tier,
-        "transactions": [
-            {
-                "id": str(t.id),
-                "reference": t.reference,
-                "amount": float(t.amount),
-                "currency": t.currency,
-                "status": t.status.value,
-                "plan_id": t.plan_id,
-                "paid_at": t.paid_at,
-                "created_at": t.created_at
-            }
-            for t in transactions
-        ]
+        "summary": summary,
+        "transactions": [TransactionHistoryService.serialize(t) for t in transactions],
+        "next_cursor": next_cursor
     }
 
-@router.post("/cancel")
+@router.post("/cancel", dependencies=[Depends(idempotency_key)])
 def cancel_subscription(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -196,6 +283,8 @@ def cancel_subscription(
     
     current_user.auto_renew = False
     db.commit()
+    # A lapsed subscription that was waiting on renewal now expires
+    schedule_subscription_deadlines(current_user)
     
     return {
         "message": "Auto-renewal cancelled. You will be downgraded to Free at the end of your billing period.",
@@ -212,7 +301,7 @@ def test_verify_payment(reference: str, plan_id: str = "basic", db: Session = De
     except:
         raise HTTPException(status_code=400, detail="Invalid reference")
     
-    transaction = db.query(Transaction).filter(Transaction.reference == reference).first()
+    transaction = TransactionLookup.by_reference(db, reference)
     if not transaction:
         transaction = Transaction(
             user_id=user_id,
@@ -231,11 +320,14 @@ def test_verify_payment(reference: str, plan_id: str = "basic", db: Session = De
     
     user = db.query(User).filter(User.id == user_id).first()
     if user:
+        set_event_source(db, TEST)
         user.subscription_tier = plan_id
         user.subscription_start_date = start_date
         user.subscription_end_date = end_date
     
     db.commit()
+    if user:
+        schedule_subscription_deadlines(user)
     
     return {
         "message": "TEST: Payment simulated",
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from app.api.deps import get_current_active_user, get_db, security
+from app.api.deps import get_current_active_user, get_db, not_modified, security
 from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate
+from app.core.plans import get_daily_quota
 from app.core.security import get_password_hash
+from app.services.principal_cache import principal_cache
+from app.services.usage import UsageService, seconds_until_reset, usage_meter
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserResponse)
-def read_user_me(current_user: User = Depends(get_current_active_user)):
-    """Get current user profile"""
+def read_user_me(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get current user profile; send the ETag back as If-None-Match to get a 304"""
+    etag = principal_cache.profile_etag(db, current_user)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return current_user
 
 @router.patch("/me", response_model=UserResponse)
@@ -27,6 +39,8 @@ def update_user_me(
     # Update password if provided
     if user_update.password is not None:
         current_user.password_hash = get_password_hash(user_update.password)
+        # Revoke outstanding claims/refresh tokens issued with the old password
+        current_user.token_version = (current_user.token_version or 0) + 1
     
     # Update is_verified if provided
     if user_update.is_verified is not None:
@@ -35,3 +49,25 @@ def update_user_me(
     db.commit()
     db.refresh(current_user)
     return current_user
+
+@router.get("/me/usage")
+def read_user_usage(
+    days: int = Query(7, ge=1, le=90),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """API calls per day and route, with today's quota"""
+    
+    # Write this process's pending counters so today's breakdown is current
+    usage_meter.flush()
+    quota = None if current_user.is_superuser else get_daily_quota(current_user.subscription_tier)
+    used_today = usage_meter.used_today(current_user.id)
+    
+    return {
+        "subscription_tier": current_user.subscription_tier.value if hasattr(current_user.subscription_tier, 'value') else current_user.subscription_tier,
+        "daily_quota": quota,
+        "used_today": used_today,
+        "remaining_today": max(quota - used_today, 0) if quota is not None else None,
+        "resets_in_seconds": seconds_until_reset(),
+        "days": UsageService.daily(db, current_user.id, days)
+    }
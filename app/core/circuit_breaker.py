@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (state, generation) a call was permitted in; handed back to ``record``
+Permit = Tuple[str, int]
+
+class DependencyUnavailable(Exception):
+    """A call to an external dependency was refused or failed; the API answers 503"""
+
+    def __init__(self, dependency: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(f"{dependency} unavailable: {reason}")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Stops calling a dependency that is failing or slow, then probes it.
+
+    Outcomes of the last ``window_seconds`` are kept. Once at least
+    ``minimum_calls`` are in the window, the circuit opens when the share of
+    failures reaches ``failure_rate`` or the share of calls slower than
+    ``slow_call_seconds`` reaches ``slow_call_rate``. While open every call is
+    refused. After ``open_seconds`` it is half-open: up to ``half_open_calls``
+    probes go through, and it closes once that many succeed or opens again on
+    the first failure. Thread-safe; sync endpoints run in a thread pool.
+
+    Each permit carries the state it was granted in. An outcome is only
+    counted while that state lasts. A call granted before a transition
+    finishes late and counts for nothing, so a slow call from the closed
+    period can neither close nor reopen a half-open circuit.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_call_rate: float = 0.5,
+        minimum_calls: int = 10,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 2,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+
+        self.state = self.CLOSED
+        self.state_since = clock()
+        self.transitions: Counter = Counter()
+        self.rejected = 0
+        self._lock = threading.Lock()
+        # (finished_at, failed, slow)
+        self._outcomes: deque = deque()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # Incremented on every transition; stale permits no longer match
+        self._generation = 0
+
+    def _transition(self, state: str):
+        logger.warning("Circuit %s: %s -> %s", self.name, self.state, state)
+        self.transitions[f"{self.state}->{state}"] += 1
+        self.state = state
+        self.state_since = self.clock()
+        self._generation += 1
+        self._outcomes.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _retry_after(self) -> float:
+        return max(self.open_seconds - (self.clock() - self.state_since), 0.0)
+
+    def before_call(self) -> Permit:
+        """Claim permission for one call; raises DependencyUnavailable if refused.
+
+        Every permit must be handed back to :meth:`record`, or to
+        :meth:`cancel` if the call was never made.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self.state_since < self.open_seconds:
+                    self.rejected += 1
+                    raise DependencyUnavailable(self.name, "circuit open", self._retry_after())
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_calls:
+                    self.rejected += 1
+                    raise DependencyUnavailable(self.name, "circuit half-open, probe in progress", 1.0)
+                self._probes_in_flight += 1
+            return self.state, self._generation
+
+    def cancel(self, permit: Permit):
+        """Give back a permit whose call was not made (e.g. refused by a bulkhead)"""
+        with self._lock:
+            if permit == (self.HALF_OPEN, self._generation) and self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def record(self, permit: Permit, ok: bool, duration: float):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if permit[1] != self._generation:
+                # Permitted in an earlier state; its outcome says nothing about this one
+                return
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if not ok or slow:
+                    self._transition(self.OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        self._transition(self.CLOSED)
+                return
+
+            now = self.clock()
+            self._outcomes.append((now, not ok, slow))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+
+            calls = len(self._outcomes)
+            if calls < self.minimum_calls:
+                return
+            failures = sum(1 for _, failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, _, was_slow in self._outcomes if was_slow)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._transition(self.OPEN)
+
+    def check(self):
+        """Raise DependencyUnavailable if a call would be refused right now, without claiming it"""
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.state_since < self.open_seconds:
+                self.rejected += 1
+                raise DependencyUnavailable(self.name, "circuit open", self._retry_after())
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            now = self.clock()
+            recent = [o for o in self._outcomes if o[0] >= now - self.window_seconds]
+            return {
+                "state": self.state,
+                "state_seconds": round(now - self.state_since, 3),
+                "window_calls": len(recent),
+                "window_failures": sum(1 for _, failed, _ in recent if failed),
+                "window_slow_calls": sum(1 for _, _, slow in recent if slow),
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions),
+            }
+
+class Bulkhead:
+    """Caps concurrent calls to a dependency so it can't hold every worker thread.
+
+    A caller waits at most ``max_wait_seconds`` for a slot, then is refused.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait_seconds: float = 0.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait_seconds = max_wait_seconds
+        self.rejected = 0
+        self._in_use = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if not self._semaphore.acquire(timeout=self.max_wait_seconds):
+            with self._lock:
+                self.rejected += 1
+            raise DependencyUnavailable(self.name, "too many concurrent calls", 1.0)
+        with self._lock:
+            self._in_use += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self._in_use -= 1
+        self._semaphore.release()
+        return False
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {"in_use": self._in_use, "max_concurrent": self.max_concurrent, "rejected": self.rejected}
@@ -0,0 +1,145 @@
+"""Structured, non-blocking logging.
+
+Every record goes to a bounded in-memory queue from the thread that logged
+it; a single listener thread formats and writes them. Emitting is a
+``put_nowait``, so a slow stdout or log collector never stalls a request or
+a sweep. When the queue is full the record is dropped and counted
+(``log_pipeline.dropped``, reported by ``/health/ready``).
+
+Records carry the ``request_id`` of the request or Celery task that emitted
+them (see ``RequestContextMiddleware``). With ``LOG_FORMAT=json`` each line
+is one JSON object holding the message, level, logger, request id and any
+``extra={...}`` fields. DEBUG records are sampled: only
+``log_debug_sample_rate`` of them are kept, so per-row debug lines in bulk
+jobs cost almost nothing when debug logging is on.
+
+``configure_logging()`` is called by the API on import and by Celery
+workers through the ``setup_logging`` signal. CLIs keep ``basicConfig``.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Union
+
+from app.core.config import settings
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ContextFilter(logging.Filter):
+    """Stamps the current request id and samples DEBUG records.
+
+    Runs in the emitting thread, where the request's context is still set.
+    """
+
+    def __init__(self, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample_rate:
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now, while args are still valid,
+        # but leave the rest of the formatting to the listener thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogPipeline:
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped if self.handler else 0
+
+    def status(self) -> dict:
+        if self.handler is None:
+            return {"status": "disabled"}
+        return {"status": "ok", "queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+    def configure(self, level: Union[str, int, None] = None, fmt: Optional[str] = None):
+        """Route the root logger through the queue; later calls are no-ops"""
+        with self._lock:
+            if self.listener is not None:
+                return
+            output = logging.StreamHandler(sys.stdout)
+            if (fmt or settings.log_format) == "json":
+                output.setFormatter(JsonFormatter())
+            else:
+                output.setFormatter(logging.Formatter(
+                    "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+                ))
+
+            self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+            self.handler.addFilter(ContextFilter(settings.log_debug_sample_rate))
+
+            root = logging.getLogger()
+            for existing in list(root.handlers):
+                root.removeHandler(existing)
+            root.addHandler(self.handler)
+            level = level or settings.log_level
+            root.setLevel(level.upper() if isinstance(level, str) else level)
+
+            self.listener = QueueListener(self.handler.queue, output, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Write out what is queued and stop the listener thread"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+log_pipeline = LogPipeline()
+
+def configure_logging(level: Union[str, int, None] = None, fmt: Optional[str] = None):
+    log_pipeline.configure(level, fmt)
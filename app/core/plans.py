@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 SUBSCRIPTION_PLANS = {
     "free": {
@@ -6,28 +6,32 @@ SUBSCRIPTION_PLANS = {
         "price": 0,
         "currency": "NGN",
         "features": ["Basic access", "Limited storage"],
-        "paystack_plan_code": None
+        "paystack_plan_code": None,
+        "daily_api_quota": 1000
     },
     "basic": {
         "name": "Basic",
         "price": 5000,
         "currency": "NGN",
         "features": ["Full access", "10GB storage", "Email support"],
-        "paystack_plan_code": "PLN_basic_monthly"
+        "paystack_plan_code": "PLN_basic_monthly",
+        "daily_api_quota": 10000
     },
     "pro": {
         "name": "Pro",
         "price": 15000,
         "currency": "NGN",
         "features": ["Everything in Basic", "100GB storage", "Priority support", "API access"],
-        "paystack_plan_code": "PLN_pro_monthly"
+        "paystack_plan_code": "PLN_pro_monthly",
+        "daily_api_quota": 100000
     },
     "enterprise": {
         "name": "Enterprise",
         "price": 50000,
         "currency": "NGN",
         "features": ["Everything in Pro", "Unlimited storage", "Dedicated support"],
-        "paystack_plan_code": "PLN_enterprise_monthly"
+        "paystack_plan_code": "PLN_enterprise_monthly",
+        "daily_api_quota": None
     }
 }
 
@@ -36,3 +40,8 @@ def get_plan(plan_id: str) -> Dict[str, Any]:
 
 def get_all_plans() -> Dict[str, Any]:
     return SUBSCRIPTION_PLANS
+
+def get_daily_quota(tier) -> Optional[int]:
+    """Metered API calls allowed per UTC day for a tier; None means unlimited"""
+    plan = get_plan(tier.value if hasattr(tier, "value") else tier)
+    return plan.get("daily_api_quota") if plan else None
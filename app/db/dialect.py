@@ -0,0 +1,26 @@
+"""SQL that differs between Postgres and SQLite.
+
+Postgres is the production database. SQLite (``DATABASE_URL=sqlite://`` for an
+in-memory database) runs the API and tasks with no services, for local runs,
+tests and benchmarks of the application layer.
+"""
+from sqlalchemy import Date, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+def is_sqlite_url(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def upsert_insert(bind, table):
+    """``INSERT`` supporting ``on_conflict_do_nothing``/``on_conflict_do_update`` for ``bind``'s dialect"""
+    if bind.dialect.name == "sqlite":
+        return sqlite_insert(table)
+    return pg_insert(table)
+
+def month_start(bind, expr):
+    """First day of ``expr``'s month as a date; timestamps are truncated in UTC"""
+    if bind.dialect.name == "sqlite":
+        return func.date(expr, "start of month", type_=Date)
+    if getattr(expr.type, "timezone", False):
+        expr = func.timezone("UTC", expr)
+    return func.date(func.date_trunc("month", expr), type_=Date)
@@ -0,0 +1,17 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.db.session import engine as default_engine
+
+def ensure_transaction_partitions(months_ahead: int = 3, engine: Engine = None) -> int:
+    """Create monthly ``transactions`` partitions up to ``months_ahead`` months out.
+
+    Returns the number of partitions created. No-op on databases other than
+    Postgres, where the table is not partitioned.
+    """
+    engine = engine or default_engine
+    if engine.dialect.name != "postgresql":
+        return 0
+    with engine.begin() as conn:
+        return conn.execute(
+            text("SELECT ensure_transaction_partitions(:months)"), {"months": months_ahead}
+        ).scalar()
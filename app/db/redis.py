@@ -0,0 +1,17 @@
+from typing import Optional
+from app.core.config import settings
+
+_client = None
+
+def get_redis() -> Optional["redis.Redis"]:
+    """Return the shared Redis client, or None when Redis is not configured"""
+    global _client
+    if _client is None and settings.redis_url:
+        import redis
+        _client = redis.Redis.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_connect_timeout_seconds,
+        )
+    return _client
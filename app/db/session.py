@@ -1,9 +1,20 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.core.config import settings
+from app.db.dialect import is_sqlite_url
+
+def _engine_options(url: str) -> dict:
+    if not is_sqlite_url(url):
+        return {}
+    options = {"connect_args": {"check_same_thread": False}}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # One shared connection, or every checkout would see a new empty database
+        options["poolclass"] = StaticPool
+    return options
 
 # Use database_url from settings (which reads from environment)
-engine = create_engine(settings.database_url, echo=settings.debug)
+engine = create_engine(settings.database_url, echo=settings.debug, **_engine_options(settings.database_url))
 
 SessionLocal = sessionmaker(
     autocommit=False,
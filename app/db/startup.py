@@ -0,0 +1,172 @@
+"""Pre-start checks run before the API process boots.
+
+Waits for the database and Redis with exponential backoff instead of a fixed
+sleep, then applies Alembic migrations only if the database is not already at
+head. Concurrent boots serialise on a Postgres advisory lock, so only one
+instance migrates.
+
+    python -m app.db.startup && uvicorn app.main:app
+"""
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.db.session import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent.parent / "alembic.ini"
+
+# Databases created by the old init_db.py (create_all) have the schema of this
+# revision but no alembic_version table; they are stamped here before upgrading.
+LEGACY_BASELINE_REVISION = "d6d0859e32c2"
+
+# Arbitrary key shared by every instance taking the migration lock
+MIGRATION_LOCK_ID = 7_304_112_001
+
+def wait_for(
+    name: str,
+    probe: Callable[[], None],
+    timeout: float,
+    initial_delay: float = 0.1,
+    max_delay: float = 5.0
+) -> float:
+    """Call ``probe`` until it stops raising; returns the seconds waited.
+
+    Delays double from ``initial_delay`` up to ``max_delay`` with jitter.
+    Raises TimeoutError once ``timeout`` seconds have passed.
+    """
+    started = time.monotonic()
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            probe()
+            waited = time.monotonic() - started
+            logger.info("%s ready after %.2fs (%d attempts)", name, waited, attempt)
+            return waited
+        except Exception as e:
+            elapsed = time.monotonic() - started
+            reason = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            if elapsed >= timeout:
+                raise TimeoutError(f"{name} not ready after {elapsed:.1f}s: {reason}") from e
+            sleep_for = min(delay, max_delay, timeout - elapsed) * random.uniform(0.8, 1.2)
+            logger.info("%s not ready (%s); retrying in %.2fs", name, reason, sleep_for)
+            time.sleep(sleep_for)
+            delay *= 2
+
+def _ping_database(engine: Engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return config
+
+def _revisions(conn, config):
+    """(current heads in the database, heads in the migration scripts)"""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    current = set(MigrationContext.configure(conn).get_current_heads())
+    target = set(ScriptDirectory.from_config(config).get_heads())
+    return current, target
+
+def create_sqlite_schema(engine: Optional[Engine] = None) -> bool:
+    """Create missing tables from the models on SQLite; returns True if any were created.
+
+    The migrations are written for Postgres (partitioning, advisory locks), so
+    SQLite databases, typically in-memory ones for tests and benchmarks, are
+    built with ``create_all`` instead.
+    """
+    import app.models  # noqa: F401
+    from app.db.base import Base
+
+    engine = engine or default_engine
+    missing = set(Base.metadata.tables) - set(inspect(engine).get_table_names())
+    if not missing:
+        return False
+    Base.metadata.create_all(engine)
+    logger.info("Created %d tables on SQLite", len(missing))
+    return True
+
+def migrate_if_needed(engine: Optional[Engine] = None) -> bool:
+    """Upgrade to head unless already there; returns True if migrations ran"""
+    from alembic import command
+
+    engine = engine or default_engine
+    if engine.dialect.name == "sqlite":
+        return create_sqlite_schema(engine)
+    config = _alembic_config()
+
+    with engine.connect() as conn:
+        current, target = _revisions(conn, config)
+        if current == target:
+            logger.info("Database already at %s; skipping migrations", ", ".join(sorted(target)))
+            return False
+
+        is_postgres = engine.dialect.name == "postgresql"
+        if is_postgres:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+        try:
+            # Another instance may have migrated while we waited for the lock
+            current, target = _revisions(conn, config)
+            if current == target:
+                conn.commit()
+                return False
+
+            legacy_schema = not current and inspect(conn).has_table("users")
+            # End our read transaction: CREATE INDEX CONCURRENTLY waits on open snapshots
+            conn.commit()
+
+            if legacy_schema:
+                logger.warning("Unversioned schema found; stamping %s", LEGACY_BASELINE_REVISION)
+                command.stamp(config, LEGACY_BASELINE_REVISION)
+
+            logger.info("Migrating database from %s to %s",
+                        ", ".join(sorted(current)) or "empty", ", ".join(sorted(target)))
+            command.upgrade(config, "head")
+            return True
+        finally:
+            if is_postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                conn.commit()
+
+def prestart(timeout: Optional[float] = None, migrate: bool = True) -> dict:
+    """Wait for dependencies and migrate; returns timings for the startup log"""
+    timeout = timeout if timeout is not None else settings.startup_timeout_seconds
+    started = time.monotonic()
+    timings = {"database": wait_for("Database", lambda: _ping_database(default_engine), timeout)}
+
+    client = get_redis()
+    if client is not None:
+        timings["redis"] = wait_for("Redis", client.ping, timeout)
+
+    if migrate:
+        migrate_started = time.monotonic()
+        timings["migrated"] = migrate_if_needed()
+        timings["migrate_seconds"] = round(time.monotonic() - migrate_started, 3)
+
+    timings["total_seconds"] = round(time.monotonic() - started, 3)
+    return timings
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        logger.info("Startup checks finished: %s", prestart())
+    except TimeoutError as e:
+        logger.error("%s", e)
+        sys.exit(1)
@@ -0,0 +1,32 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import DateTime, Uuid
+from sqlalchemy.types import TypeDecorator
+
+class GUID(TypeDecorator):
+    """UUID column: native ``uuid`` on Postgres, ``CHAR(32)`` on SQLite.
+
+    Accepts string ids as well as ``uuid.UUID``, as Postgres does, so filters
+    like ``User.id == user_id`` with an id from a path or token work on both.
+    """
+    impl = Uuid
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
+
+class ISODateTime(TypeDecorator):
+    """Timezone-aware timestamp that also accepts ISO 8601 strings.
+
+    Gateway payloads carry timestamps as strings; Postgres parses them itself,
+    SQLite needs a ``datetime``.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
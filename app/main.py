@@ -1,12 +1,46 @@
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from app.core.circuit_breaker import DependencyUnavailable
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.api.middleware import IdempotencyMiddleware, RequestContextMiddleware, UsageMeterMiddleware
+from app.core.logs import configure_logging
+from app.db.session import engine
+from app.db.startup import create_sqlite_schema
+from app.services.audit import audit_log
+from app.services.health import health_monitor
+from app.services.idempotency import IdempotentReplay
+from app.services.usage import usage_meter
+
+# Structured logs through a queue; see app.core.logs
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In-memory SQLite starts empty in every process
+    if engine.dialect.name == "sqlite":
+        create_sqlite_schema(engine)
+    # Warm the readiness snapshot before the first load balancer check; the
+    # probes block on the database and Redis, so keep them off the event loop
+    await run_in_threadpool(health_monitor.refresh)
+    health_monitor.start()
+    audit_log.start()
+    usage_meter.start()
+    yield
+    # Write buffered audit rows and usage counters before the process exits
+    usage_meter.stop()
+    audit_log.stop()
+    health_monitor.stop()
 
 def create_application() -> FastAPI:
     app = FastAPI(
         title=settings.app_name,
         description="SaaS Subscription API with billing and payments",
-        version="0.1.0"
+        version="0.1.0",
+        lifespan=lifespan
     )
 
     @app.get("/")
@@ -14,13 +48,52 @@ def create_application() -> FastAPI:
         return {
             "message": "Welcome to SaaS Subscription API",
             "docs": "/docs",
-            "health": "/health"
+            "health": "/health",
+            "readiness": "/health/ready"
         }
 
     @app.get("/health")
     def health_check():
         return {"status": "healthy", "app": settings.app_name}
 
+    @app.get("/health/live")
+    def liveness():
+        """The process is up; never touches dependencies"""
+        return {"status": "alive"}
+
+    @app.get("/health/ready")
+    def readiness():
+        """Cached DB/Redis probes plus pool and Paystack state; 503 only when the database is not ready"""
+        report = health_monitor.readiness()
+        return JSONResponse(report, status_code=503 if report["status"] == "unavailable" else 200)
+
+    @app.exception_handler(DependencyUnavailable)
+    def dependency_unavailable(request: Request, exc: DependencyUnavailable):
+        """Open circuit, full bulkhead or failed call to an external service"""
+        headers = {}
+        if exc.retry_after is not None:
+            headers["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+        return JSONResponse(
+            {"detail": f"Payment provider temporarily unavailable ({exc.reason}). Please retry shortly.",
+             "dependency": exc.dependency},
+            status_code=503,
+            headers=headers
+        )
+
+    @app.exception_handler(IdempotentReplay)
+    def idempotent_replay(request: Request, exc: IdempotentReplay):
+        """Stored response for a repeated Idempotency-Key"""
+        response = Response(content=exc.body, status_code=exc.status_code)
+        response.raw_headers = [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in exc.headers
+        ] + [(b"idempotent-replayed", b"true")]
+        return response
+
+    app.add_middleware(IdempotencyMiddleware)
+    app.add_middleware(UsageMeterMiddleware)
+    # Outermost, so the request id covers everything below it
+    app.add_middleware(RequestContextMiddleware)
+
     # Include API routes
     app.include_router(api_router, prefix="/api/v1")
 
@@ -1,4 +1,15 @@
 from .user import User, SubscriptionTier
-from .transaction import Transaction, TransactionStatus
+from .transaction import Transaction, TransactionStatus, TransactionPayload, TransactionReference
+from .notification import NotificationLog
+from .outbox import OutboxEvent, OutboxStatus
+from .audit import AuditLog
+from .usage import UsageDaily
+from .webhook import ProcessedWebhookEvent
+from .subscription_history import SubscriptionEvent, SubscriptionSnapshot, CohortSnapshot
 
-__all__ = ["User", "SubscriptionTier", "Transaction", "TransactionStatus"]
+__all__ = [
+    "User", "SubscriptionTier", "Transaction", "TransactionStatus", "TransactionPayload",
+    "TransactionReference", "NotificationLog", "OutboxEvent", "OutboxStatus", "AuditLog",
+    "UsageDaily", "ProcessedWebhookEvent", "SubscriptionEvent", "SubscriptionSnapshot",
+    "CohortSnapshot",
+]
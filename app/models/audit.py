@@ -0,0 +1,32 @@
+import uuid
+from sqlalchemy import Column, String, DateTime, Text, Index
+from app.db.base import Base
+from app.db.types import GUID
+
+class AuditLog(Base):
+    """One admin mutation.
+
+    Rows are written in batches by ``app.services.audit.AuditLogBuffer``, so
+    ``created_at`` is the time of the action, set by the application, not the
+    time of the insert.
+    """
+    __tablename__ = "audit_logs"
+    __table_args__ = (
+        # The audit endpoint pages newest first, optionally per actor or target
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_actor_id_created_at", "actor_id", "created_at"),
+        Index("ix_audit_logs_target_created_at", "target_type", "target_id", "created_at"),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    actor_id = Column(GUID, nullable=True)
+    actor_email = Column(String(255), nullable=True)
+    action = Column(String(64), nullable=False)
+    target_type = Column(String(32), nullable=False)
+    target_id = Column(String(64), nullable=True)
+    changes = Column(Text, nullable=True)
+    ip_address = Column(String(45), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<AuditLog {self.action} {self.target_type}:{self.target_id}>"
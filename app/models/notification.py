@@ -0,0 +1,24 @@
+import uuid
+from sqlalchemy import Column, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+from app.db.types import GUID
+
+class NotificationLog(Base):
+    """One row per notice sent, so reruns within a cycle don't resend"""
+    __tablename__ = "notification_log"
+    __table_args__ = (
+        UniqueConstraint("user_id", "kind", "cycle_end", name="uq_notification_log_user_kind_cycle"),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String(50), nullable=False)
+
+    # Subscription end date the notice was about; a renewal starts a new cycle
+    cycle_end = Column(DateTime(timezone=True), nullable=False)
+
+    sent_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<NotificationLog {self.kind} - {self.user_id}>"
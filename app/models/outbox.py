@@ -0,0 +1,42 @@
+import uuid
+import enum
+from sqlalchemy import Column, String, Integer, DateTime, Enum, Text, Index, text
+from sqlalchemy.sql import func
+from app.db.base import Base
+from app.db.types import GUID
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+
+class OutboxEvent(Base):
+    """Side effect to perform after a subscription change, one row per destination.
+
+    Rows are added in the same transaction as the change they describe and
+    delivered later by ``app.tasks.outbox.dispatch_outbox``.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # The dispatcher only ever reads due, undelivered rows
+        Index(
+            "ix_outbox_events_pending", "next_attempt_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    event_type = Column(String(64), nullable=False)
+    destination = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)
+
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxEvent {self.event_type} -> {self.destination} - {self.status}>"
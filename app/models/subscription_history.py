@@ -0,0 +1,67 @@
+import uuid
+from sqlalchemy import Column, String, Date, DateTime, Integer, Numeric, Index
+from app.db.base import Base
+from app.db.types import GUID
+
+class SubscriptionEvent(Base):
+    """One change to a user's tier or subscription dates. Append-only.
+
+    Added in the same flush as the change by a session hook in
+    ``app.services.subscription_history``, so every code path that updates a
+    user through the ORM is covered.
+    """
+    __tablename__ = "subscription_events"
+    __table_args__ = (
+        # Daily snapshots aggregate one day of events
+        Index("ix_subscription_events_occurred_at", "occurred_at"),
+        Index("ix_subscription_events_user_id_occurred_at", "user_id", "occurred_at"),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    user_id = Column(GUID, nullable=False)
+    # new, upgrade, downgrade, churn, renewal or change
+    kind = Column(String(16), nullable=False)
+    # webhook, verify, reconcile, admin, expiry, user, ...
+    source = Column(String(32), nullable=False)
+    from_tier = Column(String(16), nullable=True)
+    to_tier = Column(String(16), nullable=False)
+    start_date = Column(DateTime(timezone=True), nullable=True)
+    end_date = Column(DateTime(timezone=True), nullable=True)
+    # Monthly recurring revenue gained (or lost, if negative) by the change
+    mrr_delta = Column(Numeric(12, 2), nullable=False, default=0)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<SubscriptionEvent {self.user_id} {self.kind} {self.from_tier}->{self.to_tier}>"
+
+class SubscriptionSnapshot(Base):
+    """Per tier, the state at the end of a UTC day and the day's movements"""
+    __tablename__ = "subscription_snapshots"
+
+    day = Column(Date, primary_key=True)
+    tier = Column(String(16), primary_key=True)
+    active_users = Column(Integer, nullable=False, default=0)
+    mrr = Column(Numeric(14, 2), nullable=False, default=0)
+    new = Column(Integer, nullable=False, default=0)
+    churned = Column(Integer, nullable=False, default=0)
+    upgraded_in = Column(Integer, nullable=False, default=0)
+    upgraded_out = Column(Integer, nullable=False, default=0)
+    downgraded_in = Column(Integer, nullable=False, default=0)
+    downgraded_out = Column(Integer, nullable=False, default=0)
+    renewals = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SubscriptionSnapshot {self.day} {self.tier} active={self.active_users}>"
+
+class CohortSnapshot(Base):
+    """Paying users grouped by the month of their first paid plan, as of a UTC day"""
+    __tablename__ = "subscription_cohort_snapshots"
+
+    day = Column(Date, primary_key=True)
+    cohort = Column(Date, primary_key=True)
+    cohort_size = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    mrr = Column(Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CohortSnapshot {self.day} {self.cohort} {self.active_users}/{self.cohort_size}>"
@@ -1,11 +1,11 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Enum, Text
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Enum, Text, UniqueConstraint, Index, event
+from sqlalchemy.sql import func, text
+from sqlalchemy.orm import Session, relationship, foreign
 import enum
 from app.db.base import Base
+from app.db.types import GUID, ISODateTime
 
 class TransactionStatus(str, enum.Enum):
     PENDING = "pending"
@@ -14,32 +14,103 @@ class TransactionStatus(str, enum.Enum):
     ABANDONED = "abandoned"
 
 class Transaction(Base):
+    """Payment records.
+
+    On Postgres the table is range-partitioned by month on ``created_at``
+    (see the partitioning migration), so uniqueness constraints must include
+    ``created_at``. Global uniqueness of ``reference`` is enforced by
+    :class:`TransactionReference` instead.
+    """
     __tablename__ = "transactions"
+    __table_args__ = (
+        UniqueConstraint("reference", "created_at", name="uq_transactions_reference_created_at"),
+        Index("ix_transactions_user_id_created_at", "user_id", text("created_at DESC")),
+        Index("ix_transactions_status_created_at", "status", "created_at"),
+        Index("ix_transactions_plan_id_created_at", "plan_id", "created_at"),
+        Index("ix_transactions_created_at", "created_at"),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
-    
     # Relationship to User
     user = relationship("User", back_populates="transactions")
-    
+
     # Paystack fields
-    reference = Column(String(255), unique=True, index=True, nullable=False)
+    reference = Column(String(255), index=True, nullable=False)
     paystack_transaction_id = Column(String(255), nullable=True)
-    
+    # Checkout page from initialization; reused by repeated subscribes while PENDING
+    authorization_url = Column(String(512), nullable=True)
+
     amount = Column(Numeric(10, 2), nullable=False)
     currency = Column(String(3), default="NGN")
     status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING)
-    
+
     # Subscription info
     plan_id = Column(String(50), nullable=False)
     payment_channel = Column(String(50), nullable=True)
-    paid_at = Column(DateTime(timezone=True), nullable=True)
-    
-    # Raw response for debugging
-    gateway_response = Column(Text, nullable=True)
-    
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    paid_at = Column(ISODateTime, nullable=True)
+
+    # Raw gateway data lives in a side table, loaded only when accessed
+    payload = relationship(
+        "TransactionPayload",
+        primaryjoin=lambda: Transaction.id == foreign(TransactionPayload.transaction_id),
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    @property
+    def gateway_response(self):
+        return self.payload.gateway_response if self.payload else None
+
+    @gateway_response.setter
+    def gateway_response(self, value):
+        if self.payload is None:
+            self.payload = TransactionPayload(gateway_response=value)
+        else:
+            self.payload.gateway_response = value
+
     def __repr__(self):
         return f"<Transaction {self.reference} - {self.status}>"
+
+class TransactionPayload(Base):
+    """Gateway responses and raw webhook data, kept out of the hot transactions table"""
+    __tablename__ = "transaction_payloads"
+
+    # No FK: the partitioned transactions table has a composite primary key
+    transaction_id = Column(GUID, primary_key=True)
+    gateway_response = Column(Text, nullable=True)
+    raw_payload = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TransactionReference(Base):
+    """One row per transaction reference; the primary key makes it globally unique.
+
+    The partitioned transactions table can only enforce uniqueness together
+    with ``created_at``. This small unpartitioned table is written in the
+    same flush as every new Transaction (see the hook below), so a second
+    insert of a reference fails with an IntegrityError however it arrives,
+    and lookups by reference go through it to a single partition.
+    """
+    __tablename__ = "transaction_references"
+
+    reference = Column(String(255), primary_key=True)
+    transaction_id = Column(GUID, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+@event.listens_for(Session, "before_flush")
+def _register_references(session, flush_context, instances):
+    for obj in list(session.new):
+        if not isinstance(obj, Transaction):
+            continue
+        # Known before the insert so both rows carry the same partition key
+        if obj.id is None:
+            obj.id = uuid.uuid4()
+        if obj.created_at is None:
+            obj.created_at = datetime.now(timezone.utc)
+        session.add(TransactionReference(
+            reference=obj.reference, transaction_id=obj.id, created_at=obj.created_at
+        ))
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Date, BigInteger, Index
+from app.db.base import Base
+from app.db.types import GUID
+
+class UsageDaily(Base):
+    """API calls per user, route and UTC day.
+
+    Written by ``app.services.usage.UsageMeter``, which aggregates requests in
+    memory and upserts the increments, so there is one write per user/route
+    per flush rather than one per request.
+    """
+    __tablename__ = "usage_daily"
+    __table_args__ = (
+        # Admin report: heaviest users on a day
+        Index("ix_usage_daily_day", "day"),
+    )
+
+    user_id = Column(GUID, primary_key=True)
+    day = Column(Date, primary_key=True)
+    route = Column(String(128), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UsageDaily {self.user_id} {self.day} {self.route}={self.count}>"
@@ -1,11 +1,11 @@
 import uuid
 import enum
 from datetime import datetime, timedelta
-from sqlalchemy import Column, String, Boolean, DateTime, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Boolean, DateTime, Enum, Index, Integer, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.db.types import GUID
 
 class SubscriptionTier(str, enum.Enum):
     FREE = "free"
@@ -15,8 +15,19 @@ class SubscriptionTier(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Expiry sweep and expiry notices only ever look at paid subscriptions
+        Index(
+            "ix_users_expiry", "subscription_end_date",
+            postgresql_where=text("subscription_tier <> 'FREE' AND auto_renew = false"),
+        ),
+        Index(
+            "ix_users_paid_subscription_end", "subscription_end_date",
+            postgresql_where=text("subscription_tier <> 'FREE'"),
+        ),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     full_name = Column(String(255), nullable=True)
@@ -32,6 +43,11 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
     is_superuser = Column(Boolean, default=False)
     auto_renew = Column(Boolean, default=True)
+
+    # Bumped to revoke every token issued to the user (see TokenVersionMap)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped on every change to a field the profile endpoints show; their ETag version
+    profile_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Stripe/Paystack customer ID
     payment_customer_id = Column(String(255), nullable=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class ProcessedWebhookEvent(Base):
+    """Paystack events whose handler has already run, by type and event key.
+
+    Written by ``app.services.webhook_events.WebhookProcessor`` in the same
+    transaction as the handler's changes, so a redelivered or replayed event
+    is acknowledged without running its side effects again.
+    """
+    __tablename__ = "processed_webhook_events"
+
+    event = Column(String(64), primary_key=True)
+    # Transaction reference, or Paystack's id for events without one
+    event_key = Column(String(255), primary_key=True)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ProcessedWebhookEvent {self.event} {self.event_key}>"
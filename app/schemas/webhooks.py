@@ -0,0 +1,72 @@
+from typing import Annotated, Any, Dict, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Discriminator, Field, Tag, TypeAdapter, field_validator
+
+class PaystackCustomer(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    email: Optional[str] = None
+    customer_code: Optional[str] = None
+
+class ChargeData(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: Optional[int] = None
+    reference: Optional[str] = None
+    amount: int = 0
+    currency: str = "NGN"
+    channel: Optional[str] = None
+    paid_at: Optional[str] = None
+    gateway_response: Optional[str] = None
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    customer: Optional[PaystackCustomer] = None
+
+    @field_validator("metadata", mode="before")
+    @classmethod
+    def _metadata_dict(cls, value):
+        # Paystack sends "" when a charge was created without metadata
+        return value if isinstance(value, dict) else {}
+
+class InvoiceData(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    amount: int = 0
+    description: Optional[str] = None
+    customer: PaystackCustomer = Field(default_factory=PaystackCustomer)
+    subscription: Dict[str, Any] = Field(default_factory=dict)
+
+class ChargeSuccessEvent(BaseModel):
+    event: Literal["charge.success"]
+    data: ChargeData
+
+class SubscriptionCreateEvent(BaseModel):
+    event: Literal["subscription.create"]
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+class InvoicePaymentFailedEvent(BaseModel):
+    event: Literal["invoice.payment_failed"]
+    data: InvoiceData
+
+class OtherEvent(BaseModel):
+    """Any event we do not handle; acknowledged and ignored"""
+    event: str
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+TYPED_EVENTS = ("charge.success", "subscription.create", "invoice.payment_failed")
+
+def _event_tag(value) -> str:
+    event = value.get("event") if isinstance(value, dict) else getattr(value, "event", None)
+    return event if event in TYPED_EVENTS else "other"
+
+PaystackEvent = Annotated[
+    Union[
+        Annotated[ChargeSuccessEvent, Tag("charge.success")],
+        Annotated[SubscriptionCreateEvent, Tag("subscription.create")],
+        Annotated[InvoicePaymentFailedEvent, Tag("invoice.payment_failed")],
+        Annotated[OtherEvent, Tag("other")],
+    ],
+    Discriminator(_event_tag),
+]
+
+# validate_json parses bytes with pydantic-core's JSON parser straight into the
+# typed event, without an intermediate dict
+paystack_event_adapter = TypeAdapter(PaystackEvent)
@@ -0,0 +1,3 @@
+# The Session hooks that keep cached token and profile versions current are
+# registered by token_versions at import; importing any service loads them
+from app.services import token_versions  # noqa: F401
@@ -0,0 +1,216 @@
+"""Buffered admin audit log.
+
+:meth:`AuditLogBuffer.record` only appends a row to an in-process buffer, so
+admin endpoints never wait on an extra insert. A background thread writes the
+buffer with one multi-row ``INSERT`` per batch, either when
+``audit_batch_size`` rows are waiting or when the oldest row is
+``audit_flush_interval_seconds`` old, and the app's shutdown hook flushes
+whatever is left.
+
+The buffer is bounded by ``audit_buffer_size``. If the database is down long
+enough for it to fill, new rows are dropped and counted rather than growing
+memory without limit.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import engine as default_engine
+from app.models.audit import AuditLog
+from app.models.user import User
+from app.services.transaction_history import TransactionHistoryService
+
+logger = logging.getLogger(__name__)
+
+class AuditLogBuffer:
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        max_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.engine = engine or default_engine
+        self.max_size = max_size or settings.audit_buffer_size
+        self.batch_size = batch_size or settings.audit_batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else settings.audit_flush_interval_seconds
+        self.dropped = 0
+        self.last_flush_failed = False
+        self._rows: deque = deque()
+        self._oldest_at = 0.0
+        self._lock = threading.Lock()
+        # Serialises flushes between the background thread and explicit callers
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        action: str,
+        target_type: str,
+        target_id=None,
+        actor: Optional[User] = None,
+        changes: Optional[Dict] = None,
+        ip_address: Optional[str] = None
+    ):
+        """Queue one audit row; never touches the database"""
+        row = {
+            "id": uuid.uuid4(),
+            "actor_id": actor.id if actor is not None else None,
+            "actor_email": actor.email if actor is not None else None,
+            "action": action,
+            "target_type": target_type,
+            "target_id": str(target_id) if target_id is not None else None,
+            "changes": json.dumps(changes, default=str) if changes is not None else None,
+            "ip_address": ip_address,
+            "created_at": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            if len(self._rows) >= self.max_size:
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    logger.error("Audit buffer full; %d rows dropped so far", self.dropped)
+                return
+            if not self._rows:
+                self._oldest_at = time.monotonic()
+            self._rows.append(row)
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _take(self) -> List[Dict]:
+        with self._lock:
+            batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+            if self._rows:
+                self._oldest_at = time.monotonic()
+            return batch
+
+    def _requeue(self, batch: List[Dict]):
+        with self._lock:
+            room = self.max_size - len(self._rows)
+            if room < len(batch):
+                self.dropped += len(batch) - room
+                batch = batch[:max(room, 0)]
+            self._rows.extendleft(reversed(batch))
+            self._oldest_at = time.monotonic()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    self.last_flush_failed = False
+                    return written
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(insert(AuditLog), batch)
+                except Exception:
+                    # Keep the rows for the next attempt instead of losing them
+                    self._requeue(batch)
+                    logger.exception("Could not write %d audit rows", len(batch))
+                    self.last_flush_failed = True
+                    return written
+                written += len(batch)
+
+    def _seconds_until_due(self) -> float:
+        with self._lock:
+            if not self._rows:
+                return self.flush_interval
+            if len(self._rows) >= self.batch_size:
+                return 0.0
+            return max(self.flush_interval - (time.monotonic() - self._oldest_at), 0.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Woken early by record() when a full batch is waiting
+            if self._wake.wait(self._seconds_until_due()):
+                self._wake.clear()
+            if self._seconds_until_due() == 0.0:
+                self.flush()
+                if self.last_flush_failed:
+                    # Database unavailable: retry after an interval, not in a tight loop
+                    self._stop.wait(self.flush_interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write what is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+audit_log = AuditLogBuffer()
+
+class AuditService:
+    @staticmethod
+    def page(
+        db: Session,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        actor_id=None,
+        action: Optional[str] = None,
+        target_type: Optional[str] = None,
+        target_id: Optional[str] = None
+    ):
+        """One page of audit rows, newest first, and the cursor for the next one.
+
+        Raises ValueError for a malformed cursor or actor id.
+        """
+        query = db.query(AuditLog)
+        if actor_id:
+            query = query.filter(AuditLog.actor_id == uuid.UUID(str(actor_id)))
+        if action:
+            query = query.filter(AuditLog.action == action)
+        if target_type:
+            query = query.filter(AuditLog.target_type == target_type)
+        if target_id:
+            query = query.filter(AuditLog.target_id == str(target_id))
+        if cursor:
+            created_at, log_id = TransactionHistoryService.decode_cursor(cursor)
+            query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(created_at, log_id))
+
+        rows = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = TransactionHistoryService.encode_cursor(rows[-1])
+        return rows, next_cursor
+
+    @staticmethod
+    def serialize(log: AuditLog) -> Dict:
+        return {
+            "id": str(log.id),
+            "actor_id": str(log.actor_id) if log.actor_id else None,
+            "actor_email": log.actor_email,
+            "action": log.action,
+            "target_type": log.target_type,
+            "target_id": log.target_id,
+            "changes": json.loads(log.changes) if log.changes else None,
+            "ip_address": log.ip_address,
+            "created_at": log.created_at.isoformat() if log.created_at else None,
+        }
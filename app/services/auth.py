@@ -1,10 +1,18 @@
+import hashlib
+import logging
+import time
+import uuid
 from datetime import timedelta
 from typing import Optional
-from sqlalchemy.orm import Session
-from app.models.user import User
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.user import User, SubscriptionTier
 from app.schemas.user import UserCreate, UserLogin
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import get_password_hash, verify_and_update_password, create_access_token, decode_token
 from app.core.config import settings
+from app.services.token_versions import token_versions, used_refresh_tokens
+
+logger = logging.getLogger(__name__)
 
 class AuthService:
     @staticmethod
@@ -28,8 +36,17 @@ class AuthService:
         user = AuthService.get_user_by_email(db, email)
         if not user:
             return None
-        if not verify_password(password, user.password_hash):
+        verified, new_hash = verify_and_update_password(password, user.password_hash)
+        if not verified:
             return None
+        if new_hash is not None:
+            # Stored at a different bcrypt cost than configured: upgrade in place
+            user.password_hash = new_hash
+            try:
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.warning("Could not rehash password for user %s", user.id, exc_info=True)
         return user
 
     @staticmethod
@@ -38,6 +55,9 @@ class AuthService:
         if not user:
             return None
         
+        if settings.claims_tokens:
+            return {**AuthService.issue_tokens(user), "user": user}
+        
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
         access_token = create_access_token(
             data={"sub": str(user.id)}, expires_delta=access_token_expires
@@ -47,4 +67,108 @@ class AuthService:
             "access_token": access_token,
             "token_type": "bearer",
             "user": user
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def issue_tokens(user: User) -> dict:
+        """Short-lived claims access token plus a refresh token"""
+        issued_at = time.time()
+        tier = user.subscription_tier
+        expires_in = settings.claims_access_token_expire_minutes * 60
+        access_token = create_access_token(
+            data={
+                "sub": str(user.id),
+                "typ": "access",
+                "ver": user.token_version or 0,
+                "iat": issued_at,
+                "act": bool(user.is_active),
+                "adm": bool(user.is_superuser),
+                "tier": tier.value if hasattr(tier, "value") else tier,
+            },
+            expires_delta=timedelta(seconds=expires_in)
+        )
+        refresh_token = create_access_token(
+            data={
+                "sub": str(user.id),
+                "typ": "refresh",
+                "ver": user.token_version or 0,
+                "iat": issued_at,
+                "jti": uuid.uuid4().hex,
+            },
+            expires_delta=timedelta(days=settings.refresh_token_expire_days)
+        )
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": expires_in
+        }
+
+    @staticmethod
+    def refresh_tokens(db: Session, refresh_token: str) -> Optional[dict]:
+        """New token pair for a valid, unrevoked, unused refresh token.
+
+        The refresh token is spent by the exchange. Presenting it again
+        revokes every token issued to the user, since one of the two callers
+        holds a stolen copy.
+        """
+        payload = decode_token(refresh_token)
+        if not payload or payload.get("typ") != "refresh":
+            return None
+        try:
+            user_id = uuid.UUID(payload.get("sub"))
+        except (TypeError, ValueError):
+            return None
+        
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user or not user.is_active or payload.get("ver") != user.token_version:
+            return None
+        # Tokens issued before rotation carry no id; the token itself stands in
+        jti = payload.get("jti") or hashlib.sha256(refresh_token.encode()).hexdigest()
+        if not used_refresh_tokens.mark_used(jti, payload.get("exp", 0) - time.time()):
+            logger.warning("Refresh token reused for user %s; revoking all tokens", user.id)
+            AuthService.revoke_tokens(db, user)
+            return None
+        return AuthService.issue_tokens(user)
+
+    @staticmethod
+    def revoke_tokens(db: Session, user: User):
+        """Invalidate every claims and refresh token issued to the user so far"""
+        user.token_version = (user.token_version or 0) + 1
+        db.commit()
+
+    @staticmethod
+    def user_from_claims(db: Session, payload: dict) -> Optional[User]:
+        """Resolve a claims access token, normally without reading ``users``.
+
+        Returns None for revoked or malformed tokens. If the user changed
+        since the token was issued the row is loaded instead. Otherwise the
+        result is a persistent ``User`` holding only the claimed columns;
+        any other attribute is loaded from the database on first access.
+        """
+        if payload.get("typ") != "access":
+            return None
+        try:
+            user_id = uuid.UUID(payload.get("sub"))
+        except (TypeError, ValueError):
+            return None
+        
+        entry = token_versions.get(db, user_id)
+        if entry is None:
+            return None
+        version, changed_at, profile_version = entry
+        if payload.get("ver") != version:
+            return None
+        if payload.get("iat", 0) < changed_at:
+            return db.query(User).filter(User.id == user_id).first()
+        
+        user = User()
+        set_committed_value(user, "id", user_id)
+        set_committed_value(user, "token_version", version)
+        set_committed_value(user, "profile_version", profile_version)
+        set_committed_value(user, "is_active", payload.get("act"))
+        set_committed_value(user, "is_superuser", payload.get("adm"))
+        set_committed_value(user, "subscription_tier", SubscriptionTier(payload.get("tier")))
+        make_transient_to_detached(user)
+        db.add(user)
+        return user
\ No newline at end of file
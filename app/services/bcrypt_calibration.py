@@ -0,0 +1,88 @@
+"""Pick a bcrypt cost for this host.
+
+Times ``bcrypt_sha256`` hashes at increasing rounds and recommends the
+highest cost whose median hash time stays within ``--target-ms``. Each round
+doubles the work, so the search stops at the first cost over the target.
+Run it on the hardware that serves logins, then set ``BCRYPT_ROUNDS``;
+existing hashes move to the new cost as their users log in.
+
+    python -m app.services.bcrypt_calibration --target-ms 250
+    python -m app.services.bcrypt_calibration --target-ms 250 --env-file .env
+"""
+import argparse
+import logging
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# passlib rejects costs outside bcrypt's 4..31
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+def time_hash(rounds: int, samples: int = 3) -> float:
+    """Median seconds for one bcrypt_sha256 hash at ``rounds``"""
+    from passlib.hash import bcrypt_sha256
+
+    handler = bcrypt_sha256.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def calibrate(target_ms: float, min_rounds: int = 10, max_rounds: int = 16,
+              samples: int = 3) -> Dict:
+    """Timings per cost and the highest cost within ``target_ms`` (``min_rounds`` if none is)"""
+    timings: List[Dict] = []
+    recommended = min_rounds
+    for rounds in range(max(min_rounds, MIN_ROUNDS), min(max_rounds, MAX_ROUNDS) + 1):
+        ms = time_hash(rounds, samples) * 1000
+        timings.append({"rounds": rounds, "ms": round(ms, 1)})
+        logger.info("rounds=%d %.1f ms", rounds, ms)
+        if ms > target_ms:
+            break
+        recommended = rounds
+    return {"target_ms": target_ms, "recommended_rounds": recommended, "timings": timings}
+
+def write_env(path: Path, rounds: int):
+    """Set BCRYPT_ROUNDS in an env file, replacing an existing line"""
+    line = f"BCRYPT_ROUNDS={rounds}"
+    text = path.read_text() if path.exists() else ""
+    if re.search(r"^BCRYPT_ROUNDS=.*$", text, flags=re.MULTILINE):
+        text = re.sub(r"^BCRYPT_ROUNDS=.*$", line, text, flags=re.MULTILINE)
+    else:
+        text = text + ("" if not text or text.endswith("\n") else "\n") + line + "\n"
+    path.write_text(text)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt on this host and recommend BCRYPT_ROUNDS")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="hash (and so login verify) time to aim for")
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=3, help="hashes timed per cost")
+    parser.add_argument("--env-file", help="write BCRYPT_ROUNDS into this env file")
+    args = parser.parse_args(argv)
+
+    result = calibrate(args.target_ms, args.min_rounds, args.max_rounds, args.samples)
+    print(f"{'rounds':>6} {'ms':>8}")
+    for timing in result["timings"]:
+        print(f"{timing['rounds']:>6} {timing['ms']:>8.1f}")
+    print(f"Current BCRYPT_ROUNDS={settings.bcrypt_rounds}; "
+          f"recommended BCRYPT_ROUNDS={result['recommended_rounds']} for {args.target_ms:g} ms")
+
+    if args.env_file:
+        write_env(Path(args.env_file), result["recommended_rounds"])
+        print(f"Wrote BCRYPT_ROUNDS={result['recommended_rounds']} to {args.env_file}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Cached dependency probes for the readiness endpoint.
+
+A background thread probes the database and Redis every
+``health_check_interval_seconds`` and stores the result; ``/health/ready``
+only reads that snapshot, so load balancer checks never touch Postgres
+directly. Pool saturation and Paystack state are read from in-process
+counters, which is O(1) as well. Only the database (and its pool) gates
+readiness. Redis and Paystack are reported but do not fail it. Every Redis
+consumer falls back to process-local state, so a Redis outage reports
+``degraded``. Without Paystack only new payments are affected.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.db.session import engine as default_engine
+from app.core.logs import log_pipeline
+from app.services.paystack import PaystackService
+
+logger = logging.getLogger(__name__)
+
+def _timed(probe) -> Dict:
+    started = time.perf_counter()
+    try:
+        probe()
+        status = {"status": "ok"}
+    except Exception as e:
+        status = {"status": "error", "error": str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__}
+    status["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return status
+
+def pool_status(engine: Engine) -> Dict:
+    """Connections in use against the pool's capacity (size + max overflow)"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"status": "ok", "pool": type(pool).__name__}
+
+    in_use = pool.checkedout()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if max_overflow < 0:
+        # Unbounded overflow can never saturate
+        return {"status": "ok", "in_use": in_use, "capacity": None}
+
+    capacity = pool.size() + max_overflow
+    saturation = in_use / capacity if capacity else 0.0
+    return {
+        "status": "saturated" if saturation >= settings.health_pool_saturation_threshold else "ok",
+        "in_use": in_use,
+        "capacity": capacity,
+        "saturation": round(saturation, 3),
+    }
+
+class HealthMonitor:
+    """Probes dependencies in the background and serves the last result"""
+
+    def __init__(self, interval: Optional[float] = None, engine: Optional[Engine] = None):
+        self.interval = interval if interval is not None else settings.health_check_interval_seconds
+        self.engine = engine or default_engine
+        self._snapshot: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _probe_database(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    def refresh(self) -> Dict:
+        """Run the network probes now and store the result"""
+        checks = {"database": _timed(self._probe_database)}
+        client = get_redis()
+        checks["redis"] = _timed(client.ping) if client is not None else {"status": "disabled"}
+
+        with self._lock:
+            self._snapshot = checks
+            self._checked_at = time.time()
+        return checks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Health probe failed")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def readiness(self) -> Dict:
+        """Cached probe results plus live pool and Paystack state"""
+        with self._lock:
+            snapshot, checked_at = self._snapshot, self._checked_at
+        if snapshot is None:
+            # First call before the app's startup hook ran (e.g. in tests)
+            snapshot = self.refresh()
+            checked_at = self._checked_at
+            self.start()
+
+        age = time.time() - checked_at
+        checks = dict(snapshot)
+        checks["pool"] = pool_status(self.engine)
+        checks["paystack"] = PaystackService.status()
+        checks["logging"] = log_pipeline.status()
+
+        # A stuck probe thread must not keep reporting an old "ok"
+        stale = age > self.interval * 3
+        ready = (
+            not stale
+            and checks["database"]["status"] == "ok"
+            and checks["pool"]["status"] == "ok"
+        )
+        if not ready:
+            status = "unavailable"
+        elif checks["redis"]["status"] not in ("ok", "disabled"):
+            status = "degraded"
+        else:
+            status = "ready"
+        return {
+            "status": status,
+            "checked_at": checked_at,
+            "age_seconds": round(age, 3),
+            "stale": stale,
+            "checks": checks,
+        }
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,144 @@
+"""Idempotency-Key handling for mutating endpoints.
+
+A client sends ``Idempotency-Key: <any unique string>`` with a POST/PATCH. The
+first request with a key claims it and runs; its response is stored for
+``idempotency_ttl_seconds`` and any retry with the same key gets that response
+back (``Idempotent-Replayed: true``) without running the endpoint again.
+A duplicate that arrives while the first is still running waits for it, up to
+``idempotency_wait_seconds``, then gets 409.
+
+Keys are scoped per user and bound to the request: reusing a key for a
+different method, path or body is a 422. Server errors (5xx) release the key
+so the request can be retried.
+
+Records live in Redis when it is configured (shared by every process) and
+otherwise in a process-local TTL cache. The flow is split in two:
+``idempotency_key`` (a dependency, run after authentication) claims or
+replays, and ``IdempotencyMiddleware`` stores the response of a claimed
+request once it has been sent.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+
+MAX_KEY_LENGTH = 255
+
+# How often a duplicate checks whether the first request has finished
+POLL_SECONDS = 0.05
+
+class IdempotentReplay(Exception):
+    """Raised by the dependency to answer with a stored response"""
+
+    def __init__(self, record: Dict):
+        self.status_code = record["status"]
+        self.headers: List[Tuple[str, str]] = record["headers"]
+        self.body = base64.b64decode(record["body"])
+
+def fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}?{query}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+class IdempotencyStore:
+    KEY_PREFIX = "idempotency:"
+
+    def __init__(self, ttl: Optional[float] = None, lock_ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable] = asyncio.sleep):
+        self.ttl = ttl if ttl is not None else settings.idempotency_ttl_seconds
+        # A claim whose process died is given up after this long
+        self.lock_ttl = lock_ttl if lock_ttl is not None else settings.idempotency_lock_seconds
+        self._local = TTLCache(maxsize=100000, ttl=self.ttl)
+        self._local_lock = threading.Lock()
+        self.clock = clock
+        self.sleep = sleep
+
+    def _claim_local(self, key: str, pending: Dict) -> Optional[Dict]:
+        with self._local_lock:
+            existing = self._local.get(key)
+            if existing is None:
+                self._local.set(key, pending, ttl=self.lock_ttl)
+            return existing
+
+    def claim(self, key: str, request_fingerprint: str) -> Optional[Dict]:
+        """Claim ``key``; returns None if claimed, else the existing pending or done record"""
+        pending = {"state": PENDING, "fingerprint": request_fingerprint}
+        client = get_redis()
+        if client is None:
+            return self._claim_local(key, pending)
+
+        try:
+            if client.set(self.KEY_PREFIX + key, json.dumps(pending), nx=True, ex=int(self.lock_ttl)):
+                return None
+            existing = client.get(self.KEY_PREFIX + key)
+        except Exception:
+            logger.warning("Idempotency claim failed in Redis; using the local store", exc_info=True)
+            return self._claim_local(key, pending)
+        if existing is None:
+            # Expired between the two calls
+            return self.claim(key, request_fingerprint)
+        return json.loads(existing)
+
+    async def claim_or_wait(self, key: str, request_fingerprint: str,
+                            wait_seconds: Optional[float] = None) -> Optional[Dict]:
+        """Claim ``key``, or wait up to ``wait_seconds`` for its holder to finish.
+
+        Returns None once claimed. Otherwise returns the record that ended the
+        wait: a done record to replay, a record for a different fingerprint,
+        or the pending record still held when time ran out.
+        """
+        wait_seconds = wait_seconds if wait_seconds is not None else settings.idempotency_wait_seconds
+        deadline = self.clock() + wait_seconds
+        while True:
+            record = await run_in_threadpool(self.claim, key, request_fingerprint)
+            if record is None or record["fingerprint"] != request_fingerprint or record["state"] == DONE:
+                return record
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return record
+            # Coalesce: wait for the first request's response
+            await self.sleep(min(POLL_SECONDS, remaining))
+
+    def complete(self, key: str, request_fingerprint: str, status: int,
+                 headers: List[Tuple[str, str]], body: bytes):
+        record = {
+            "state": DONE,
+            "fingerprint": request_fingerprint,
+            "status": status,
+            "headers": headers,
+            "body": base64.b64encode(body).decode(),
+        }
+        self._local.set(key, record)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.set(self.KEY_PREFIX + key, json.dumps(record), ex=int(self.ttl))
+            except Exception:
+                logger.warning("Could not store idempotent response for %s", key, exc_info=True)
+
+    def release(self, key: str):
+        self._local.pop(key)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self.KEY_PREFIX + key)
+            except Exception:
+                logger.warning("Could not release idempotency key %s", key, exc_info=True)
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import smtplib
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Notification:
+    to: str
+    subject: str
+    body: str
+    user_id: Optional[str] = None
+    kind: str = "generic"
+    extra: Dict = field(default_factory=dict)
+
+class NotificationSender(ABC):
+    """Base class for notification transports"""
+
+    @abstractmethod
+    async def send(self, notification: Notification) -> None:
+        """Deliver one notification; raise to report it as failed"""
+
+class ConsoleNotificationSender(NotificationSender):
+    """Logs notifications instead of delivering them (development default)"""
+
+    async def send(self, notification: Notification) -> None:
+        logger.info("Notification to %s: %s", notification.to, notification.subject)
+
+class FileNotificationSender(NotificationSender):
+    """Appends notifications as JSON lines to a local file, for tests and demos"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, line: str):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+
+    async def send(self, notification: Notification) -> None:
+        line = json.dumps({
+            "to": notification.to,
+            "subject": notification.subject,
+            "body": notification.body,
+            "user_id": notification.user_id,
+            "kind": notification.kind,
+            "sent_at": datetime.utcnow().isoformat(),
+        })
+        await asyncio.to_thread(self._write, line)
+
+class SMTPNotificationSender(NotificationSender):
+    """Sends email over SMTP; point it at a debug server (e.g. port 1025) locally"""
+
+    def __init__(self, host: str, port: int, sender: str,
+                 username: str = "", password: str = "", use_tls: bool = False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+
+    def _deliver(self, notification: Notification):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = notification.to
+        message["Subject"] = notification.subject
+        message.set_content(notification.body)
+
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+    async def send(self, notification: Notification) -> None:
+        await asyncio.to_thread(self._deliver, notification)
+
+def get_notification_sender() -> NotificationSender:
+    backend = settings.notification_backend.lower()
+    if backend == "file":
+        return FileNotificationSender(settings.notification_file_path)
+    if backend == "smtp":
+        return SMTPNotificationSender(
+            host=settings.smtp_host,
+            port=settings.smtp_port,
+            sender=settings.notification_from_email,
+            username=settings.smtp_username,
+            password=settings.smtp_password,
+            use_tls=settings.smtp_use_tls,
+        )
+    return ConsoleNotificationSender()
+
+async def send_all(
+    sender: NotificationSender,
+    notifications: Iterable[Notification],
+    concurrency: Optional[int] = None,
+) -> Tuple[List[Notification], List[Notification]]:
+    """Send notifications with at most ``concurrency`` in flight.
+
+    Returns ``(sent, failed)``; one failure never aborts the rest.
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.notification_concurrency)
+    sent: List[Notification] = []
+    failed: List[Notification] = []
+
+    async def _send(notification: Notification):
+        async with semaphore:
+            try:
+                await sender.send(notification)
+                sent.append(notification)
+            except Exception:
+                logger.warning("Failed to send notification to %s", notification.to, exc_info=True)
+                failed.append(notification)
+
+    await asyncio.gather(*(_send(n) for n in notifications))
+    return sent, failed
@@ -0,0 +1,140 @@
+"""Transactional outbox for subscription side effects.
+
+Handlers call :meth:`OutboxService.enqueue` inside the transaction that makes
+the change; nothing is sent until that transaction commits, and nothing is
+lost if the process dies before delivery. ``app.tasks.outbox`` drains the
+table in batches.
+"""
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.outbox import OutboxEvent
+from app.models.user import User
+from app.services.notifications import Notification, NotificationSender, get_notification_sender
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_FAILED = "payment.failed"
+SUBSCRIPTION_ACTIVATED = "subscription.activated"
+SUBSCRIPTION_DOWNGRADED = "subscription.downgraded"
+
+EMAIL = "email"
+WEBHOOK = "webhook"
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):
+        return value.value
+    return str(value)
+
+def user_payload(user: User, **extra) -> Dict:
+    """Snapshot of the user taken at enqueue time; delivery never reads ``users``"""
+    tier = user.subscription_tier
+    return {
+        "user_id": str(user.id),
+        "email": user.email,
+        "full_name": user.full_name,
+        "tier": tier.value if hasattr(tier, "value") else tier,
+        "subscription_end_date": user.subscription_end_date,
+        **extra,
+    }
+
+class OutboxService:
+    @staticmethod
+    def destinations() -> List[str]:
+        names = [EMAIL]
+        if settings.outbox_webhook_url:
+            names.append(WEBHOOK)
+        return names
+
+    @staticmethod
+    def enqueue(db: Session, event_type: str, payload: Dict) -> List[OutboxEvent]:
+        """Add one outbox row per destination to the current transaction (no commit)"""
+        body = json.dumps(payload, default=_json_default)
+        events = [
+            OutboxEvent(event_type=event_type, destination=destination, payload=body)
+            for destination in OutboxService.destinations()
+        ]
+        db.add_all(events)
+        return events
+
+def render_email(event_type: str, payload: Dict) -> Notification:
+    name = payload.get("full_name") or payload.get("email")
+    tier = payload.get("tier") or payload.get("plan_id")
+    end_date = (payload.get("subscription_end_date") or "")[:10]
+
+    if event_type == PAYMENT_FAILED:
+        subject = "Your subscription payment failed"
+        body = (f"Hi {name},\n\nWe could not process your latest payment. "
+                "Please update your payment method to keep your subscription.")
+    elif event_type == SUBSCRIPTION_ACTIVATED:
+        subject = f"Your {tier} subscription is active"
+        body = f"Hi {name},\n\nThanks for your payment. Your {tier} plan is active until {end_date}."
+    elif event_type == SUBSCRIPTION_DOWNGRADED:
+        subject = "Your subscription has ended"
+        body = (f"Hi {name},\n\nYour paid subscription has ended and your account is now on the "
+                "Free plan. You can upgrade again at any time.")
+    else:
+        raise ValueError(f"No email template for {event_type}")
+
+    return Notification(
+        to=payload["email"], subject=subject, body=body,
+        user_id=payload.get("user_id"), kind=event_type,
+    )
+
+class OutboxDestination(ABC):
+    """Delivers outbox rows for one destination; ``concurrency`` caps in-flight sends"""
+
+    name: str = ""
+    concurrency: int = 1
+
+    @abstractmethod
+    async def deliver(self, event: OutboxEvent, payload: Dict) -> None:
+        """Send one event; raise to have it retried"""
+
+    async def aclose(self):
+        pass
+
+class EmailDestination(OutboxDestination):
+    name = EMAIL
+
+    def __init__(self, sender: Optional[NotificationSender] = None):
+        self.sender = sender or get_notification_sender()
+        self.concurrency = settings.outbox_email_concurrency
+
+    async def deliver(self, event: OutboxEvent, payload: Dict) -> None:
+        await self.sender.send(render_email(event.event_type, payload))
+
+class WebhookDestination(OutboxDestination):
+    """POSTs events to ``outbox_webhook_url``; the event id doubles as an idempotency key"""
+
+    name = WEBHOOK
+
+    def __init__(self, url: Optional[str] = None, transport=None):
+        import httpx
+
+        self.url = url or settings.outbox_webhook_url
+        self.concurrency = settings.outbox_webhook_concurrency
+        self.client = httpx.AsyncClient(timeout=10.0, transport=transport)
+
+    async def deliver(self, event: OutboxEvent, payload: Dict) -> None:
+        response = await self.client.post(
+            self.url,
+            json={"id": str(event.id), "type": event.event_type, "data": payload},
+            headers={"Idempotency-Key": str(event.id)},
+        )
+        response.raise_for_status()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+def get_destinations() -> Dict[str, OutboxDestination]:
+    destinations: Dict[str, OutboxDestination] = {EMAIL: EmailDestination()}
+    if settings.outbox_webhook_url:
+        destinations[WEBHOOK] = WebhookDestination()
+    return destinations
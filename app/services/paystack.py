@@ -1,11 +1,97 @@
 import hmac
 import hashlib
-import requests
-from typing import Dict, Optional
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+from app.core.circuit_breaker import Bulkhead, CircuitBreaker, DependencyUnavailable
 from app.core.config import settings
 
+# HTTP clients are imported on first use to keep app startup light
+if TYPE_CHECKING:
+    import httpx
+
 class PaystackService:
     BASE_URL = "https://api.paystack.co"
+
+    # Outcome of recent API calls from this process, reported by /health/ready
+    FAILURE_THRESHOLD = 3
+    consecutive_failures = 0
+    last_success_at: Optional[float] = None
+    last_failure_at: Optional[float] = None
+
+    # Calls fail fast with DependencyUnavailable (503) while Paystack is
+    # failing or slow, and at most paystack_max_concurrent_calls worker
+    # threads can be waiting on it at once
+    breaker = CircuitBreaker(
+        "paystack",
+        failure_rate=settings.paystack_breaker_failure_rate,
+        slow_call_seconds=settings.paystack_breaker_slow_call_seconds,
+        slow_call_rate=settings.paystack_breaker_slow_call_rate,
+        minimum_calls=settings.paystack_breaker_minimum_calls,
+        window_seconds=settings.paystack_breaker_window_seconds,
+        open_seconds=settings.paystack_breaker_open_seconds,
+        half_open_calls=settings.paystack_breaker_half_open_calls,
+    )
+    bulkhead = Bulkhead(
+        "paystack",
+        max_concurrent=settings.paystack_max_concurrent_calls,
+        max_wait_seconds=settings.paystack_bulkhead_wait_seconds,
+    )
+    
+    @classmethod
+    def record_result(cls, ok: bool):
+        if ok:
+            cls.consecutive_failures = 0
+            cls.last_success_at = time.time()
+        else:
+            cls.consecutive_failures += 1
+            cls.last_failure_at = time.time()
+    
+    @classmethod
+    def status(cls) -> Dict:
+        """Reachability as seen by recent calls; no request is made"""
+        circuit = cls.breaker.metrics()
+        degraded = cls.consecutive_failures >= cls.FAILURE_THRESHOLD or circuit["state"] != CircuitBreaker.CLOSED
+        return {
+            "status": "degraded" if degraded else "ok",
+            "consecutive_failures": cls.consecutive_failures,
+            "last_success_at": cls.last_success_at,
+            "last_failure_at": cls.last_failure_at,
+            "circuit": circuit,
+            "bulkhead": cls.bulkhead.metrics(),
+        }
+    
+    @classmethod
+    def ensure_available(cls):
+        """Raise DependencyUnavailable now if the circuit is open, before doing any work"""
+        cls.breaker.check()
+    
+    @classmethod
+    def _request(cls, method: str, url: str, **kwargs) -> Dict:
+        import requests
+        # The breaker goes first: an open circuit fails fast instead of
+        # queueing for a bulkhead slot
+        permit = cls.breaker.before_call()
+        started = None
+        ok = False
+        try:
+            with cls.bulkhead:
+                started = time.monotonic()
+                try:
+                    response = requests.request(
+                        method, url, headers=cls._get_headers(),
+                        timeout=settings.paystack_timeout_seconds, **kwargs
+                    )
+                    # 4xx means Paystack answered; only server errors count against it
+                    ok = response.status_code < 500
+                except requests.RequestException as e:
+                    raise DependencyUnavailable("paystack", f"request failed ({type(e).__name__})") from e
+        finally:
+            if started is None:
+                cls.breaker.cancel(permit)
+            else:
+                cls.breaker.record(permit, ok, time.monotonic() - started)
+                cls.record_result(ok)
+        return response.json()
     
     @staticmethod
     def _get_headers():
@@ -26,24 +112,40 @@ class PaystackService:
             "callback_url": callback_url,
             "metadata": metadata or {}
         }
-        response = requests.post(url, json=payload, headers=cls._get_headers())
-        return response.json()
+        return cls._request("POST", url, json=payload)
     
     @classmethod
     def verify_transaction(cls, reference: str) -> Dict:
         url = f"{cls.BASE_URL}/transaction/verify/{reference}"
-        response = requests.get(url, headers=cls._get_headers())
-        return response.json()
+        return cls._request("GET", url)
+    
+    @classmethod
+    def async_client(cls, transport: Optional["httpx.AsyncBaseTransport"] = None) -> "httpx.AsyncClient":
+        """Async client for bulk work (reconciliation); pass a transport to fake Paystack"""
+        import httpx
+        return httpx.AsyncClient(
+            base_url=cls.BASE_URL,
+            headers=cls._get_headers(),
+            timeout=settings.paystack_timeout_seconds,
+            transport=transport,
+        )
     
     @classmethod
-    def verify_webhook_signature(cls, signature: str, request_body: bytes) -> bool:
-        """Verify Paystack webhook signature"""
-        # Skip verification if no webhook secret configured (development only)
-        if not settings.paystack_webhook_secret or settings.paystack_webhook_secret == "pk_test_554587fd3e6761ebd3ced3696ea9f9d010c154f6":
+    def verify_webhook_signature(cls, signature: Optional[str], request_body: bytes) -> bool:
+        """Check Paystack's HMAC-SHA512 of the raw request body.
+
+        Paystack signs with the account's secret key; PAYSTACK_WEBHOOK_SECRET
+        overrides it. With neither configured (local development) every
+        request is accepted.
+        """
+        secret = settings.paystack_webhook_secret or settings.paystack_secret_key
+        if not secret:
             return True
+        if not signature:
+            return False
         
         expected_signature = hmac.new(
-            settings.paystack_webhook_secret.encode(),
+            secret.encode(),
             request_body,
             hashlib.sha512
         ).hexdigest()
@@ -0,0 +1,82 @@
+"""Weak ETags for the polled profile endpoints.
+
+``/users/me`` and ``/subscriptions/status`` are versioned by the user's
+``profile_version``, a counter the database increments with every change to a
+field these responses show (timestamps can repeat within their resolution).
+``TokenVersionMap`` caches it, and commits that change such a field drop the
+entry, so it is current.
+
+With a claims token the version comes from that map and the fields needed
+for ``/subscriptions/status`` from a small per-process cache keyed by
+``(user_id, version)``. An unchanged poll is then answered 304 with no
+database query and no serialization. With a legacy token the users row is
+already loaded per request; the 304 still skips serialization.
+"""
+import hashlib
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import SubscriptionTier, User
+from app.services.token_versions import token_versions
+
+class PrincipalCache:
+    def __init__(self, ttl: Optional[float] = None):
+        self._subscriptions = TTLCache(
+            maxsize=100000, ttl=ttl if ttl is not None else settings.principal_cache_seconds
+        )
+
+    def version(self, db: Session, user: User) -> int:
+        state = inspect(user)
+        if "profile_version" in state.dict:
+            # Row already loaded: it is the freshest source
+            return user.profile_version
+        entry = token_versions.get(db, user.id)
+        return entry[2] if entry is not None else 0
+
+    @staticmethod
+    def _etag(*parts) -> str:
+        key = "|".join(str(p) for p in parts)
+        return 'W/"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    def profile_etag(self, db: Session, user: User) -> str:
+        return self._etag("me", user.id, self.version(db, user))
+
+    def subscription(self, db: Session, user: User) -> Dict:
+        """Tier, dates and renewal flag at the user's current version"""
+        key = (user.id, self.version(db, user))
+        entry = self._subscriptions.get(key)
+        if entry is None:
+            entry = {
+                "email": user.email,
+                "subscription_tier": user.subscription_tier,
+                "subscription_start_date": user.subscription_start_date,
+                "subscription_end_date": user.subscription_end_date,
+                "auto_renew": user.auto_renew,
+            }
+            self._subscriptions.set(key, entry)
+        return entry
+
+    @staticmethod
+    def subscription_state(entry: Dict):
+        """``(is_active, days_remaining)``, which change with time alone"""
+        end_date = entry["subscription_end_date"]
+        tier = entry["subscription_tier"]
+        if tier == SubscriptionTier.FREE:
+            is_active = True
+        else:
+            is_active = end_date is not None and datetime.now(end_date.tzinfo) < end_date
+        days_remaining = (
+            (end_date - datetime.now(end_date.tzinfo)).days
+            if end_date and tier != "free" else None
+        )
+        return is_active, days_remaining
+
+    def status_etag(self, db: Session, user: User, entry: Dict) -> str:
+        return self._etag("status", user.id, self.version(db, user), *self.subscription_state(entry))
+
+principal_cache = PrincipalCache()
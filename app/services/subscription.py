@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.transaction import Transaction, TransactionStatus
+from app.services.outbox import OutboxService, SUBSCRIPTION_ACTIVATED, user_payload
+# Registers the session hook that records tier and date changes in subscription_events
+import app.services.subscription_history  # noqa: F401
+
+class SubscriptionService:
+    @staticmethod
+    def subscription_window(metadata: Optional[Dict]) -> Tuple[datetime, datetime]:
+        """Start/end dates stored in the payment metadata by subscribe_to_plan"""
+        metadata = metadata or {}
+        now = datetime.utcnow()
+        start_date = datetime.fromisoformat(metadata.get("start_date", now.isoformat()))
+        end_date = datetime.fromisoformat(metadata.get("end_date", (now + timedelta(days=30)).isoformat()))
+        return start_date, end_date
+
+    @staticmethod
+    def activate(db: Session, transaction: Transaction, data: Dict,
+                 user: Optional[User] = None) -> Optional[User]:
+        """Mark the transaction paid and move the user onto its plan.
+
+        Pass ``user`` when it is already loaded. Does not commit; the caller
+        commits once and then schedules deadlines for the returned user.
+        """
+        start_date, end_date = SubscriptionService.subscription_window(data.get("metadata"))
+
+        transaction.status = TransactionStatus.SUCCESS
+        transaction.paystack_transaction_id = str(data.get("id"))
+        transaction.payment_channel = data.get("channel")
+        transaction.paid_at = data.get("paid_at")
+
+        if user is None:
+            user = db.query(User).filter(User.id == transaction.user_id).first()
+        if user:
+            user.subscription_tier = transaction.plan_id
+            user.subscription_start_date = start_date
+            user.subscription_end_date = end_date
+            OutboxService.enqueue(db, SUBSCRIPTION_ACTIVATED, user_payload(
+                user, reference=transaction.reference, plan_id=transaction.plan_id,
+                amount=float(transaction.amount)
+            ))
+        return user
+
+    @staticmethod
+    def apply_verification(db: Session, transaction: Transaction, data: Dict) -> Optional[User]:
+        """Apply a Paystack verify result to a transaction.
+
+        Returns the activated user on success. Paystack's in-progress statuses
+        ("ongoing", "pending", ...) leave the transaction untouched.
+        """
+        gateway_status = data.get("status")
+        if gateway_status == "success":
+            return SubscriptionService.activate(db, transaction, data)
+        if gateway_status == "abandoned":
+            transaction.status = TransactionStatus.ABANDONED
+        elif gateway_status in ("failed", "reversed"):
+            transaction.status = TransactionStatus.FAILED
+        return None
@@ -0,0 +1,243 @@
+"""Daily subscription snapshots and the analytics read from them.
+
+:meth:`SnapshotService.snapshot` materialises one UTC day: active users and
+MRR per tier at the end of the day, the day's movements between tiers from
+``subscription_events``, and paying users per first-paid-month cohort. It is
+an upsert, so re-running a day replaces it. Active counts are read from
+``users`` when the job runs, shortly after the day ends.
+
+The analytics endpoints only read the snapshot tables. Rows are loaded into
+per-column lists aligned by day and the series are computed column-wise.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from app.core.plans import SUBSCRIPTION_PLANS
+from app.db.dialect import month_start, upsert_insert
+from app.models.subscription_history import CohortSnapshot, SubscriptionEvent, SubscriptionSnapshot
+from app.models.user import User, SubscriptionTier
+from app.services.subscription_history import FREE, tier_value
+
+FLOW_COLUMNS = ("new", "churned", "upgraded_in", "upgraded_out", "downgraded_in", "downgraded_out", "renewals")
+
+def _day_bounds(day: date):
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+def _ratio(numerator, denominator) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+class SnapshotService:
+    @staticmethod
+    def snapshot(db: Session, day: date) -> Dict:
+        """Materialise ``day`` into the snapshot tables and commit"""
+        day_start, day_end = _day_bounds(day)
+        paid_active = and_(
+            User.subscription_tier != SubscriptionTier.FREE,
+            User.subscription_end_date >= day_end
+        )
+
+        rows: Dict[str, Dict] = {}
+        def row(tier: str) -> Dict:
+            if tier not in rows:
+                rows[tier] = {"day": day, "tier": tier, "active_users": 0, "mrr": Decimal(0), **{c: 0 for c in FLOW_COLUMNS}}
+            return rows[tier]
+        for tier in SUBSCRIPTION_PLANS:
+            row(tier)
+
+        total_users = db.query(func.count(User.id)).filter(User.created_at < day_end).scalar() or 0
+        paying = 0
+        for tier, count in db.query(User.subscription_tier, func.count(User.id)).filter(
+            paid_active, User.created_at < day_end
+        ).group_by(User.subscription_tier):
+            entry = row(tier_value(tier))
+            entry["active_users"] = count
+            entry["mrr"] = Decimal(SUBSCRIPTION_PLANS.get(entry["tier"], {}).get("price", 0)) * count
+            paying += count
+        row(FREE)["active_users"] = total_users - paying
+
+        flows = db.query(
+            SubscriptionEvent.from_tier, SubscriptionEvent.to_tier, SubscriptionEvent.kind, func.count()
+        ).filter(
+            SubscriptionEvent.occurred_at >= day_start,
+            SubscriptionEvent.occurred_at < day_end
+        ).group_by(SubscriptionEvent.from_tier, SubscriptionEvent.to_tier, SubscriptionEvent.kind)
+        for from_tier, to_tier, kind, count in flows:
+            if kind == "new":
+                row(to_tier)["new"] += count
+            elif kind == "churn":
+                row(from_tier)["churned"] += count
+            elif kind == "renewal":
+                row(to_tier)["renewals"] += count
+            elif kind in ("upgrade", "downgrade"):
+                row(to_tier)[f"{kind}d_in"] += count
+                row(from_tier)[f"{kind}d_out"] += count
+
+        # Month of each user's first paid plan, from the event history
+        first_paid = db.query(
+            SubscriptionEvent.user_id,
+            func.min(SubscriptionEvent.occurred_at).label("first_paid_at")
+        ).filter(
+            SubscriptionEvent.to_tier != FREE,
+            SubscriptionEvent.occurred_at < day_end
+        ).group_by(SubscriptionEvent.user_id).subquery()
+        cohort = month_start(db.get_bind(), first_paid.c.first_paid_at)
+        price = case(
+            *[(User.subscription_tier == SubscriptionTier(tier), plan["price"]) for tier, plan in SUBSCRIPTION_PLANS.items()],
+            else_=0
+        )
+        cohorts = [
+            {"day": day, "cohort": month, "cohort_size": size, "active_users": active or 0, "mrr": mrr or 0}
+            for month, size, active, mrr in db.query(
+                cohort,
+                func.count(first_paid.c.user_id),
+                func.count(User.id).filter(paid_active),
+                func.sum(case((paid_active, price), else_=0))
+            ).select_from(first_paid).outerjoin(
+                User, User.id == first_paid.c.user_id
+            ).group_by(cohort)
+        ]
+
+        stmt = upsert_insert(db.get_bind(), SubscriptionSnapshot)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SubscriptionSnapshot.day, SubscriptionSnapshot.tier],
+                set_={c: stmt.excluded[c] for c in ("active_users", "mrr") + FLOW_COLUMNS}
+            ),
+            list(rows.values())
+        )
+        if cohorts:
+            stmt = upsert_insert(db.get_bind(), CohortSnapshot)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[CohortSnapshot.day, CohortSnapshot.cohort],
+                    set_={c: stmt.excluded[c] for c in ("cohort_size", "active_users", "mrr")}
+                ),
+                cohorts
+            )
+        db.commit()
+
+        return {
+            "date": day.isoformat(),
+            "paying_users": paying,
+            "mrr": float(sum(entry["mrr"] for entry in rows.values())),
+            "cohorts": len(cohorts)
+        }
+
+class SubscriptionAnalytics:
+    @staticmethod
+    def overview(db: Session, start: date, end: date) -> Dict:
+        """Daily MRR, paying users, churn and net movement between two days, as columns"""
+        snapshots = db.query(SubscriptionSnapshot).filter(
+            SubscriptionSnapshot.day >= start,
+            SubscriptionSnapshot.day <= end
+        ).order_by(SubscriptionSnapshot.day).all()
+
+        days = sorted({s.day for s in snapshots})
+        index = {day: i for i, day in enumerate(days)}
+        width = len(days)
+
+        # tier -> column -> one value per day
+        tiers: Dict[str, Dict[str, List]] = defaultdict(
+            lambda: {c: [0] * width for c in ("active_users", "mrr") + FLOW_COLUMNS}
+        )
+        for s in snapshots:
+            columns = tiers[s.tier]
+            i = index[s.day]
+            columns["active_users"][i] = s.active_users
+            columns["mrr"][i] = float(s.mrr)
+            for c in FLOW_COLUMNS:
+                columns[c][i] = getattr(s, c)
+
+        def total(column: str, paid_only: bool = False) -> List:
+            series = [columns[column] for tier, columns in tiers.items() if not (paid_only and tier == FREE)]
+            return [sum(values) for values in zip(*series)] if series else [0] * width
+
+        mrr = total("mrr")
+        paying = total("active_users", paid_only=True)
+        new = total("new")
+        churned = total("churned")
+        # Churn over the paying base at the start of each day
+        opening = [p - n + c for p, n, c in zip(paying, new, churned)]
+
+        return {
+            "days": [day.isoformat() for day in days],
+            "mrr": mrr,
+            "mrr_change": [0.0] + [b - a for a, b in zip(mrr, mrr[1:])] if mrr else [],
+            "paying_users": paying,
+            "new": new,
+            "churned": churned,
+            "churn_rate": [_ratio(c, o) for c, o in zip(churned, opening)],
+            "net_movement": [n - c for n, c in zip(new, churned)],
+            "tiers": {
+                tier: {
+                    "active_users": columns["active_users"],
+                    "mrr": columns["mrr"],
+                    "net_movement": [
+                        n + ui + di - uo - do - c
+                        for n, ui, di, uo, do, c in zip(
+                            columns["new"], columns["upgraded_in"], columns["downgraded_in"],
+                            columns["upgraded_out"], columns["downgraded_out"], columns["churned"]
+                        )
+                    ]
+                }
+                for tier, columns in sorted(tiers.items())
+            }
+        }
+
+    @staticmethod
+    def cohorts(db: Session, months: int = 12) -> Dict:
+        """Retention and MRR per first-paid-month cohort, one point per month since it started.
+
+        Each month is read from its last snapshot, so the current month shows
+        the latest day.
+        """
+        latest = db.query(func.max(CohortSnapshot.day)).scalar()
+        if latest is None:
+            return {"as_of": None, "cohorts": []}
+        earliest = date(latest.year, latest.month, 1)
+        for _ in range(months - 1):
+            earliest = (earliest - timedelta(days=1)).replace(day=1)
+
+        month_ends = [day for (day,) in db.query(func.max(CohortSnapshot.day)).filter(
+            CohortSnapshot.day >= earliest
+        ).group_by(month_start(db.get_bind(), CohortSnapshot.day))]
+        snapshots = db.query(CohortSnapshot).filter(
+            CohortSnapshot.day.in_(month_ends),
+            CohortSnapshot.cohort >= earliest
+        ).all()
+
+        def month_number(value: date) -> int:
+            return value.year * 12 + value.month - 1
+
+        # Columns over every (cohort, snapshot) pair
+        cohort_col = [month_number(s.cohort) for s in snapshots]
+        offset_col = [month_number(s.day) - c for s, c in zip(snapshots, cohort_col)]
+        size_col = [s.cohort_size for s in snapshots]
+        active_col = [s.active_users for s in snapshots]
+        mrr_col = [float(s.mrr) for s in snapshots]
+        retention_col = [_ratio(a, n) for a, n in zip(active_col, size_col)]
+
+        last = month_number(latest)
+        by_cohort: Dict[int, Dict] = {}
+        for c, o, n, r, m in zip(cohort_col, offset_col, size_col, retention_col, mrr_col):
+            if c not in by_cohort:
+                # One slot per month from the cohort's first to the latest
+                by_cohort[c] = {"size": 0, "retention": [None] * (last - c + 1), "mrr": [None] * (last - c + 1)}
+            entry = by_cohort[c]
+            entry["retention"][o] = r
+            entry["mrr"][o] = m
+            entry["size"] = max(entry["size"], n)
+
+        return {
+            "as_of": latest.isoformat(),
+            "cohorts": [
+                {"cohort": f"{c // 12}-{c % 12 + 1:02d}", **by_cohort[c]}
+                for c in sorted(by_cohort)
+            ]
+        }
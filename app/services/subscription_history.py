@@ -0,0 +1,103 @@
+"""Append-only history of subscription changes.
+
+A ``before_flush`` hook adds a :class:`SubscriptionEvent` for every user whose
+tier or subscription dates are about to change, so the event commits (or rolls
+back) with the change itself. Callers label where a change came from with
+:func:`set_event_source`; unlabelled changes are recorded as ``system``.
+"""
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.plans import get_plan
+from app.models.subscription_history import SubscriptionEvent
+from app.models.user import User
+
+TRACKED_COLUMNS = ("subscription_tier", "subscription_start_date", "subscription_end_date")
+
+FREE = "free"
+
+WEBHOOK = "webhook"
+VERIFY = "verify"
+RECONCILE = "reconcile"
+ADMIN = "admin"
+EXPIRY = "expiry"
+USER = "user"
+TEST = "test"
+REPLAY = "replay"
+SYSTEM = "system"
+
+def set_event_source(db: Session, source: str):
+    """Label subscription events recorded by this session from now on"""
+    db.info["subscription_event_source"] = source
+
+def tier_value(tier) -> Optional[str]:
+    if tier is None:
+        return None
+    return str(getattr(tier, "value", tier)).lower()
+
+def monthly_price(tier) -> Decimal:
+    plan = get_plan(tier_value(tier))
+    return Decimal(plan["price"]) if plan else Decimal(0)
+
+def classify(from_tier: Optional[str], to_tier: str, old_end, new_end) -> str:
+    if from_tier == to_tier:
+        if to_tier != FREE and new_end is not None and (old_end is None or new_end > old_end):
+            return "renewal"
+        return "change"
+    if to_tier == FREE:
+        return "churn" if from_tier is not None else "change"
+    if from_tier in (None, FREE):
+        return "new"
+    return "upgrade" if monthly_price(to_tier) > monthly_price(from_tier) else "downgrade"
+
+def _utc(value):
+    # Dates are assigned naive (utcnow) but load back timezone-aware
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _before_and_after(state, column: str):
+    history = state.attrs[column].history
+    after = history.added[0] if history.added else (history.unchanged[0] if history.unchanged else None)
+    before = history.deleted[0] if history.deleted else after
+    return _utc(before), _utc(after)
+
+# Load the old value when these are assigned, so history is known even for
+# attributes that were expired (e.g. after a commit) when they were set
+for _column in TRACKED_COLUMNS:
+    event.listen(getattr(User, _column), "set", lambda target, value, oldvalue, initiator: None, active_history=True)
+
+@event.listens_for(Session, "before_flush")
+def _record_subscription_changes(session, flush_context, instances):
+    now = datetime.now(timezone.utc)
+    source = session.info.get("subscription_event_source", SYSTEM)
+    for obj in list(session.dirty):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[column].history.has_changes() for column in TRACKED_COLUMNS):
+            continue
+
+        old_tier, new_tier = (tier_value(v) for v in _before_and_after(state, "subscription_tier"))
+        old_start, new_start = _before_and_after(state, "subscription_start_date")
+        old_end, new_end = _before_and_after(state, "subscription_end_date")
+        if old_tier == new_tier and old_start == new_start and old_end == new_end:
+            continue
+
+        session.add(SubscriptionEvent(
+            id=uuid.uuid4(),
+            user_id=obj.id,
+            kind=classify(old_tier, new_tier or FREE, old_end, new_end),
+            source=source,
+            from_tier=old_tier,
+            to_tier=new_tier or FREE,
+            start_date=new_start,
+            end_date=new_end,
+            mrr_delta=monthly_price(new_tier) - monthly_price(old_tier),
+            occurred_at=now,
+        ))
@@ -0,0 +1,174 @@
+"""Per-user token version map for claims tokens.
+
+Claims tokens are trusted without loading the user, so two things are checked
+per request against a small cache of ``(token_version, claims_changed_at,
+profile_version)``:
+
+* a token whose ``ver`` differs from the user's ``token_version`` is revoked;
+* a token issued before the user's last update carries stale claims, and the
+  caller falls back to loading the row.
+
+Entries live in Redis when it is configured (shared by every process, so a
+revocation is seen immediately) and otherwise in a process-local TTL cache.
+Misses read ``users``. A flush that changes a claim, or a field shown by the
+ETagged profile endpoints (``app.services.principal_cache``), increments
+``profile_version`` in the same UPDATE, and the commit drops the user's
+entry, so the next request reloads it. The hooks are registered on every
+``Session`` when this module is imported, which ``app.services`` does.
+
+Only ORM flushes are seen. A Core or bulk update (``update(User)``,
+``query(User).update(...)``) bypasses the flush hooks. Code that changes
+these columns that way must bump ``profile_version`` in the same statement
+and call ``token_versions.invalidate`` after committing.
+
+Refresh tokens are single use. Each carries an id (``jti``) that is recorded
+when it is exchanged, in ``UsedRefreshTokens``. A second exchange of the same
+token means it leaked, so every token issued to that user is revoked.
+"""
+import threading
+import logging
+from datetime import timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Columns copied into claims tokens; changing any of them invalidates the entry
+CLAIM_COLUMNS = ("is_active", "is_superuser", "subscription_tier", "token_version")
+# Also shown by /users/me or /subscriptions/status, whose ETags use profile_version
+PROFILE_COLUMNS = (
+    "email", "full_name", "is_verified",
+    "subscription_start_date", "subscription_end_date", "auto_renew",
+)
+
+def _timestamp(value) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class TokenVersionMap:
+    KEY_PREFIX = "auth:token_version:"
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else settings.token_version_cache_seconds
+        self._local = TTLCache(maxsize=100000, ttl=self.ttl)
+
+    def _load(self, db: Session, user_id) -> Optional[Tuple[int, float, int]]:
+        row = db.query(User.token_version, User.updated_at, User.created_at, User.profile_version).filter(
+            User.id == user_id
+        ).first()
+        if row is None:
+            return None
+        return row.token_version, _timestamp(row.updated_at or row.created_at), row.profile_version
+
+    def get(self, db: Session, user_id) -> Optional[Tuple[int, float, int]]:
+        """``(token_version, claims_changed_at, profile_version)``, or None if the user does not exist"""
+        key = str(user_id)
+        client = get_redis()
+        if client is None:
+            entry = self._local.get(key)
+            if entry is None:
+                entry = self._load(db, user_id)
+                if entry is not None:
+                    self._local.set(key, entry)
+            return entry
+
+        try:
+            cached = client.get(self.KEY_PREFIX + key)
+            if cached and cached.count(":") == 2:
+                version, changed_at, profile_version = cached.split(":")
+                return int(version), float(changed_at), int(profile_version)
+        except Exception:
+            logger.warning("Token version lookup failed; reading users", exc_info=True)
+            return self._load(db, user_id)
+
+        entry = self._load(db, user_id)
+        if entry is not None:
+            try:
+                # Longer than the local TTL is fine: commits delete the key
+                client.setex(self.KEY_PREFIX + key, 86400, ":".join(str(part) for part in entry))
+            except Exception:
+                logger.warning("Could not cache token version for %s", key, exc_info=True)
+        return entry
+
+    def invalidate(self, user_id):
+        key = str(user_id)
+        self._local.pop(key)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self.KEY_PREFIX + key)
+            except Exception:
+                logger.warning("Could not invalidate token version for %s", key, exc_info=True)
+
+token_versions = TokenVersionMap()
+
+class UsedRefreshTokens:
+    """Ids of refresh tokens already exchanged, kept until the token would expire.
+
+    Shared through Redis when configured; otherwise per process, so a token
+    replayed against another process is not caught.
+    """
+    KEY_PREFIX = "auth:refresh_used:"
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else settings.refresh_token_expire_days * 86400
+        self._local = TTLCache(maxsize=100000, ttl=self.ttl)
+        self._local_lock = threading.Lock()
+
+    def _mark_local(self, jti: str, ttl: float) -> bool:
+        with self._local_lock:
+            if self._local.get(jti) is not None:
+                return False
+            self._local.set(jti, True, ttl=ttl)
+            return True
+
+    def mark_used(self, jti: str, ttl: Optional[float] = None) -> bool:
+        """Record ``jti`` as exchanged; False if it already was"""
+        ttl = max(ttl if ttl is not None else self.ttl, 1)
+        client = get_redis()
+        if client is None:
+            return self._mark_local(jti, ttl)
+        try:
+            return bool(client.set(self.KEY_PREFIX + jti, "1", nx=True, ex=int(ttl)))
+        except Exception:
+            logger.warning("Refresh token check failed in Redis; using the local store", exc_info=True)
+            return self._mark_local(jti, ttl)
+
+used_refresh_tokens = UsedRefreshTokens()
+
+def _profile_changed(user: User) -> bool:
+    state = inspect(user)
+    return any(state.attrs[column].history.has_changes() for column in CLAIM_COLUMNS + PROFILE_COLUMNS)
+
+@event.listens_for(Session, "before_flush")
+def _bump_profile_version(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, User) and _profile_changed(obj):
+            # Incremented by the database, so concurrent updates never share a version
+            obj.profile_version = User.profile_version + 1
+
+@event.listens_for(Session, "after_flush")
+def _collect_claim_changes(session, flush_context):
+    changed = session.info.setdefault("claims_changed", set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and _profile_changed(obj):
+            changed.add(obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_claims(session):
+    for user_id in session.info.pop("claims_changed", ()):
+        token_versions.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_claim_changes(session):
+    session.info.pop("claims_changed", None)
@@ -0,0 +1,111 @@
+import base64
+import hashlib
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from app.models.transaction import Transaction, TransactionStatus
+
+class TransactionHistoryService:
+    """Keyset-paginated transaction history with SQL-side summaries.
+
+    Pages are ordered newest first on ``(created_at, id)``; the cursor is the
+    last row of the previous page, so each page is an index range read on
+    ``(user_id, created_at)`` regardless of how deep the client has paged.
+    """
+
+    @staticmethod
+    def encode_cursor(transaction: Transaction) -> str:
+        raw = f"{transaction.created_at.isoformat()}|{transaction.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+        """Raises ValueError for a malformed cursor"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, transaction_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+            return datetime.fromisoformat(created_at), uuid.UUID(transaction_id)
+        except Exception as e:
+            raise ValueError("Invalid cursor") from e
+
+    @staticmethod
+    def summary(db: Session, user_id) -> dict:
+        """Totals for a user in one grouped query, plus the version used for the ETag"""
+        rows = db.query(
+            Transaction.status,
+            func.count(Transaction.id),
+            func.sum(Transaction.amount),
+            func.max(func.coalesce(Transaction.updated_at, Transaction.created_at))
+        ).filter(Transaction.user_id == user_id).group_by(Transaction.status).all()
+
+        by_status = {}
+        total_paid = 0.0
+        latest = None
+        for status, count, amount, changed_at in rows:
+            by_status[status.value if hasattr(status, "value") else status] = count
+            if status == TransactionStatus.SUCCESS:
+                total_paid = float(amount or 0)
+            if changed_at and (latest is None or changed_at > latest):
+                latest = changed_at
+
+        return {
+            "total_paid": total_paid,
+            "transaction_count": sum(by_status.values()),
+            "count_by_status": by_status,
+            "last_changed_at": latest.isoformat() if latest else None,
+        }
+
+    @staticmethod
+    def etag(user_id, summary: dict, *parts) -> str:
+        """Weak ETag over the user's latest change, counts per status, total paid and request parameters.
+
+        The counts per status move with every status change, including two in
+        the same second, which ``last_changed_at`` alone would not tell apart.
+        """
+        key = "|".join(str(p) for p in (
+            user_id, summary["last_changed_at"], summary["transaction_count"],
+            sorted(summary["count_by_status"].items()), summary["total_paid"], *parts
+        ))
+        return 'W/"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    @staticmethod
+    def page(
+        db: Session,
+        user_id,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Transaction], Optional[str]]:
+        """One page of transactions, newest first, and the cursor for the next one"""
+        query = db.query(Transaction).filter(Transaction.user_id == user_id)
+        if cursor:
+            created_at, transaction_id = TransactionHistoryService.decode_cursor(cursor)
+            query = query.filter(
+                tuple_(Transaction.created_at, Transaction.id) < tuple_(created_at, transaction_id)
+            )
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = TransactionHistoryService.encode_cursor(rows[-1])
+        return rows, next_cursor
+
+    @staticmethod
+    def serialize(transaction: Transaction) -> dict:
+        return {
+            "id": str(transaction.id),
+            "reference": transaction.reference,
+            "amount": float(transaction.amount),
+            "currency": transaction.currency,
+            "status": transaction.status.value if hasattr(transaction.status, "value") else transaction.status,
+            "plan_id": transaction.plan_id,
+            "payment_channel": transaction.payment_channel,
+            "paid_at": transaction.paid_at.isoformat() if transaction.paid_at else None,
+            "created_at": transaction.created_at.isoformat() if transaction.created_at else None
+        }
@@ -0,0 +1,29 @@
+from typing import Iterable, Optional
+from sqlalchemy import and_
+from sqlalchemy.orm import Query, Session
+from app.models.transaction import Transaction, TransactionReference
+
+class TransactionLookup:
+    """Find transactions by reference through ``transaction_references``.
+
+    The reference table is keyed on ``reference`` and holds each row's
+    ``(id, created_at)``, so the join reads one partition of
+    ``transactions`` instead of probing every month's index.
+    """
+
+    @staticmethod
+    def filter_references(query: Query, references: Iterable[str]) -> Query:
+        return query.join(
+            TransactionReference,
+            and_(
+                TransactionReference.transaction_id == Transaction.id,
+                TransactionReference.created_at == Transaction.created_at,
+            ),
+        ).filter(TransactionReference.reference.in_(list(references)))
+
+    @staticmethod
+    def by_reference(db: Session, reference: str, *options) -> Optional[Transaction]:
+        query = db.query(Transaction)
+        if options:
+            query = query.options(*options)
+        return TransactionLookup.filter_references(query, [reference]).first()
@@ -0,0 +1,179 @@
+"""Per-user API usage metering.
+
+Requests are counted in process memory per ``(user, UTC day, route)``. A
+background thread upserts the increments into ``usage_daily`` every
+``usage_flush_interval_seconds``, one multi-row ``INSERT .. ON CONFLICT``
+per flush, and the app's shutdown hook writes what is left.
+
+Quotas are checked against the day's persisted total, re-read at most every
+``usage_quota_refresh_seconds`` per user, plus this process's increments since
+then. Other workers' traffic is therefore seen with that delay: a user can
+overshoot a quota by at most the calls the other workers served in one refresh
+interval.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.dialect import upsert_insert
+from app.db.session import engine as default_engine
+from app.models.usage import UsageDaily
+
+logger = logging.getLogger(__name__)
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def seconds_until_reset() -> int:
+    """Seconds until the next UTC midnight, when daily quotas reset"""
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return max(int((midnight - now).total_seconds()), 1)
+
+class UsageMeter:
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        flush_interval: Optional[float] = None,
+        refresh_interval: Optional[float] = None
+    ):
+        self.engine = engine or default_engine
+        self.flush_interval = flush_interval if flush_interval is not None else settings.usage_flush_interval_seconds
+        self.refresh_interval = refresh_interval if refresh_interval is not None else settings.usage_quota_refresh_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Increments not yet written, per (user_id, day, route)
+        self._pending: Dict[Tuple, int] = defaultdict(int)
+        # Per (user_id, day): persisted total when last read, and when
+        self._persisted: Dict[Tuple, Tuple[int, float]] = {}
+        # Per (user_id, day): this process's increments since that read
+        self._local: Dict[Tuple, int] = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, user_id, route: str, count: int = 1):
+        day = utc_today()
+        with self._lock:
+            self._pending[(user_id, day, route)] += count
+            self._local[(user_id, day)] += count
+
+    def _read_total(self, user_id, day: date) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                func.coalesce(func.sum(UsageDaily.count), 0).select().where(
+                    UsageDaily.user_id == user_id, UsageDaily.day == day
+                )
+            ).scalar()
+
+    def used_today(self, user_id) -> int:
+        """Calls today across all workers, as far as this process can tell"""
+        day = utc_today()
+        key = (user_id, day)
+        with self._lock:
+            persisted = self._persisted.get(key)
+        if persisted is None or time.monotonic() - persisted[1] >= self.refresh_interval:
+            with self._lock:
+                # Unwritten increments are not in the table yet; keep counting them locally
+                unwritten = sum(n for (u, d, _), n in self._pending.items() if u == user_id and d == day)
+            total = self._read_total(user_id, day)
+            with self._lock:
+                self._persisted[key] = (total, time.monotonic())
+                self._local[key] = unwritten
+                persisted = self._persisted[key]
+        with self._lock:
+            return persisted[0] + self._local[key]
+
+    def _take(self) -> List[Dict]:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            # Drop quota state for past days
+            today = utc_today()
+            for key in [k for k in self._persisted if k[1] < today]:
+                self._persisted.pop(key, None)
+                self._local.pop(key, None)
+        # Sorted so concurrent flushes from several workers lock rows in the same order
+        return [
+            {"user_id": user_id, "day": day, "route": route, "count": count}
+            for (user_id, day, route), count in sorted(pending.items(), key=lambda item: (str(item[0][0]), item[0][1], item[0][2]))
+        ]
+
+    def _restore(self, rows: List[Dict]):
+        with self._lock:
+            for row in rows:
+                self._pending[(row["user_id"], row["day"], row["route"])] += row["count"]
+
+    def flush(self) -> int:
+        """Upsert every pending increment; returns the number of rows written"""
+        with self._flush_lock:
+            rows = self._take()
+            if not rows:
+                return 0
+            stmt = upsert_insert(self.engine, UsageDaily)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UsageDaily.user_id, UsageDaily.day, UsageDaily.route],
+                set_={"count": UsageDaily.count + stmt.excluded["count"]}
+            )
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(stmt, rows)
+            except Exception:
+                # Counts are kept and added to the next flush
+                self._restore(rows)
+                logger.exception("Could not write %d usage rows", len(rows))
+                return 0
+            return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-meter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+usage_meter = UsageMeter()
+
+class UsageService:
+    @staticmethod
+    def daily(db: Session, user_id, days: int = 7) -> List[Dict]:
+        """Per-day totals and route breakdown for the last ``days`` UTC days, newest first"""
+        since = utc_today() - timedelta(days=days - 1)
+        rows = db.query(UsageDaily.day, UsageDaily.route, UsageDaily.count).filter(
+            UsageDaily.user_id == user_id,
+            UsageDaily.day >= since
+        ).all()
+
+        by_day: Dict[date, Dict] = {}
+        for day, route, count in rows:
+            entry = by_day.setdefault(day, {"date": day.isoformat(), "total": 0, "routes": {}})
+            entry["total"] += count
+            entry["routes"][route] = count
+        return [by_day[day] for day in sorted(by_day, reverse=True)]
+
+    @staticmethod
+    def top_users(db: Session, day: date, limit: int = 50) -> List[Dict]:
+        """Heaviest users on a day"""
+        total = func.sum(UsageDaily.count).label("total")
+        rows = db.query(UsageDaily.user_id, total).filter(
+            UsageDaily.day == day
+        ).group_by(UsageDaily.user_id).order_by(total.desc()).limit(limit).all()
+        return [{"user_id": str(user_id), "total": int(count)} for user_id, count in rows]
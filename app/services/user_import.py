@@ -0,0 +1,313 @@
+"""Bulk user import from CSV or NDJSON.
+
+Rows are streamed, validated like ``/auth/register`` and written in batches of
+``user_import_batch_size``. Passwords are hashed in a process pool, and the
+next batch hashes while the previous one is written. On Postgres with
+psycopg2 a batch is ``COPY``'d into a temporary table and moved into
+``users`` with ``INSERT .. SELECT .. ON CONFLICT (email) DO NOTHING``; other
+drivers use one executemany ``INSERT .. ON CONFLICT DO NOTHING``.
+
+A bad row (invalid email, missing password, a value longer than its column,
+email already taken or repeated in the file) is reported with its line number
+and skipped; the rest of its batch is still written. If the database rejects
+a batch anyway, it is split in halves and retried until the rows at fault are
+found.
+
+    python -m app.services.user_import seats.csv
+    python -m app.services.user_import seats.ndjson --batch-size 5000
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.db.session import engine as default_engine
+from app.models.user import User
+from app.schemas.user import UserCreate
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+# (line number, validated row) or (line number, error)
+Record = Tuple[int, Optional[UserCreate], Optional[str]]
+
+_STAGE_TABLE = "user_import_stage"
+
+# Checked per row so an over-long value fails its own line, not its batch
+_MAX_LENGTHS = {
+    "email": User.__table__.c.email.type.length,
+    "full_name": User.__table__.c.full_name.type.length,
+}
+
+# Column defaults on User are applied by SQLAlchemy, not the database, so the
+# COPY path spells them out
+_COPY_INSERT = text(f"""
+    INSERT INTO users (
+        id, email, password_hash, full_name, subscription_tier,
+        is_active, is_verified, is_superuser, auto_renew, token_version
+    )
+    SELECT id, email, password_hash, full_name, 'FREE', true, false, false, true, 0
+    FROM {_STAGE_TABLE}
+    ON CONFLICT (email) DO NOTHING
+    RETURNING email
+""")
+
+def format_for(filename: str, content_type: Optional[str] = None) -> str:
+    """Guess the import format from a file name or Content-Type"""
+    if content_type:
+        if "csv" in content_type:
+            return "csv"
+        if "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+            return "ndjson"
+    if filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+def _describe(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[Record]:
+    """Validate rows one at a time; CSV needs a header with email and password"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}")
+
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        rows = ((reader.line_num, row) for row in reader)
+    else:
+        rows = ((number, line) for number, line in enumerate(lines, start=1) if line.strip())
+
+    for line, row in rows:
+        if fmt == "ndjson":
+            try:
+                row = json.loads(row)
+            except ValueError as e:
+                yield line, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line, None, "expected a JSON object"
+                continue
+        full_name = (row.get("full_name") or "").strip() or None
+        try:
+            user = UserCreate(email=(row.get("email") or "").strip(), password=row.get("password") or "", full_name=full_name)
+        except ValidationError as e:
+            yield line, None, _describe(e)
+            continue
+        if not user.password:
+            yield line, None, "password: required"
+            continue
+        too_long = next(
+            (field for field, limit in _MAX_LENGTHS.items() if len(getattr(user, field) or "") > limit), None
+        )
+        if too_long is not None:
+            yield line, None, f"{too_long}: at most {_MAX_LENGTHS[too_long]} characters"
+            continue
+        yield line, user, None
+
+class ImportReport:
+    def __init__(self, max_errors: Optional[int] = None):
+        self.max_errors = max_errors or settings.user_import_max_errors
+        self.total = 0
+        self.created = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.started = time.monotonic()
+
+    def error(self, line: int, email: Optional[str], reason: str, duplicate: bool = False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        # Counts stay exact; only the detail list is capped
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "email": email, "error": reason})
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.duplicates + self.failed > len(self.errors),
+            "seconds": round(time.monotonic() - self.started, 3)
+        }
+
+class UserImporter:
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        batch_size: Optional[int] = None,
+        hash_workers: Optional[int] = None
+    ):
+        self.engine = engine or default_engine
+        self.batch_size = batch_size or settings.user_import_batch_size
+        self.hash_workers = hash_workers or settings.user_import_hash_workers or os.cpu_count() or 1
+
+    def _pool(self) -> Executor:
+        # Spawned, not forked: the API process runs background threads that
+        # must not be copied mid-operation into the children
+        return ProcessPoolExecutor(
+            max_workers=self.hash_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _batches(self, records: Iterable[Record], report: ImportReport) -> Iterator[List[Tuple[int, UserCreate]]]:
+        seen: Set[str] = set()
+        batch: List[Tuple[int, UserCreate]] = []
+        for line, user, error in records:
+            report.total += 1
+            if error is not None:
+                report.error(line, None, error)
+                continue
+            if user.email in seen:
+                report.error(line, user.email, "duplicate email in file", duplicate=True)
+                continue
+            seen.add(user.email)
+            batch.append((line, user))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, records: Iterable[Record], report: Optional[ImportReport] = None) -> ImportReport:
+        report = report or ImportReport()
+        chunksize = max(1, self.batch_size // (self.hash_workers * 4))
+        with self._pool() as pool:
+            previous = None
+            for batch in self._batches(records, report):
+                # Executor.map submits the whole batch now, so it hashes while the previous batch is written
+                hashing = pool.map(get_password_hash, [user.password for _, user in batch], chunksize=chunksize)
+                if previous is not None:
+                    self._write(*previous, report)
+                previous = (batch, hashing)
+            if previous is not None:
+                self._write(*previous, report)
+        logger.info(
+            "User import: %d rows, %d created, %d duplicates, %d failed in %.2fs",
+            report.total, report.created, report.duplicates, report.failed, time.monotonic() - report.started
+        )
+        return report
+
+    def _write(self, batch: List[Tuple[int, UserCreate]], hashing: Iterable[str], report: ImportReport):
+        try:
+            rows = [
+                {"id": uuid.uuid4(), "email": user.email, "password_hash": password_hash, "full_name": user.full_name}
+                for (_, user), password_hash in zip(batch, hashing)
+            ]
+        except Exception as e:
+            logger.exception("Could not hash passwords for a batch of %d users", len(batch))
+            for line, user in batch:
+                report.error(line, user.email, f"batch failed: {type(e).__name__}")
+            return
+        self._write_rows(batch, rows, report)
+
+    def _write_rows(self, batch: List[Tuple[int, UserCreate]], rows: List[Dict], report: ImportReport):
+        """Insert ``rows`` in one transaction; if it fails, retry each half on its own"""
+        try:
+            with self.engine.begin() as conn:
+                inserted = self._copy(conn, rows) if self._can_copy(conn) else self._insert_many(conn, rows)
+        except Exception as e:
+            if len(batch) == 1:
+                line, user = batch[0]
+                logger.warning("Could not import line %d: %s", line, e)
+                report.error(line, user.email, f"insert failed: {type(e).__name__}")
+                return
+            logger.warning("Batch of %d users failed (%s); retrying in halves", len(batch), type(e).__name__)
+            middle = len(batch) // 2
+            self._write_rows(batch[:middle], rows[:middle], report)
+            self._write_rows(batch[middle:], rows[middle:], report)
+            return
+
+        report.created += len(inserted)
+        for line, user in batch:
+            if user.email not in inserted:
+                report.error(line, user.email, "email already registered", duplicate=True)
+
+    @staticmethod
+    def _can_copy(conn: Connection) -> bool:
+        return conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+
+    @staticmethod
+    def _copy(conn: Connection, rows: List[Dict]) -> Set[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow((row["id"], row["email"], row["password_hash"], row["full_name"]))
+        buffer.seek(0)
+
+        conn.execute(text(
+            f"CREATE TEMP TABLE {_STAGE_TABLE} "
+            "(id uuid, email varchar(255), password_hash varchar(255), full_name varchar(255)) "
+            "ON COMMIT DROP"
+        ))
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {_STAGE_TABLE} (id, email, password_hash, full_name) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return set(conn.execute(_COPY_INSERT).scalars())
+
+    @staticmethod
+    def _insert_many(conn: Connection, rows: List[Dict]) -> Set[str]:
+        dialect_insert = {"postgresql": pg_insert, "sqlite": sqlite_insert}.get(conn.dialect.name)
+        if dialect_insert is not None:
+            stmt = dialect_insert(User).on_conflict_do_nothing(index_elements=[User.email])
+        else:
+            # No ON CONFLICT; skip emails that already exist instead
+            existing = set(conn.execute(
+                select(User.email).where(User.email.in_([row["email"] for row in rows]))
+            ).scalars())
+            rows = [row for row in rows if row["email"] not in existing]
+            stmt = insert(User)
+        if not rows:
+            return set()
+        return set(conn.execute(stmt.returning(User.email), rows).scalars())
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV or NDJSON")
+    parser.add_argument("path", help="file to import, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="password hashing processes")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or format_for(args.path)
+    importer = UserImporter(batch_size=args.batch_size, hash_workers=args.workers)
+    if args.path == "-":
+        report = importer.run(read_records(sys.stdin, fmt))
+    else:
+        with open(args.path, newline="", encoding="utf-8-sig") as f:
+            report = importer.run(read_records(f, fmt))
+
+    json.dump(report.to_dict(), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""Paystack webhook handlers and the batch processor that runs them.
+
+Handlers register per event type and declare the rows they need (transaction
+references, user ids, user emails). :class:`WebhookProcessor` takes events
+in runs of consecutive events of one type. For a chunk of each run it loads
+every declared row in one query per table, runs the handlers against that
+prefetched state and commits the chunk once. Events are applied in input
+order. The HTTP endpoint is a batch of one; replaying a backlog goes through
+the same path with large chunks.
+
+Handlers may also declare an event key (the transaction reference, or
+Paystack's id for events without one). The processor records each key it has
+handled in ``processed_webhook_events`` in the same commit as the handler's
+changes, and answers a redelivery of that key with "Event already processed"
+without running the handler again.
+"""
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.webhook import ProcessedWebhookEvent
+from app.models.user import User
+from app.schemas.webhooks import ChargeSuccessEvent, InvoicePaymentFailedEvent, SubscriptionCreateEvent
+from app.services.outbox import OutboxService, PAYMENT_FAILED, user_payload
+from app.services.subscription import SubscriptionService
+from app.services.subscription_history import WEBHOOK, set_event_source
+from app.services.transactions import TransactionLookup
+from app.tasks.scheduler import schedule_subscription_deadlines
+
+logger = logging.getLogger(__name__)
+
+def _as_uuid(value) -> Optional[uuid.UUID]:
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return None
+
+class WebhookContext:
+    """Rows prefetched for a chunk of events, shared by its handlers"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.transactions: Dict[str, Transaction] = {}
+        self.users_by_id: Dict[uuid.UUID, User] = {}
+        self.users_by_email: Dict[str, User] = {}
+        # Users moved onto a plan; their deadlines are scheduled after the commit
+        self.activated: List[User] = []
+
+    def prefetch(self, references: Iterable[str], user_ids: Iterable, emails: Iterable[str]):
+        references = {r for r in references if r}
+        if references:
+            # Handlers write the payload side table too; load it with the rows
+            transactions = TransactionLookup.filter_references(
+                self.db.query(Transaction).options(selectinload(Transaction.payload)), references
+            )
+            for transaction in transactions:
+                self.transactions[transaction.reference] = transaction
+
+        ids = {_as_uuid(i) for i in user_ids} | {t.user_id for t in self.transactions.values()}
+        ids.discard(None)
+        emails = {e for e in emails if e}
+        if ids or emails:
+            for user in self.db.query(User).filter(or_(User.id.in_(ids), User.email.in_(emails))):
+                self.users_by_id[user.id] = user
+                self.users_by_email[user.email] = user
+
+    def transaction(self, reference: str) -> Optional[Transaction]:
+        return self.transactions.get(reference)
+
+    def add_transaction(self, transaction: Transaction):
+        self.db.add(transaction)
+        self.transactions[transaction.reference] = transaction
+
+    def user(self, user_id) -> Optional[User]:
+        return self.users_by_id.get(_as_uuid(user_id))
+
+    def user_by_email(self, email: Optional[str]) -> Optional[User]:
+        return self.users_by_email.get(email) if email else None
+
+@dataclass
+class WebhookHandler:
+    event: str
+    handle: Callable[[WebhookContext, object], Dict]
+    references: Optional[Callable[[object], Optional[str]]] = None
+    user_ids: Optional[Callable[[object], Optional[str]]] = None
+    emails: Optional[Callable[[object], Optional[str]]] = None
+    key: Optional[Callable[[object], Optional[str]]] = None
+
+class WebhookRegistry:
+    def __init__(self):
+        self._handlers: Dict[str, WebhookHandler] = {}
+
+    def register(self, event: str, references=None, user_ids=None, emails=None, key=None):
+        """Decorator registering ``fn(ctx, payload) -> dict`` for an event type"""
+        def decorator(fn):
+            self._handlers[event] = WebhookHandler(event, fn, references, user_ids, emails, key)
+            return fn
+        return decorator
+
+    def get(self, event: str) -> Optional[WebhookHandler]:
+        return self._handlers.get(event)
+
+    def events(self) -> List[str]:
+        return sorted(self._handlers)
+
+registry = WebhookRegistry()
+
+def _event_key(handler: WebhookHandler, payload) -> Optional[str]:
+    key = handler.key(payload) if handler.key else None
+    return str(key) if key not in (None, "") else None
+
+class WebhookProcessor:
+    def __init__(self, db: Session, handlers: WebhookRegistry = registry, chunk_size: int = 500,
+                 dry_run: bool = False):
+        self.db = db
+        self.handlers = handlers
+        set_event_source(db, WEBHOOK)
+        self.chunk_size = chunk_size
+        # Run the handlers but roll back instead of committing
+        self.dry_run = dry_run
+
+    def _processed(self, event: str, keys: Set[str]) -> Set[str]:
+        if not keys:
+            return set()
+        rows = self.db.query(ProcessedWebhookEvent.event_key).filter(
+            ProcessedWebhookEvent.event == event, ProcessedWebhookEvent.event_key.in_(keys)
+        )
+        return {key for (key,) in rows}
+
+    def _run_chunk(self, handler: WebhookHandler, payloads: Sequence) -> Tuple[List[Dict], List[User]]:
+        keys = [_event_key(handler, p) for p in payloads]
+        processed = self._processed(handler.event, {k for k in keys if k})
+        ctx = WebhookContext(self.db)
+        ctx.prefetch(
+            references=[handler.references(p) for p in payloads] if handler.references else (),
+            user_ids=[handler.user_ids(p) for p in payloads] if handler.user_ids else (),
+            emails=[handler.emails(p) for p in payloads] if handler.emails else (),
+        )
+        results = []
+        for payload, key in zip(payloads, keys):
+            if key is not None and key in processed:
+                results.append({"status": "success", "event": handler.event,
+                                "message": "Event already processed", "key": key})
+                continue
+            result = handler.handle(ctx, payload)
+            # Errors are not recorded, so a corrected redelivery still runs
+            if key is not None and result.get("status") != "error":
+                processed.add(key)
+                self.db.add(ProcessedWebhookEvent(event=handler.event, event_key=key))
+            results.append(result)
+        return results, ctx.activated
+
+    def process(self, payloads: Sequence) -> List[Dict]:
+        """Handle parsed events; returns one result per event, in input order.
+
+        Consecutive events of one type form a run, handled in chunks that are
+        each committed once, so events apply in input order. If a chunk fails
+        it is rolled back and retried event by event, so one bad event only
+        fails itself.
+        """
+        results: List[Optional[Dict]] = [None] * len(payloads)
+        runs = groupby(range(len(payloads)), key=lambda index: payloads[index].event)
+
+        for event, run in runs:
+            indexes = list(run)
+            handler = self.handlers.get(event)
+            if handler is None:
+                for index in indexes:
+                    results[index] = {"status": "ignored", "event": event}
+                continue
+
+            for start in range(0, len(indexes), self.chunk_size):
+                chunk = indexes[start:start + self.chunk_size]
+                try:
+                    chunk_results, activated = self._run_chunk(handler, [payloads[i] for i in chunk])
+                    self._commit(activated)
+                except Exception:
+                    self.db.rollback()
+                    logger.warning("Webhook chunk of %d %s events failed; retrying one by one",
+                                   len(chunk), event, exc_info=True)
+                    chunk_results = [self._process_one(handler, payloads[i]) for i in chunk]
+                for index, result in zip(chunk, chunk_results):
+                    results[index] = result
+        return results
+
+    def _commit(self, activated: Sequence[User] = ()):
+        if self.dry_run:
+            self.db.rollback()
+            return
+        self.db.commit()
+        for user in activated:
+            schedule_subscription_deadlines(user)
+
+    def _process_one(self, handler: WebhookHandler, payload) -> Dict:
+        try:
+            results, activated = self._run_chunk(handler, [payload])
+            self._commit(activated)
+            return results[0]
+        except Exception as e:
+            self.db.rollback()
+            logger.exception("Webhook %s failed", handler.event)
+            return {"status": "error", "event": handler.event, "message": str(e)}
+
+@registry.register(
+    "charge.success",
+    references=lambda p: p.data.reference,
+    user_ids=lambda p: p.data.metadata.get("user_id"),
+    key=lambda p: p.data.reference,
+)
+def handle_charge_success(ctx: WebhookContext, payload: ChargeSuccessEvent) -> Dict:
+    """Process successful payment"""
+    data = payload.data
+    reference = data.reference
+    metadata = data.metadata
+
+    if not reference:
+        return {"status": "error", "message": "No reference in webhook data"}
+
+    transaction = ctx.transaction(reference)
+    if transaction is not None and transaction.status == TransactionStatus.SUCCESS:
+        # Paystack retries deliveries; a settled reference is acknowledged as-is
+        return {
+            "status": "success",
+            "message": "Payment already processed",
+            "reference": reference,
+            "user_id": str(transaction.user_id),
+            "plan": transaction.plan_id
+        }
+
+    if transaction is None:
+        # Create transaction if not exists
+        user_id = _as_uuid(metadata.get("user_id"))
+        if not user_id:
+            return {"status": "error", "message": "No user_id in metadata"}
+
+        transaction = Transaction(
+            user_id=user_id,
+            reference=reference,
+            plan_id=metadata.get("plan_id") or "unknown",
+            amount=data.amount / 100,
+            currency=data.currency,
+            status=TransactionStatus.PENDING
+        )
+        ctx.add_transaction(transaction)
+
+    raw = data.model_dump(mode="json")
+    transaction.gateway_response = data.gateway_response
+    transaction.payload.raw_payload = json.dumps(raw)
+
+    # Same activation as /verify: tier, subscription window and outbox event
+    user = SubscriptionService.activate(ctx.db, transaction, raw, user=ctx.user(transaction.user_id))
+    if user:
+        ctx.activated.append(user)
+
+    return {
+        "status": "success",
+        "message": "Payment processed via webhook",
+        "reference": reference,
+        "user_id": str(transaction.user_id),
+        "plan": transaction.plan_id
+    }
+
+@registry.register("subscription.create")
+def handle_subscription_created(ctx: WebhookContext, payload: SubscriptionCreateEvent) -> Dict:
+    """Handle new subscription creation"""
+    return {"status": "success", "event": "subscription.create"}
+
+@registry.register(
+    "invoice.payment_failed",
+    emails=lambda p: p.data.customer.email,
+    # Invoices carry no transaction reference; Paystack's invoice id is stable across deliveries
+    key=lambda p: getattr(p.data, "reference", None) or getattr(p.data, "id", None)
+    or getattr(p.data, "invoice_code", None),
+)
+def handle_payment_failed(ctx: WebhookContext, payload: InvoicePaymentFailedEvent) -> Dict:
+    """Handle failed renewal payment"""
+    data = payload.data
+    email = data.customer.email
+
+    user = ctx.user_by_email(email)
+    if user:
+        # Delivered by the outbox dispatcher, not inside the webhook request
+        OutboxService.enqueue(ctx.db, PAYMENT_FAILED, user_payload(
+            user,
+            amount=data.amount / 100,
+            subscription_code=data.subscription.get("subscription_code"),
+            description=data.description
+        ))
+
+    return {"status": "success", "event": "invoice.payment_failed", "email": email}
@@ -0,0 +1,249 @@
+"""Replay Paystack webhook events from a file.
+
+Events go through :class:`WebhookProcessor`, the same handlers and batching
+as ``POST /webhooks/paystack``. Replaying is idempotent: an event already
+recorded as processed, or a reference that is already SUCCESS, is acknowledged
+and left alone, so the same file, or files that overlap, can be run again.
+
+Input is NDJSON with one webhook body (``{"event": ..., "data": ...}``) per
+line, or a Paystack transaction export: a JSON array or a ``/transaction``
+API page (``{"data": [...]}``) of transaction objects. Successful transactions
+in an export are replayed as ``charge.success``.
+
+The input is read in windows of ``workers * batch_size`` events. Each window
+is split across worker threads by user (resolved from the metadata user id,
+the transaction reference or the customer email, whichever the event has), so
+one user's events are applied in file order on one session. The window
+completes before the next one starts. After each
+window the offset of the next unprocessed event is written to
+``--checkpoint``, which a later run resumes from.
+
+    python -m app.services.webhook_replay events.ndjson --dry-run
+    python -m app.services.webhook_replay export.json --workers 8 --checkpoint replay.offset
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import uuid
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.schemas.webhooks import paystack_event_adapter
+from app.services.subscription_history import REPLAY, set_event_source
+from app.services.transactions import TransactionLookup
+from app.services.webhook_events import WebhookProcessor, _as_uuid
+
+logger = logging.getLogger(__name__)
+
+# (offset in the input, parsed event) or (offset, error)
+Record = Tuple[int, Optional[object], Optional[str]]
+
+# Handler results for events that had already been applied
+ALREADY_PROCESSED = ("Payment already processed", "Event already processed")
+
+def _as_event(obj) -> Dict:
+    """A webhook body, or an exported transaction wrapped as one"""
+    if isinstance(obj, dict) and "event" not in obj and "reference" in obj:
+        status = obj.get("status") or "unknown"
+        return {"event": "charge.success" if status == "success" else f"charge.{status}", "data": obj}
+    return obj
+
+def _objects(source: TextIO, fmt: str) -> Iterator[Tuple[Optional[object], Optional[str]]]:
+    if fmt == "json":
+        document = json.load(source)
+        items = document.get("data", []) if isinstance(document, dict) else document
+        for item in items:
+            yield item, None
+        return
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f"invalid JSON: {e}"
+
+def read_events(source: TextIO, fmt: str = "ndjson") -> Iterator[Record]:
+    for offset, (obj, error) in enumerate(_objects(source, fmt)):
+        if error is not None:
+            yield offset, None, error
+            continue
+        try:
+            yield offset, paystack_event_adapter.validate_python(_as_event(obj)), None
+        except ValidationError as e:
+            yield offset, None, f"invalid event: {e.errors()[0]['msg']}"
+
+def _identity(payload) -> Tuple[Optional[uuid.UUID], Optional[str], Optional[str]]:
+    """``(user_id, email, reference)`` as named by the event, where present"""
+    data = getattr(payload, "data", None)
+    metadata = getattr(data, "metadata", None)
+    user_id = _as_uuid(metadata.get("user_id")) if isinstance(metadata, dict) else None
+    customer = getattr(data, "customer", None)
+    return user_id, getattr(customer, "email", None), getattr(data, "reference", None)
+
+def partition_keys(db: Session, payloads: List) -> List[str]:
+    """One key per event: the id of the user it belongs to.
+
+    Charges name the user in their metadata, renewal failures only by
+    customer email, so both are resolved to ``users.id`` (two queries per
+    window) and a user's events share a key, and so are applied in file
+    order, whichever form they came in.
+    """
+    identities = [_identity(p) for p in payloads]
+    emails = {email for user_id, email, _ in identities if email and not user_id}
+    references = {reference for user_id, _, reference in identities if reference and not user_id}
+    by_email = dict(db.query(User.email, User.id).filter(User.email.in_(emails))) if emails else {}
+    by_reference = dict(TransactionLookup.filter_references(
+        db.query(Transaction.reference, Transaction.user_id), references
+    )) if references else {}
+
+    keys = []
+    for payload, (user_id, email, reference) in zip(payloads, identities):
+        user_id = user_id or by_reference.get(reference) or by_email.get(email)
+        keys.append(str(user_id) if user_id else email or reference or payload.event)
+    return keys
+
+class ReplayReport:
+    def __init__(self, start_offset: int = 0, max_errors: int = 100):
+        self.max_errors = max_errors
+        self.next_offset = start_offset
+        self.total = 0
+        self.statuses: Counter = Counter()
+        self.already_processed = 0
+        self.invalid = 0
+        self.errors: List[Dict] = []
+        self.started = time.monotonic()
+
+    def error(self, offset: int, message: str, event: Optional[str] = None):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"offset": offset, "event": event, "message": message})
+
+    def to_dict(self) -> Dict:
+        seconds = time.monotonic() - self.started
+        return {
+            "total": self.total,
+            "statuses": dict(self.statuses),
+            "already_processed": self.already_processed,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "next_offset": self.next_offset,
+            "seconds": round(seconds, 3),
+            "events_per_second": round(self.total / seconds, 1) if seconds else None
+        }
+
+class WebhookReplayer:
+    def __init__(self, workers: int = 4, batch_size: int = 500, dry_run: bool = False,
+                 session_factory: Callable = SessionLocal):
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.session_factory = session_factory
+
+    def _process(self, payloads: List) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            processor = WebhookProcessor(db, chunk_size=self.batch_size, dry_run=self.dry_run)
+            set_event_source(db, REPLAY)
+            return processor.process(payloads)
+        finally:
+            db.close()
+
+    def _partition_keys(self, payloads: List) -> List[str]:
+        if not payloads:
+            return []
+        db = self.session_factory()
+        try:
+            return partition_keys(db, payloads)
+        finally:
+            db.close()
+
+    def run(self, records: Iterable[Record], offset: int = 0,
+            checkpoint: Optional[Callable[[int], None]] = None) -> ReplayReport:
+        """Replay ``records`` from ``offset`` on; ``checkpoint`` gets the next offset after each window"""
+        report = ReplayReport(start_offset=offset)
+        records = islice(records, offset, None)
+        window_size = self.workers * self.batch_size
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="webhook-replay") as pool:
+            while True:
+                window = list(islice(records, window_size))
+                if not window:
+                    break
+
+                valid: List[Tuple[int, object]] = []
+                for record_offset, payload, error in window:
+                    report.total += 1
+                    if error is not None:
+                        report.invalid += 1
+                        report.error(record_offset, error)
+                        continue
+                    valid.append((record_offset, payload))
+
+                buckets: List[List[Tuple[int, object]]] = [[] for _ in range(self.workers)]
+                for entry, key in zip(valid, self._partition_keys([p for _, p in valid])):
+                    buckets[zlib.crc32(key.encode()) % self.workers].append(entry)
+
+                buckets = [b for b in buckets if b]
+                for bucket, results in zip(buckets, pool.map(self._process, [[p for _, p in b] for b in buckets])):
+                    for (record_offset, payload), result in zip(bucket, results):
+                        status = result.get("status", "unknown")
+                        report.statuses[status] += 1
+                        if result.get("message") in ALREADY_PROCESSED:
+                            report.already_processed += 1
+                        if status == "error":
+                            report.error(record_offset, result.get("message", ""), payload.event)
+
+                report.next_offset = window[-1][0] + 1
+                if checkpoint is not None:
+                    checkpoint(report.next_offset)
+                logger.info("Replayed up to offset %d (%.0f events/s)", report.next_offset,
+                            report.total / max(time.monotonic() - report.started, 1e-9))
+        return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay Paystack webhook events from NDJSON or a transaction export")
+    parser.add_argument("path", help="file to replay, or - for stdin")
+    parser.add_argument("--format", choices=("ndjson", "json"), help="default: json for .json files, else ndjson")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="run the handlers, then roll back")
+    parser.add_argument("--offset", type=int, default=None, help="skip this many events")
+    parser.add_argument("--checkpoint", help="file holding the next offset; read on start, written per window")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("json" if args.path.endswith(".json") else "ndjson")
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else None
+    offset = args.offset
+    if offset is None:
+        offset = int(checkpoint_path.read_text().strip() or 0) if checkpoint_path and checkpoint_path.exists() else 0
+
+    save = None
+    if checkpoint_path is not None and not args.dry_run:
+        save = lambda next_offset: checkpoint_path.write_text(f"{next_offset}\n")
+
+    replayer = WebhookReplayer(workers=args.workers, batch_size=args.batch_size, dry_run=args.dry_run)
+    if args.path == "-":
+        report = replayer.run(read_events(sys.stdin, fmt), offset=offset, checkpoint=save)
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            report = replayer.run(read_events(f, fmt), offset=offset, checkpoint=save)
+
+    json.dump({"dry_run": args.dry_run, **report.to_dict()}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if report.invalid or report.statuses.get("error") else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(main())
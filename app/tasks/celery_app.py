@@ -0,0 +1,98 @@
+"""Celery application and beat schedule.
+
+Worker:  celery -A app.tasks.celery_app worker --loglevel=info
+Beat:    celery -A app.tasks.celery_app beat --loglevel=info
+
+Logging goes through ``app.core.logs`` instead of Celery's own setup, and
+records emitted by a task carry its task id as ``request_id``.
+
+Set ``CELERY_EAGER=true`` to run every task inline with an in-memory broker
+and result backend (local development and tests, no Redis needed).
+"""
+from celery import Celery, signals
+from celery.schedules import crontab
+from app.core.config import settings
+from app.core.logs import configure_logging, request_id_var
+
+if settings.celery_eager:
+    broker_url = "memory://"
+    result_backend = "cache+memory://"
+else:
+    broker_url = settings.celery_broker_url or settings.redis_url
+    result_backend = settings.celery_result_backend or settings.redis_url
+
+celery_app = Celery(
+    "saas_subscription_api",
+    broker=broker_url,
+    backend=result_backend,
+    include=["app.tasks.celery_tasks"],
+)
+
+celery_app.conf.update(
+    task_always_eager=settings.celery_eager,
+    task_eager_propagates=settings.celery_eager,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    result_expires=3600,
+    timezone="UTC",
+    enable_utc=True,
+)
+
+celery_app.conf.beat_schedule = {
+    # Fires deadlines queued by the scheduler close to when they fall due
+    "process-due-deadlines": {
+        "task": "app.tasks.celery_tasks.process_due_deadlines",
+        "schedule": 5.0,
+    },
+    # Backstop sweeps in case the deadline queue lost entries
+    "sweep-expired-subscriptions": {
+        "task": "app.tasks.celery_tasks.sweep_expired_subscriptions",
+        "schedule": crontab(minute=15),
+    },
+    "reconcile-pending-transactions": {
+        "task": "app.tasks.celery_tasks.reconcile_pending_transactions",
+        "schedule": crontab(minute="*/15"),
+    },
+    "ensure-transaction-partitions": {
+        "task": "app.tasks.celery_tasks.ensure_transaction_partitions",
+        "schedule": crontab(hour=0, minute=30),
+    },
+    "sweep-expiring-notices": {
+        "task": "app.tasks.celery_tasks.sweep_expiring_notices",
+        "schedule": crontab(hour=8, minute=0),
+    },
+    # MRR, churn and cohort snapshots for the day that just ended
+    "snapshot-subscriptions": {
+        "task": "app.tasks.celery_tasks.snapshot_subscriptions",
+        "schedule": crontab(hour=0, minute=10),
+    },
+    # Emails and downstream calls queued in the outbox by subscription changes
+    "dispatch-outbox": {
+        "task": "app.tasks.celery_tasks.dispatch_outbox",
+        "schedule": 10.0,
+    },
+}
+
+@signals.setup_logging.connect
+def _setup_logging(loglevel=None, **kwargs):
+    # Connecting this signal stops Celery from configuring logging itself
+    configure_logging(level=loglevel)
+
+_task_request_ids = {}
+
+@signals.task_prerun.connect
+def _bind_task_id(task_id=None, **kwargs):
+    _task_request_ids[task_id] = request_id_var.set(task_id)
+
+@signals.task_postrun.connect
+def _unbind_task_id(task_id=None, **kwargs):
+    token = _task_request_ids.pop(task_id, None)
+    if token is not None:
+        try:
+            request_id_var.reset(token)
+        except ValueError:
+            # Set in another context (eager tasks called from async code)
+            request_id_var.set(None)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from celery import chord
+from app.core.config import settings
+from app.tasks.celery_app import celery_app
+from app.tasks import subscription_tasks
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+
+def _get_scheduler():
+    # One scheduler (and timing wheel) per worker process
+    global _scheduler
+    if _scheduler is None:
+        from app.tasks.scheduler import SubscriptionScheduler
+        _scheduler = SubscriptionScheduler()
+    return _scheduler
+
+@celery_app.task
+def process_due_deadlines() -> Dict[str, int]:
+    # Without Redis there is no deadline queue; the periodic sweeps do the work
+    from app.db.redis import get_redis
+    if get_redis() is None:
+        return {}
+    return _get_scheduler().run_due()
+
+@celery_app.task
+def expire_partition(index: int, count: int) -> Dict:
+    downgraded = subscription_tasks.check_expired_subscriptions(partition=(index, count))
+    return {"partition": index, "downgraded": downgraded}
+
+@celery_app.task
+def notify_partition(index: int, count: int, days_before: int) -> Dict:
+    stats = subscription_tasks.notify_expiring_subscriptions(
+        days_before=days_before, partition=(index, count)
+    )
+    return {"partition": index, **stats}
+
+@celery_app.task
+def report_sweep(results: List[Dict], kind: str) -> Dict:
+    """Chord callback: runs once every partition of a sweep has finished"""
+    summary = {"kind": kind, "partitions": len(results)}
+    for result in results:
+        for key, value in result.items():
+            if key != "partition" and isinstance(value, (int, float)):
+                summary[key] = summary.get(key, 0) + value
+    logger.info("Sweep complete: %s", summary)
+    return summary
+
+def _run_sweep(header, kind: str):
+    """Start the chord; returns the report_sweep result id, or the summary when eager.
+
+    Eager results are never stored in the result backend, so an id would be
+    useless with CELERY_EAGER; the chord has already run by then.
+    """
+    result = chord(header)(report_sweep.s(kind))
+    if celery_app.conf.task_always_eager:
+        return result.get(disable_sync_subtasks=False)
+    return result.id
+
+@celery_app.task
+def sweep_expired_subscriptions(partitions: Optional[int] = None):
+    """Fan the expiry sweep out over user-id ranges so workers share it"""
+    count = partitions or settings.sweep_partitions
+    header = [expire_partition.s(index, count) for index in range(count)]
+    return _run_sweep(header, "expire")
+
+@celery_app.task
+def sweep_expiring_notices(partitions: Optional[int] = None, days_before: Optional[int] = None):
+    count = partitions or settings.sweep_partitions
+    days_before = days_before or settings.expiry_notice_days
+    header = [notify_partition.s(index, count, days_before) for index in range(count)]
+    return _run_sweep(header, "notify")
+
+@celery_app.task
+def reconcile_pending_transactions() -> Dict:
+    from app.tasks.reconciliation import reconcile_pending_transactions as reconcile
+    return asyncio.run(reconcile())
+
+@celery_app.task
+def ensure_transaction_partitions(months_ahead: int = 3) -> int:
+    from app.db.partitions import ensure_transaction_partitions as ensure
+    return ensure(months_ahead)
+
+@celery_app.task
+def dispatch_outbox() -> Dict:
+    from app.tasks.outbox import dispatch_outbox as dispatch
+    return dispatch()
+
+@celery_app.task
+def snapshot_subscriptions(day: Optional[str] = None) -> Dict:
+    """Materialise subscription analytics for a UTC day (default yesterday)"""
+    from datetime import date, datetime, timedelta, timezone
+    from app.db.session import SessionLocal
+    from app.services.subscription_analytics import SnapshotService
+
+    target = date.fromisoformat(day) if day else datetime.now(timezone.utc).date() - timedelta(days=1)
+    db = SessionLocal()
+    try:
+        return SnapshotService.snapshot(db, target)
+    finally:
+        db.close()
@@ -0,0 +1,151 @@
+"""Batched outbox dispatcher.
+
+Each batch runs in three steps, and no transaction or row lock is held while
+sending:
+
+1. Claim: a short transaction selects due rows with ``FOR UPDATE SKIP
+   LOCKED``, moves their ``next_attempt_at`` forward by
+   ``outbox_lease_seconds`` and commits. Other workers skip them until that
+   lease runs out. If a worker dies mid-batch, its rows become due again
+   once the lease expires.
+2. Deliver: concurrently with a per-destination limit, outside any
+   transaction.
+3. Record: a second short transaction writes every outcome. It touches only
+   rows that still carry this batch's lease. If the lease ran out and
+   another worker re-claimed a row, that worker records its outcome.
+
+Failures are retried with exponential backoff until ``outbox_max_attempts``,
+after which the row is marked dead for inspection.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.outbox import OutboxEvent, OutboxStatus
+from app.services.outbox import OutboxDestination, get_destinations
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+def retry_delay(attempts: int) -> timedelta:
+    delay = timedelta(seconds=settings.outbox_retry_base_seconds * (2 ** max(attempts - 1, 0)))
+    return min(delay, MAX_RETRY_DELAY)
+
+async def _deliver_batch(
+    events: List[OutboxEvent],
+    destinations: Dict[str, OutboxDestination]
+) -> Dict[object, Optional[str]]:
+    """Deliver every event; returns ``{event id: error or None}``"""
+    semaphores = {
+        name: asyncio.Semaphore(max(destination.concurrency, 1))
+        for name, destination in destinations.items()
+    }
+    results: Dict[object, Optional[str]] = {}
+
+    async def _deliver(event: OutboxEvent):
+        destination = destinations.get(event.destination)
+        if destination is None:
+            results[event.id] = f"Destination {event.destination!r} is not configured"
+            return
+        async with semaphores[event.destination]:
+            try:
+                await destination.deliver(event, json.loads(event.payload))
+                results[event.id] = None
+            except Exception as e:
+                results[event.id] = f"{type(e).__name__}: {e}"
+
+    try:
+        await asyncio.gather(*(_deliver(event) for event in events))
+    finally:
+        for destination in destinations.values():
+            await destination.aclose()
+    return results
+
+def _claim(batch_size: int) -> Tuple[List[OutboxEvent], datetime]:
+    """Lease up to ``batch_size`` due rows; returns them detached, with the lease"""
+    # Attributes stay loaded after the commit, for delivery outside the session
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        now = datetime.now(timezone.utc)
+        lease_until = now + timedelta(seconds=settings.outbox_lease_seconds)
+        events = db.query(OutboxEvent).filter(
+            OutboxEvent.status == OutboxStatus.PENDING,
+            OutboxEvent.next_attempt_at <= now
+        ).order_by(OutboxEvent.next_attempt_at).limit(batch_size).with_for_update(
+            skip_locked=True
+        ).all()
+        for event in events:
+            event.next_attempt_at = lease_until
+        db.commit()
+        return events, lease_until
+    finally:
+        db.close()
+
+def _record(events: List[OutboxEvent], lease_until: datetime,
+            results: Dict[object, Optional[str]], stats: Dict):
+    db = SessionLocal()
+    try:
+        # Rows whose lease ran out may have been claimed (and delivered) again
+        leased = {
+            event.id: event for event in db.query(OutboxEvent).filter(
+                OutboxEvent.id.in_([event.id for event in events]),
+                OutboxEvent.status == OutboxStatus.PENDING,
+                OutboxEvent.next_attempt_at == lease_until
+            ).with_for_update()
+        }
+        if len(leased) < len(events):
+            logger.warning("%d outbox events outlived their lease; not recording their outcome",
+                           len(events) - len(leased))
+
+        now = datetime.now(timezone.utc)
+        for event in leased.values():
+            error = results.get(event.id, "Not delivered")
+            event.attempts += 1
+            if error is None:
+                event.status = OutboxStatus.SENT
+                event.sent_at = now
+                event.last_error = None
+                stats["sent"] += 1
+            elif event.attempts >= settings.outbox_max_attempts:
+                event.status = OutboxStatus.DEAD
+                event.last_error = error
+                stats["dead"] += 1
+                logger.error("Outbox event %s (%s -> %s) is dead: %s",
+                             event.id, event.event_type, event.destination, error)
+            else:
+                event.next_attempt_at = now + retry_delay(event.attempts)
+                event.last_error = error
+                stats["retried"] += 1
+        db.commit()
+    finally:
+        db.close()
+
+def dispatch_outbox(
+    batch_size: Optional[int] = None,
+    max_batches: int = 10,
+    destinations_factory=get_destinations
+) -> Dict:
+    """Drain due outbox rows, at most ``max_batches`` batches per call"""
+    batch_size = batch_size or settings.outbox_batch_size
+    stats = {"batches": 0, "sent": 0, "retried": 0, "dead": 0}
+    started = time.perf_counter()
+
+    for _ in range(max_batches):
+        events, lease_until = _claim(batch_size)
+        if not events:
+            break
+
+        results = asyncio.run(_deliver_batch(events, destinations_factory()))
+        _record(events, lease_until, results, stats)
+        stats["batches"] += 1
+
+        if len(events) < batch_size:
+            break
+
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return stats
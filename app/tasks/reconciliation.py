@@ -0,0 +1,150 @@
+"""Reconciliation of stale PENDING transactions.
+
+A transaction stays PENDING when the customer never reaches ``/verify`` and the
+webhook is lost. This job pages through old PENDING rows and verifies them
+against Paystack concurrently, applying the same activation logic as
+``verify_payment``.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import and_, or_
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.transaction import Transaction, TransactionStatus
+from app.services.paystack import PaystackService
+from app.services.subscription import SubscriptionService
+from app.services.subscription_history import RECONCILE, set_event_source
+from app.tasks.scheduler import schedule_subscription_deadlines
+
+logger = logging.getLogger(__name__)
+
+class RetryableError(Exception):
+    pass
+
+async def verify_with_backoff(
+    client: httpx.AsyncClient,
+    reference: str,
+    semaphore: asyncio.Semaphore,
+    retries: int = 3,
+    base_delay: float = 0.5,
+) -> Dict:
+    """Verify one reference, retrying rate limits, 5xx and network errors.
+
+    The semaphore is only held during the request, never while backing off.
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                response = await client.get(f"/transaction/verify/{reference}")
+            if response.status_code == 429 or response.status_code >= 500:
+                raise RetryableError(f"Paystack returned {response.status_code}")
+            return response.json()
+        except (httpx.TransportError, RetryableError):
+            if attempt == retries:
+                raise
+            delay = base_delay * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+def _is_missing(result: Dict) -> bool:
+    # Paystack answers unknown references with status=false and this message
+    return not result.get("status") and "not found" in (result.get("message") or "").lower()
+
+async def reconcile_pending_transactions(
+    older_than_minutes: Optional[int] = None,
+    abandon_after_hours: Optional[int] = None,
+    page_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, float]:
+    """Verify stale PENDING transactions against Paystack.
+
+    Returns counts per outcome plus throughput.
+    """
+    older_than = timedelta(minutes=older_than_minutes or settings.reconcile_after_minutes)
+    abandon_after = timedelta(hours=abandon_after_hours or settings.reconcile_abandon_after_hours)
+    page_size = page_size or settings.reconcile_page_size
+    semaphore = asyncio.Semaphore(concurrency or settings.reconcile_concurrency)
+
+    now = datetime.utcnow()
+    cutoff = now - older_than
+    abandon_cutoff = now - abandon_after
+    stats = {"checked": 0, "activated": 0, "failed": 0, "abandoned": 0, "pending": 0, "errors": 0}
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    set_event_source(db, RECONCILE)
+    try:
+        async with PaystackService.async_client(transport=transport) as client:
+            last_key = None
+            while True:
+                query = db.query(Transaction).filter(
+                    Transaction.status == TransactionStatus.PENDING,
+                    Transaction.created_at < cutoff
+                )
+                if last_key:
+                    # Keyset paging: rows we leave PENDING are not revisited
+                    query = query.filter(or_(
+                        Transaction.created_at > last_key[0],
+                        and_(Transaction.created_at == last_key[0], Transaction.id > last_key[1])
+                    ))
+                page: List[Transaction] = query.order_by(
+                    Transaction.created_at, Transaction.id
+                ).limit(page_size).all()
+                if not page:
+                    break
+                last_key = (page[-1].created_at, page[-1].id)
+
+                results = await asyncio.gather(
+                    *(verify_with_backoff(client, t.reference, semaphore) for t in page),
+                    return_exceptions=True
+                )
+
+                activated_users = []
+                for transaction, result in zip(page, results):
+                    stats["checked"] += 1
+                    if isinstance(result, BaseException):
+                        logger.warning("Could not verify %s: %s", transaction.reference, result)
+                        stats["errors"] += 1
+                        continue
+
+                    created_at = transaction.created_at.replace(tzinfo=None)
+                    if _is_missing(result):
+                        transaction.status = TransactionStatus.ABANDONED
+                    elif result.get("status"):
+                        user = SubscriptionService.apply_verification(db, transaction, result["data"])
+                        if user:
+                            activated_users.append(user)
+                        elif transaction.status == TransactionStatus.PENDING and created_at < abandon_cutoff:
+                            transaction.status = TransactionStatus.ABANDONED
+                    else:
+                        stats["errors"] += 1
+                        continue
+
+                    if transaction.status == TransactionStatus.SUCCESS:
+                        stats["activated"] += 1
+                    elif transaction.status == TransactionStatus.FAILED:
+                        stats["failed"] += 1
+                    elif transaction.status == TransactionStatus.ABANDONED:
+                        stats["abandoned"] += 1
+                    else:
+                        stats["pending"] += 1
+
+                db.commit()
+                for user in activated_users:
+                    schedule_subscription_deadlines(user)
+                db.expunge_all()
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["per_minute"] = round(stats["checked"] / elapsed * 60, 1) if elapsed else 0.0
+    logger.info("Reconciliation finished: %s", stats)
+    return stats
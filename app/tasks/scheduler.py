@@ -0,0 +1,282 @@
+"""Deadline scheduler for subscription expiry and expiry notices.
+
+Upcoming deadlines live in a Redis sorted set scored by due time, so finding
+what is due is a range read on the set instead of a scan over ``users``.
+Entries due within the next few minutes are pulled into an in-process timing
+wheel and fired close to their deadline.
+
+Run a scheduler loop with ``python -m app.tasks.scheduler``.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.db.session import SessionLocal
+from app.models.user import User, SubscriptionTier
+
+logger = logging.getLogger(__name__)
+
+EXPIRE = "expire"
+NOTIFY = "notify"
+
+def _timestamp(value: datetime) -> float:
+    # Naive datetimes in this codebase are UTC (datetime.utcnow())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+# Remove a member only if its score is still the one we saw, so a deadline
+# moved by a renewal is not claimed by a stale wheel entry.
+_CLAIM_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if score and tonumber(score) == tonumber(ARGV[2]) then
+    return redis.call('ZREM', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+class DeadlineQueue:
+    """Subscription deadlines in a Redis sorted set, keyed by ``<kind>:<user_id>``"""
+
+    KEY = "subscription:deadlines"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        if self.client is None:
+            raise RuntimeError("The deadline queue needs Redis; set REDIS_URL")
+        self._claim = self.client.register_script(_CLAIM_SCRIPT)
+
+    @staticmethod
+    def member(kind: str, user_id) -> str:
+        return f"{kind}:{user_id}"
+
+    @staticmethod
+    def parse_member(member: str) -> Tuple[str, str]:
+        kind, user_id = member.split(":", 1)
+        return kind, user_id
+
+    def schedule(self, kind: str, user_id, due_at: datetime, replace: bool = True):
+        """Queue a deadline; with ``replace=False`` an entry already queued is kept"""
+        self.client.zadd(self.KEY, {self.member(kind, user_id): _timestamp(due_at)}, nx=not replace)
+
+    def cancel(self, kind: str, user_id):
+        self.client.zrem(self.KEY, self.member(kind, user_id))
+
+    def due_before(self, until_ts: float, limit: int = 1000) -> List[Tuple[str, float]]:
+        """Entries due before ``until_ts``, oldest first (not removed)"""
+        return self.client.zrangebyscore(
+            self.KEY, "-inf", until_ts, start=0, num=limit, withscores=True
+        )
+
+    def claim(self, member: str, score: float) -> bool:
+        """Atomically take ownership of an entry; only one worker wins"""
+        return bool(self._claim(keys=[self.KEY], args=[member, score]))
+
+    def size(self) -> int:
+        return self.client.zcard(self.KEY)
+
+class TimingWheel:
+    """Hashed timing wheel for near-term deadlines.
+
+    ``slots * tick_seconds`` is the horizon; entries further out are refused
+    and stay in the :class:`DeadlineQueue` until a later refill.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 300, now: Optional[float] = None):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self._buckets: List[Dict[str, float]] = [dict() for _ in range(slots)]
+        self._index: Dict[str, int] = {}
+        self._current_tick = int((now if now is not None else time.time()) // tick_seconds)
+
+    @property
+    def horizon(self) -> float:
+        return self.tick_seconds * self.slots
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, member: str, due_ts: float) -> bool:
+        due_tick = int(due_ts // self.tick_seconds)
+        if due_tick - self._current_tick >= self.slots:
+            return False
+        # Overdue entries fire on the next advance
+        due_tick = max(due_tick, self._current_tick)
+
+        self.discard(member)
+        slot = due_tick % self.slots
+        self._buckets[slot][member] = due_ts
+        self._index[member] = slot
+        return True
+
+    def discard(self, member: str):
+        slot = self._index.pop(member, None)
+        if slot is not None:
+            self._buckets[slot].pop(member, None)
+
+    def advance(self, now: float) -> List[Tuple[str, float]]:
+        """Move the wheel to ``now`` and return the entries that fell due"""
+        target_tick = int(now // self.tick_seconds)
+        fired = []
+        # Never spin more than one full turn, even after a long pause
+        steps = min(target_tick - self._current_tick, self.slots - 1)
+        for offset in range(steps + 1):
+            bucket = self._buckets[(self._current_tick + offset) % self.slots]
+            if not bucket:
+                continue
+            for member, due_ts in list(bucket.items()):
+                if due_ts <= now:
+                    del bucket[member]
+                    del self._index[member]
+                    fired.append((member, due_ts))
+        self._current_tick = target_tick
+        return fired
+
+def schedule_subscription_deadlines(user: User, queue: Optional[DeadlineQueue] = None):
+    """Queue (or clear) the expiry and notice deadlines for a user.
+
+    Call after committing a change to the user's tier or subscription dates.
+    Failures are logged and swallowed: the periodic sweeps in
+    ``subscription_tasks`` remain the backstop.
+    """
+    try:
+        if queue is None:
+            client = get_redis()
+            if client is None:
+                return
+            queue = DeadlineQueue(client)
+        tier = getattr(user.subscription_tier, "value", user.subscription_tier)
+        if tier == SubscriptionTier.FREE.value or not user.subscription_end_date:
+            queue.cancel(EXPIRE, user.id)
+            queue.cancel(NOTIFY, user.id)
+            return
+
+        end_date = user.subscription_end_date
+        queue.schedule(EXPIRE, user.id, end_date)
+
+        notice_at = end_date - timedelta(days=settings.expiry_notice_days)
+        if _timestamp(notice_at) > time.time():
+            queue.schedule(NOTIFY, user.id, notice_at)
+        else:
+            queue.cancel(NOTIFY, user.id)
+    except Exception:
+        logger.warning("Could not schedule deadlines for user %s", user.id, exc_info=True)
+
+def backfill_deadlines(batch_size: int = 1000) -> int:
+    """Seed the deadline queue from ``users`` (first deploy, or after a Redis flush).
+
+    Raises RuntimeError without Redis, where there is no queue to seed.
+    """
+    queue = DeadlineQueue()
+    db = SessionLocal()
+    try:
+        count = 0
+        users = db.query(User).filter(
+            User.subscription_tier != SubscriptionTier.FREE,
+            User.subscription_end_date.isnot(None)
+        ).yield_per(batch_size)
+        for user in users:
+            schedule_subscription_deadlines(user, queue)
+            count += 1
+        return count
+    finally:
+        db.close()
+
+class SubscriptionScheduler:
+    """Moves due deadlines from Redis into a timing wheel and fires them"""
+
+    def __init__(self, queue: Optional[DeadlineQueue] = None, wheel: Optional[TimingWheel] = None):
+        self.queue = queue or DeadlineQueue()
+        self.wheel = wheel or TimingWheel(
+            tick_seconds=settings.scheduler_tick_seconds,
+            slots=settings.scheduler_wheel_slots,
+        )
+        self._last_refill = 0.0
+
+    def refill(self, now: Optional[float] = None, limit: int = 1000) -> int:
+        """Load deadlines that fall inside the wheel's horizon"""
+        now = now if now is not None else time.time()
+        added = 0
+        for member, score in self.queue.due_before(now + self.wheel.horizon, limit=limit):
+            if self.wheel.add(member, score):
+                added += 1
+        self._last_refill = now
+        return added
+
+    def run_due(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Fire everything due at ``now``; returns the number of users handled per kind"""
+        # Imported here to avoid a cycle with the task module
+        from app.tasks.subscription_tasks import expire_subscriptions, notify_subscriptions
+
+        now = now if now is not None else time.time()
+        if now - self._last_refill >= settings.scheduler_refill_seconds:
+            self.refill(now)
+
+        due = defaultdict(list)
+        for member, score in self.wheel.advance(now):
+            if self.queue.claim(member, score):
+                kind, user_id = DeadlineQueue.parse_member(member)
+                due[kind].append(user_id)
+
+        if not due:
+            return {}
+
+        fired_at = datetime.utcfromtimestamp(now)
+        db = SessionLocal()
+        try:
+            results = {}
+            if due[EXPIRE]:
+                results[EXPIRE] = expire_subscriptions(db, due[EXPIRE], now=fired_at)
+                self._requeue_renewing(db, due[EXPIRE], fired_at)
+            if due[NOTIFY]:
+                results[NOTIFY] = notify_subscriptions(db, due[NOTIFY], now=fired_at)
+            return results
+        except Exception:
+            # Put the claimed entries back so the next tick retries them
+            for kind, user_ids in due.items():
+                for user_id in user_ids:
+                    self.queue.client.zadd(
+                        DeadlineQueue.KEY, {DeadlineQueue.member(kind, user_id): now}
+                    )
+            raise
+        finally:
+            db.close()
+
+    def _requeue_renewing(self, db, user_ids: List[str], now: datetime):
+        """Keep a deadline for lapsed users that ``expire_subscriptions`` skipped.
+
+        Users still on auto-renew are left paid while the renewal charge is
+        due. Their claimed EXPIRE entry is queued again, so they are checked
+        later and expire once renewal is off. An entry queued meanwhile (a
+        renewal or a cancel) is kept.
+        """
+        renewing = db.query(User.id).filter(
+            User.id.in_(user_ids),
+            User.subscription_tier != SubscriptionTier.FREE,
+            User.subscription_end_date < now,
+            User.auto_renew == True
+        ).all()
+        recheck_at = now + timedelta(seconds=settings.scheduler_renewal_recheck_seconds)
+        for (user_id,) in renewing:
+            self.queue.schedule(EXPIRE, user_id, recheck_at, replace=False)
+
+    def run_forever(self, stop_event: Optional[threading.Event] = None):
+        stop_event = stop_event or threading.Event()
+        self.refill()
+        while not stop_event.is_set():
+            try:
+                results = self.run_due()
+                if results:
+                    logger.info("Scheduler fired %s", results)
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            stop_event.wait(self.wheel.tick_seconds)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    SubscriptionScheduler().run_forever()
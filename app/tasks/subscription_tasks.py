@@ -1,49 +1,245 @@
+import asyncio
+import logging
+import time
+import uuid
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import exists
+from sqlalchemy.orm import Query, Session
+from app.core.config import settings
+from app.db.dialect import upsert_insert
 from app.db.session import SessionLocal
+from app.models.notification import NotificationLog
 from app.models.user import User, SubscriptionTier
+from app.services.notifications import Notification, get_notification_sender, send_all
+from app.services.outbox import OutboxService, SUBSCRIPTION_DOWNGRADED, user_payload
+from app.services.subscription_history import EXPIRY, set_event_source
 
-def check_expired_subscriptions():
-    """Check and downgrade expired subscriptions"""
+logger = logging.getLogger(__name__)
+
+EXPIRY_NOTICE = "expiry_notice"
+
+# (index, count): the slice of the user-id space a partitioned sweep covers
+Partition = Tuple[int, int]
+
+def partition_bounds(index: int, count: int) -> Tuple[uuid.UUID, Optional[uuid.UUID]]:
+    """Split the UUID space into ``count`` equal ranges.
+
+    User ids are random UUID4s, so equal ranges hold roughly equal numbers of
+    users and each range is an index range scan on the primary key.
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Partition {index} out of range for {count} partitions")
+    step = (1 << 128) // count
+    lower = uuid.UUID(int=index * step)
+    upper = uuid.UUID(int=(index + 1) * step) if index < count - 1 else None
+    return lower, upper
+
+def _in_partition(query: Query, partition: Optional[Partition]) -> Query:
+    if partition is None:
+        return query
+    lower, upper = partition_bounds(*partition)
+    query = query.filter(User.id >= lower)
+    if upper is not None:
+        query = query.filter(User.id < upper)
+    return query
+
+def _downgrade(db: Session, user: User):
+    # Per-row detail is DEBUG (and sampled); sweeps log a summary per batch
+    logger.debug("Downgrading user %s from %s to free", user.id,
+                 getattr(user.subscription_tier, "value", user.subscription_tier),
+                 extra={"user_id": str(user.id)})
+    # Snapshot before the change so the notice names the plan that ended
+    payload = user_payload(user)
+    set_event_source(db, EXPIRY)
+    user.subscription_tier = SubscriptionTier.FREE
+    user.subscription_start_date = None
+    user.subscription_end_date = None
+    OutboxService.enqueue(db, SUBSCRIPTION_DOWNGRADED, payload)
+
+def _unnotified(query: Query) -> Query:
+    """Exclude users already noticed about their current end date"""
+    return query.filter(~exists().where(
+        NotificationLog.user_id == User.id,
+        NotificationLog.kind == EXPIRY_NOTICE,
+        NotificationLog.cycle_end == User.subscription_end_date
+    ))
+
+def expired_users_query(db: Session, now: datetime, partition: Optional[Partition] = None) -> Query:
+    """Users whose paid plan has lapsed without auto-renew, in id order"""
+    return _in_partition(db.query(User).filter(
+        User.subscription_tier != SubscriptionTier.FREE,
+        User.subscription_end_date < now,
+        User.auto_renew == False
+    ), partition).order_by(User.id)
+
+def expiring_users_query(db: Session, now: datetime, threshold: datetime,
+                         partition: Optional[Partition] = None) -> Query:
+    """Paid users ending between ``now`` and ``threshold`` not yet noticed, in id order"""
+    return _in_partition(_unnotified(db.query(User).filter(
+        User.subscription_tier != SubscriptionTier.FREE,
+        User.subscription_end_date <= threshold,
+        User.subscription_end_date > now
+    )), partition).order_by(User.id)
+
+def _expiry_notice(user: User, now: datetime) -> Notification:
+    end_date = user.subscription_end_date
+    days_left = max((end_date.replace(tzinfo=None) - now).days, 0)
+    tier = getattr(user.subscription_tier, "value", user.subscription_tier)
+    return Notification(
+        to=user.email,
+        subject=f"Your {tier} subscription expires in {days_left} days",
+        body=(
+            f"Hi {user.full_name or user.email},\n\n"
+            f"Your {tier} subscription ends on {end_date:%Y-%m-%d}. "
+            "Renew before then to keep your current plan."
+        ),
+        user_id=str(user.id),
+        kind=EXPIRY_NOTICE,
+        extra={"cycle_end": end_date},
+    )
+
+def _record_notices(db: Session, notifications: List[Notification]):
+    rows = [
+        {"user_id": uuid.UUID(n.user_id), "kind": n.kind, "cycle_end": n.extra["cycle_end"]}
+        for n in notifications
+    ]
+    # A concurrent run may have recorded the same notice
+    stmt = upsert_insert(db.get_bind(), NotificationLog).on_conflict_do_nothing(
+        index_elements=["user_id", "kind", "cycle_end"]
+    )
+    db.execute(stmt, rows)
+    db.commit()
+
+def _send_expiry_notices(db: Session, users: List[User], now: datetime, sender) -> Tuple[int, int]:
+    notifications = [_expiry_notice(user, now) for user in users]
+    sent, failed = asyncio.run(send_all(sender, notifications))
+    if sent:
+        _record_notices(db, sent)
+    return len(sent), len(failed)
+
+def expire_subscriptions(db: Session, user_ids: Iterable[str], now: datetime = None) -> int:
+    """Downgrade the given users if their paid subscription has really lapsed.
+
+    Used by the deadline scheduler, so only rows that are due get touched. The
+    row is re-checked here because a renewal may have moved the deadline after
+    it was queued.
+    """
+    now = now or datetime.utcnow()
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    expired_users = db.query(User).filter(
+        User.id.in_(user_ids),
+        User.subscription_tier != SubscriptionTier.FREE,
+        User.subscription_end_date < now,
+        User.auto_renew == False
+    ).all()
+
+    for user in expired_users:
+        _downgrade(db, user)
+
+    db.commit()
+    return len(expired_users)
+
+def notify_subscriptions(db: Session, user_ids: Iterable[str], now: datetime = None) -> int:
+    """Send expiry notices to the given users if they are still about to expire"""
+    now = now or datetime.utcnow()
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    expiring_users = _unnotified(db.query(User).filter(
+        User.id.in_(user_ids),
+        User.subscription_tier != SubscriptionTier.FREE,
+        User.subscription_end_date > now
+    )).all()
+
+    sent, _ = _send_expiry_notices(db, expiring_users, now, get_notification_sender())
+    return sent
+
+def check_expired_subscriptions(partition: Optional[Partition] = None, batch_size: int = None):
+    """Check and downgrade expired subscriptions
+
+    Full sweep kept as a backstop for the deadline scheduler (e.g. after the
+    Redis queue was flushed). Pass ``partition`` to sweep one id range only.
+    Users are read and committed in keyset batches of ``batch_size``.
+    """
+    batch_size = batch_size or settings.expiry_batch_size
+    started = time.perf_counter()
+    downgraded = 0
     db = SessionLocal()
     try:
         now = datetime.utcnow()
-        
+
         # Find users with expired paid subscriptions
-        expired_users = db.query(User).filter(
-            User.subscription_tier != SubscriptionTier.FREE,
-            User.subscription_end_date < now,
-            User.auto_renew == False  
-        ).all()
-        
-        for user in expired_users:
-            print(f"Downgrading user {user.email} from {user.subscription_tier} to free")
-            user.subscription_tier = SubscriptionTier.FREE
-            user.subscription_start_date = None
-            user.subscription_end_date = None
-        
-        db.commit()
-        return len(expired_users)
+        query = expired_users_query(db, now, partition)
+
+        last_id = None
+        while True:
+            batch_query = query.filter(User.id > last_id) if last_id else query
+            expired_users = batch_query.limit(batch_size).all()
+            if not expired_users:
+                break
+            last_id = expired_users[-1].id
+
+            for user in expired_users:
+                _downgrade(db, user)
+            db.commit()
+            db.expunge_all()
+
+            downgraded += len(expired_users)
+            logger.info("Downgraded %d expired subscriptions (%d so far)", len(expired_users), downgraded,
+                        extra={"batch": len(expired_users), "total": downgraded, "partition": partition})
     finally:
         db.close()
 
-def notify_expiring_subscriptions(days_before: int = 3):
-    """Notify users of upcoming expiration"""
+    logger.info("Expiry sweep finished: %d downgraded", downgraded,
+                extra={"downgraded": downgraded, "partition": partition,
+                       "elapsed_seconds": round(time.perf_counter() - started, 3)})
+    return downgraded
+
+def notify_expiring_subscriptions(days_before: int = 3, batch_size: int = None,
+                                  partition: Optional[Partition] = None) -> Dict[str, float]:
+    """Notify users of upcoming expiration
+
+    Candidates are streamed in keyset batches and sent with bounded
+    concurrency. Users already noticed for their current end date are skipped,
+    so a rerun only retries what failed.
+    """
+    batch_size = batch_size or settings.notification_batch_size
+    sender = get_notification_sender()
+    started = time.perf_counter()
+    stats = {"candidates": 0, "sent": 0, "failed": 0}
+
     db = SessionLocal()
     try:
-        threshold = datetime.utcnow() + timedelta(days=days_before)
-        
-        expiring_users = db.query(User).filter(
-            User.subscription_tier != SubscriptionTier.FREE,
-            User.subscription_end_date <= threshold,
-            User.subscription_end_date > datetime.utcnow()
-        ).all()
-        
-        for user in expiring_users:
-            days_left = (user.subscription_end_date - datetime.utcnow()).days
-            print(f"User {user.email} subscription expires in {days_left} days")
-            # TODO: Send email notification
-        
-        return len(expiring_users)
+        now = datetime.utcnow()
+        threshold = now + timedelta(days=days_before)
+
+        query = expiring_users_query(db, now, threshold, partition)
+
+        last_id = None
+        while True:
+            batch_query = query.filter(User.id > last_id) if last_id else query
+            users = batch_query.limit(batch_size).all()
+            if not users:
+                break
+            last_id = users[-1].id
+
+            sent, failed = _send_expiry_notices(db, users, now, sender)
+            stats["candidates"] += len(users)
+            stats["sent"] += sent
+            stats["failed"] += failed
+            db.expunge_all()
+            logger.info("Expiry notices batch: %d sent, %d failed", sent, failed,
+                        extra={"batch": len(users), "sent": sent, "failed": failed, "partition": partition})
     finally:
         db.close()
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["per_second"] = round(stats["sent"] / elapsed, 1) if elapsed else 0.0
+    logger.info("Expiry notices: %s", stats, extra={**stats, "partition": partition})
+    return stats
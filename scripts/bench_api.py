@@ -0,0 +1,95 @@
+"""Benchmark the API's own overhead, with no database server or Redis.
+
+Runs the app in process against in-memory SQLite (``DATABASE_URL=sqlite://``)
+and times authenticated requests through the full middleware and dependency
+stack. Network, Postgres and Redis latency are excluded, so changes in these
+numbers come from application code.
+
+Polled endpoints are also timed with ``If-None-Match`` set to their last
+ETag, the path a client that is polling for changes takes; ``queries`` is
+SQL statements per request.
+
+    python scripts/bench_api.py --requests 2000
+    python scripts/bench_api.py --requests 2000 --claims-tokens
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+ENDPOINTS = (
+    "/api/v1/subscriptions/plans",
+    "/api/v1/users/me",
+    "/api/v1/subscriptions/status",
+    "/api/v1/subscriptions/history",
+    "/api/v1/users/me/usage",
+    "/health/ready",
+)
+
+# Answered 304 while unchanged
+POLL_ENDPOINTS = (
+    "/api/v1/users/me",
+    "/api/v1/subscriptions/status",
+)
+
+def run(client, path, headers, requests, queries):
+    # Warm caches and lazy imports
+    for _ in range(10):
+        client.get(path, headers=headers)
+    timings = []
+    queries[0] = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        client.get(path, headers=headers)
+        timings.append((time.perf_counter() - request_started) * 1000)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    print(f"{path + (' (304)' if 'If-None-Match' in headers else ''):<40} "
+          f"{statistics.median(timings):>8.2f} {timings[int(len(timings) * 0.95) - 1]:>8.2f} "
+          f"{requests / elapsed:>8.0f} {queries[0] / requests:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--claims-tokens", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite://"
+    os.environ["REDIS_URL"] = ""
+    os.environ["CLAIMS_TOKENS"] = "true" if args.claims_tokens else "false"
+    # Access lines per request would interleave with the results
+    os.environ["LOG_LEVEL"] = "WARNING"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.db.session import engine
+    from app.main import app
+
+    with TestClient(app) as client:
+        credentials = {"email": "bench@example.com", "password": "bench-password"}
+        client.post("/api/v1/auth/register", json=credentials).raise_for_status()
+        login = client.post("/api/v1/auth/login", json=credentials)
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        queries = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count_query(*args):
+            queries[0] += 1
+
+        print(f"{'endpoint':<40} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8} {'queries':>8}")
+        for path in ENDPOINTS:
+            client.get(path, headers=headers).raise_for_status()
+            run(client, path, headers, args.requests, queries)
+        for path in POLL_ENDPOINTS:
+            etag = client.get(path, headers=headers).headers["ETag"]
+            run(client, path, {**headers, "If-None-Match": etag}, args.requests, queries)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark reconciliation against a fake Paystack.
+
+Seeds a throwaway SQLite database with stale PENDING transactions and
+reconciles them through an in-process fake of the verify endpoint that adds
+a fixed latency per call.
+
+    python scripts/bench_reconcile.py --transactions 5000 --latency-ms 150 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / "bench_reconcile.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["REDIS_URL"] = ""
+
+    import httpx
+    from app.db.base import Base
+    from app.db.session import engine, SessionLocal
+    from app.models import User, Transaction, TransactionStatus
+    from app.tasks.reconciliation import reconcile_pending_transactions
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    created_at = datetime.utcnow() - timedelta(hours=2)
+    db.bulk_insert_mappings(Transaction, [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user.id,
+            "reference": f"sub_bench_{i}",
+            "plan_id": "basic",
+            "amount": 5000,
+            "status": TransactionStatus.PENDING,
+            "created_at": created_at,
+        }
+        for i in range(args.transactions)
+    ])
+    db.commit()
+    db.close()
+
+    outcomes = ["success", "abandoned", "failed"]
+
+    async def fake_paystack(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(args.latency_ms / 1000)
+        reference = request.url.path.rsplit("/", 1)[-1]
+        status = outcomes[hash(reference) % len(outcomes)]
+        return httpx.Response(200, json={
+            "status": True,
+            "data": {"id": 1, "status": status, "channel": "card", "metadata": {}},
+        })
+
+    stats = asyncio.run(reconcile_pending_transactions(
+        page_size=args.page_size,
+        concurrency=args.concurrency,
+        transport=httpx.MockTransport(fake_paystack),
+    ))
+    print(stats)
+    print(f"{stats['per_minute']:.0f} references/minute "
+          f"({args.latency_ms:.0f} ms fake latency, concurrency {args.concurrency})")
+
+if __name__ == "__main__":
+    main()
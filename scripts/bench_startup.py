@@ -0,0 +1,107 @@
+"""Benchmark API cold start.
+
+Measures, over several fresh interpreter processes:
+
+* import: time to ``import app.main``
+* first response: time from launching uvicorn to the first 200 from /health
+* prestart (``--prestart``): ``python -m app.db.startup`` against DATABASE_URL,
+  which on an up-to-date database is the wait plus the revision check
+
+It also reports which of the lazily imported libraries were loaded by
+``import app.main``; the list should be empty.
+
+    python scripts/bench_startup.py --runs 10 --prestart
+"""
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+DEFERRED_MODULES = ("jose", "passlib", "requests", "httpx", "redis", "celery", "alembic")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"]
+
+def time_first_response(timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("uvicorn did not answer /health")
+    finally:
+        server.terminate()
+        server.wait()
+
+def time_prestart() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "app.db.startup"], cwd=ROOT, capture_output=True, check=True
+    )
+    return time.perf_counter() - started
+
+def report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    print(f"{label:<16} median {statistics.median(samples) * 1000:7.1f} ms   "
+          f"min {samples[0] * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms   (n={len(samples)})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--prestart", action="store_true",
+                        help="also time app.db.startup against DATABASE_URL")
+    args = parser.parse_args()
+
+    imports, loaded = [], set()
+    for _ in range(args.runs):
+        seconds, modules = time_import()
+        imports.append(seconds)
+        loaded.update(modules)
+    report("import", imports)
+    report("first response", [time_first_response() for _ in range(args.runs)])
+    if args.prestart:
+        report("prestart", [time_prestart() for _ in range(args.runs)])
+
+    if loaded:
+        print(f"Loaded at import (should be deferred): {', '.join(sorted(loaded))}")
+    else:
+        print("No deferred libraries loaded at import")
+
+if __name__ == "__main__":
+    main()
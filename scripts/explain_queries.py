@@ -0,0 +1,249 @@
+"""Fail if a hot query falls back to a sequential scan.
+
+Calls the endpoints in ``app/api/v1/admin.py`` and
+``app/api/v1/subscriptions.py`` and the sweeps' queries from
+``app/tasks/subscription_tasks.py`` against a migrated Postgres database
+(``DATABASE_URL``), records every SELECT they issue and reports any plan
+containing a Seq Scan. Nothing is copied from the endpoints, so a change to
+one is checked as written. Each call runs in a transaction that is rolled back.
+
+Statements are labelled ``<function> #<n>``, in the order the function
+issues them. Aggregates over a whole table are listed in ``FULL_SCAN_ALLOWED``.
+
+    alembic upgrade head
+    python scripts/explain_queries.py --seed 50000
+
+``--seed`` inserts N synthetic users (and 4N transactions) and ANALYZEs the
+tables first; use it on a scratch database only. Seq scans on relations with
+fewer than ``--min-rows`` rows (empty future partitions, small side tables)
+are ignored, as the planner rightly prefers them there, and so is a filterless
+Seq Scan straight under a Limit, which stops after the rows it returns.
+"""
+import argparse
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import HTTPException, Response
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.api.v1 import admin, subscriptions
+from app.db.session import engine
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import User
+from app.services.transaction_history import TransactionHistoryService
+from app.tasks import subscription_tasks
+
+# Whole-table aggregates, which read every row by design, with the reason
+FULL_SCAN_ALLOWED = {
+    "admin.get_dashboard_stats #1": "counts every user",
+    "admin.get_dashboard_stats #2": "counts active users; nearly every user is",
+    "admin.get_dashboard_stats #3": "counts verified users across the table",
+    "admin.get_dashboard_stats #4": "groups every user by tier",
+    "admin.get_dashboard_stats #5": "sums every successful transaction",
+    "admin.get_dashboard_stats #7": "counts every transaction",
+    "admin.get_dashboard_stats #8": "counts successful transactions; most are",
+    "admin.list_users #1": "counts every user",
+    "admin.list_transactions #1": "counts every transaction",
+    # Not aggregates: substring search has no index to use until pg_trgm is added
+    "admin.list_users search #1": "substring search",
+    "admin.list_users search #2": "substring search",
+}
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+def _ignore_http_errors(fn: Callable) -> Callable:
+    # A 404 for the placeholder id or reference still ran the lookup
+    def call(db: Session):
+        try:
+            fn(db)
+        except HTTPException:
+            pass
+    return call
+
+def build_checks(db: Session) -> List[Tuple[str, Callable[[Session], object]]]:
+    """(label, fn(db)) pairs calling the real endpoints and task queries"""
+    user = db.query(User).order_by(User.id).first()
+    user_id = user.id if user is not None else uuid.uuid4()
+    now = datetime.utcnow()
+    missing = "explain-queries-missing"
+    admin_args = {"current_admin": None}
+    return [
+        # admin.py
+        ("admin.get_dashboard_stats", lambda db: admin.get_dashboard_stats(db=db, **admin_args)),
+        ("admin.list_users", lambda db: admin.list_users(
+            skip=0, limit=100, subscription_tier=None, is_active=None, search=None, db=db, **admin_args)),
+        ("admin.list_users search", lambda db: admin.list_users(
+            skip=0, limit=100, subscription_tier=None, is_active=None, search="ab", db=db, **admin_args)),
+        ("admin.get_user_details", _ignore_http_errors(lambda db: admin.get_user_details(
+            user_id=str(user_id), limit=50, cursor=None, db=db, **admin_args))),
+        ("admin.list_transactions", lambda db: admin.list_transactions(
+            skip=0, limit=100, status=None, plan_id=None, db=db, **admin_args)),
+        ("admin.list_transactions by status", lambda db: admin.list_transactions(
+            skip=0, limit=100, status=TransactionStatus.FAILED, plan_id=None, db=db, **admin_args)),
+        ("admin.list_transactions by plan", lambda db: admin.list_transactions(
+            skip=0, limit=100, status=None, plan_id="enterprise", db=db, **admin_args)),
+        ("admin.get_transaction_details", _ignore_http_errors(lambda db: admin.get_transaction_details(
+            reference=missing, db=db, **admin_args))),
+        ("admin.get_revenue_report", lambda db: admin.get_revenue_report(
+            start_date=now - timedelta(days=90), end_date=None, db=db, **admin_args)),
+
+        # subscriptions.py
+        ("subscriptions.verify_payment", _ignore_http_errors(
+            lambda db: subscriptions.verify_payment(reference=missing, db=db))),
+        ("subscriptions.get_payment_history", lambda db: subscriptions.get_payment_history(
+            request=_request(), response=Response(), limit=50, cursor=None,
+            current_user=user or User(id=user_id), db=db)),
+        ("subscriptions.get_payment_history next page", lambda db: TransactionHistoryService.page(
+            db, user_id, 50, TransactionHistoryService.encode_cursor(Transaction(created_at=now, id=uuid.uuid4())))),
+
+        # subscription_tasks.py: the sweeps' first and keyset batches
+        ("subscription_tasks.check_expired_subscriptions", lambda db: (
+            subscription_tasks.expired_users_query(db, now).limit(500).all(),
+            subscription_tasks.expired_users_query(db, now).filter(User.id > user_id).limit(500).all(),
+        )),
+        ("subscription_tasks.check_expired_subscriptions partition", lambda db: (
+            subscription_tasks.expired_users_query(db, now, (3, 8)).limit(500).all()
+        )),
+        ("subscription_tasks.notify_expiring_subscriptions", lambda db: (
+            subscription_tasks.expiring_users_query(db, now, now + timedelta(days=3)).limit(500).all()
+        )),
+        ("subscription_tasks.expire_subscriptions",
+         lambda db: subscription_tasks.expire_subscriptions(db, [str(user_id)], now=datetime(1970, 1, 1))),
+    ]
+
+class StatementRecorder:
+    """Records the SELECTs issued on ``conn`` while active"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements: List[Tuple[str, object]] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.conn, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.conn, "before_cursor_execute", self._record)
+
+def collect(checks) -> List[Tuple[str, str, object]]:
+    """Run each check in a rolled-back transaction; returns (label, statement, parameters)"""
+    collected = []
+    for label, fn in checks:
+        with engine.connect() as conn:
+            outer = conn.begin()
+            # Commits inside the check only release a savepoint
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            try:
+                with StatementRecorder(conn) as recorder:
+                    fn(db)
+            finally:
+                db.close()
+                outer.rollback()
+        for number, (statement, parameters) in enumerate(recorder.statements, start=1):
+            collected.append((f"{label} #{number}", statement, parameters))
+    return collected
+
+def seq_scans(plan: dict, parent: dict = None):
+    """Yield relation names of every Seq Scan node in a JSON plan"""
+    if plan.get("Node Type") == "Seq Scan":
+        # A plain scan feeding a Limit reads only the rows it returns
+        if not (parent is not None and parent.get("Node Type") == "Limit" and "Filter" not in plan):
+            yield plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child, plan)
+
+def small_relations(conn, names, min_rows: int):
+    rows = conn.execute(
+        text("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(:names)"),
+        {"names": list(names)}
+    ).all()
+    return {name for name, tuples in rows if tuples < min_rows}
+
+def seed(conn, users: int):
+    conn.execute(text("""
+        INSERT INTO users (id, email, password_hash, subscription_tier, subscription_end_date,
+                           is_active, is_verified, is_superuser, auto_renew, created_at)
+        SELECT gen_random_uuid(), 'seed' || g || '@example.com', 'x',
+               (ARRAY['FREE','FREE','FREE','FREE','FREE','FREE','FREE','BASIC','PRO','ENTERPRISE'])[1 + g % 10]::subscriptiontier,
+               CASE WHEN g % 10 >= 7 THEN now() + (g % 60 - 30) * interval '1 day' END,
+               true, g % 2 = 0, false, g % 3 = 0, now() - (g % 365) * interval '1 day'
+        FROM generate_series(1, :users) g
+        ON CONFLICT (email) DO NOTHING
+    """), {"users": users})
+    conn.execute(text("SELECT ensure_transaction_partitions(1, (now() - interval '6 months')::date)"))
+    conn.execute(text("""
+        INSERT INTO transactions (id, user_id, reference, amount, currency, status, plan_id, created_at)
+        SELECT gen_random_uuid(), u.id, 'seed_' || u.id || '_' || g, 5000, 'NGN',
+               (ARRAY['SUCCESS','SUCCESS','SUCCESS','SUCCESS','SUCCESS','SUCCESS','SUCCESS','SUCCESS','FAILED','PENDING'])[1 + (g + abs(hashtext(u.email))) % 10]::transactionstatus,
+               (ARRAY['basic','pro','enterprise'])[1 + g % 3],
+               now() - ((g * 37 + abs(hashtext(u.email))) % 180) * interval '1 day'
+        FROM users u CROSS JOIN generate_series(1, 4) g
+        WHERE u.email LIKE 'seed%'
+        ON CONFLICT DO NOTHING
+    """))
+    conn.execute(text("ANALYZE users"))
+    conn.execute(text("ANALYZE transactions"))
+    conn.execute(text("ANALYZE notification_log"))
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN hot queries and fail on sequential scans")
+    parser.add_argument("--seed", type=int, default=0, help="insert N synthetic users first")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="ignore seq scans on relations smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("EXPLAIN checks need a Postgres DATABASE_URL")
+        return 2
+
+    if args.seed:
+        with engine.begin() as conn:
+            seed(conn, args.seed)
+
+    with Session(engine) as db:
+        checks = build_checks(db)
+    statements = collect(checks)
+
+    failures = []
+    with engine.connect() as conn:
+        for label, statement, parameters in statements:
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]["Plan"]
+            scanned = set(seq_scans(root))
+            scanned = sorted(scanned - small_relations(conn, scanned, args.min_rows))
+
+            if args.verbose:
+                print(f"--- {label}\n{statement}\n{json.dumps(root, indent=2)}")
+            if not scanned:
+                print(f"ok       {label}")
+            elif label in FULL_SCAN_ALLOWED:
+                print(f"allowed  {label}: seq scan on {', '.join(scanned)} ({FULL_SCAN_ALLOWED[label]})")
+            else:
+                print(f"FAIL     {label}: seq scan on {', '.join(scanned)}")
+                print(f"         {' '.join(statement.split())[:200]}")
+                failures.append(label)
+
+    if failures:
+        print(f"\n{len(failures)} queries fell back to a sequential scan")
+        return 1
+    print("\nAll hot queries use an index")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,12 @@
 #!/bin/bash
+set -e
 
 echo " Starting SaaS API..."
 
-# Wait for database to be ready
-sleep 5
-
-# Create tables if they don't exist
-echo " Creating database tables..."
-python init_db.py || echo " Tables may already exist"
+# Wait for the database and Redis (exponential backoff) and apply any
+# pending Alembic migrations; a no-op when the schema is already at head
+python -m app.db.startup
 
 # Start application
 echo "✅ Starting server..."
-uvicorn app.main:app --host 0.0.0.0 --port $PORT
+exec uvicorn app.main:app --host 0.0.0.0 --port $PORT
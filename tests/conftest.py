@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+# Settings are read on import: run against in-memory SQLite with no Redis
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["REDIS_URL"] = ""
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+@pytest.fixture
+def db():
+    """Session on a fresh SQLite schema, dropped afterwards"""
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+    from app.db.startup import create_sqlite_schema
+
+    create_sqlite_schema(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
@@ -0,0 +1,138 @@
+import pytest
+
+from app.core.circuit_breaker import Bulkhead, CircuitBreaker, DependencyUnavailable
+from app.services.paystack import PaystackService
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def make_breaker(clock, **overrides):
+    options = dict(
+        failure_rate=0.5, slow_call_seconds=1.0, slow_call_rate=0.5, minimum_calls=4,
+        window_seconds=60.0, open_seconds=30.0, half_open_calls=2, clock=clock,
+    )
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+def call(breaker, ok=True, duration=0.1):
+    breaker.record(breaker.before_call(), ok, duration)
+
+def trip(breaker):
+    for _ in range(breaker.minimum_calls):
+        call(breaker, ok=False)
+
+def test_opens_once_failure_rate_is_reached_over_minimum_calls(clock):
+    breaker = make_breaker(clock)
+    call(breaker, ok=False)
+    call(breaker, ok=False)
+    call(breaker, ok=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    call(breaker, ok=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_slow_calls_open_the_circuit(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        call(breaker, ok=True, duration=2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_outcomes_outside_the_window_are_forgotten(clock):
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        call(breaker, ok=False)
+    clock.advance(61)
+    call(breaker, ok=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_open_circuit_refuses_with_retry_after(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(10)
+    with pytest.raises(DependencyUnavailable) as refused:
+        breaker.before_call()
+    assert refused.value.retry_after == pytest.approx(20.0)
+    assert breaker.rejected == 1
+
+def test_half_open_allows_limited_probes_then_closes(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(30)
+    first, second = breaker.before_call(), breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(DependencyUnavailable):
+        breaker.before_call()
+    breaker.record(first, True, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(second, True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_failed_probe_reopens(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(30)
+    breaker.record(breaker.before_call(), False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.transitions["half_open->open"] == 1
+
+def test_call_started_while_closed_is_not_a_probe(clock):
+    breaker = make_breaker(clock)
+    straggler = breaker.before_call()
+    trip(breaker)
+    clock.advance(30)
+    probe = breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # Finishing during half-open neither reopens the circuit nor frees a probe slot
+    breaker.record(straggler, False, 5.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(DependencyUnavailable):
+        breaker.before_call()
+    breaker.record(probe, True, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+def test_cancelled_probe_frees_its_slot(clock):
+    breaker = make_breaker(clock, half_open_calls=1)
+    trip(breaker)
+    clock.advance(30)
+    breaker.cancel(breaker.before_call())
+    breaker.record(breaker.before_call(), True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_open_circuit_fails_fast_without_waiting_for_the_bulkhead(clock, monkeypatch):
+    breaker = make_breaker(clock)
+    bulkhead = Bulkhead("test", max_concurrent=1, max_wait_seconds=5.0)
+    monkeypatch.setattr(PaystackService, "breaker", breaker)
+    monkeypatch.setattr(PaystackService, "bulkhead", bulkhead)
+    trip(breaker)
+
+    with bulkhead:
+        with pytest.raises(DependencyUnavailable) as refused:
+            PaystackService.verify_transaction("ref_1")
+    assert refused.value.reason == "circuit open"
+    assert bulkhead.rejected == 0
+
+def test_bulkhead_refusal_returns_the_probe_permit(clock, monkeypatch):
+    breaker = make_breaker(clock, half_open_calls=1)
+    bulkhead = Bulkhead("test", max_concurrent=1, max_wait_seconds=0.0)
+    monkeypatch.setattr(PaystackService, "breaker", breaker)
+    monkeypatch.setattr(PaystackService, "bulkhead", bulkhead)
+    trip(breaker)
+    clock.advance(30)
+
+    with bulkhead:
+        with pytest.raises(DependencyUnavailable) as refused:
+            PaystackService.verify_transaction("ref_1")
+    assert refused.value.reason == "too many concurrent calls"
+    breaker.before_call()
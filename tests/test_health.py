@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import health
+from app.services.health import health_monitor
+
+class DownRedis:
+    def ping(self):
+        raise ConnectionError("Connection refused")
+
+@pytest.fixture
+def client(monkeypatch):
+    # Probe on every call instead of starting the background thread
+    monkeypatch.setattr(health_monitor, "_snapshot", None)
+    monkeypatch.setattr(health_monitor, "start", lambda: None)
+    return TestClient(app)
+
+def test_redis_outage_degrades_but_stays_ready(client, monkeypatch):
+    monkeypatch.setattr(health, "get_redis", lambda: DownRedis())
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["checks"]["redis"]["status"] == "error"
+
+def test_database_outage_fails_readiness(client, monkeypatch):
+    def down():
+        raise ConnectionError("could not connect to server")
+    monkeypatch.setattr(health_monitor, "_probe_database", down)
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
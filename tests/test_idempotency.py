@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services.idempotency import DONE, PENDING, IdempotencyStore
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_store(on_sleep=None):
+    """Store whose sleeps advance a fake clock and run ``on_sleep(store)`` instead of waiting"""
+    clock = FakeClock()
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+        if on_sleep is not None:
+            on_sleep(store)
+
+    store = IdempotencyStore(ttl=3600, lock_ttl=60, clock=clock, sleep=sleep)
+    return store, sleeps
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_first_request_claims_the_key():
+    store, sleeps = make_store()
+    assert run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0)) is None
+    assert store._local.get("u:k")["state"] == PENDING
+    assert sleeps == []
+
+def test_duplicate_waits_for_the_first_response():
+    polls = []
+
+    def finish_on_third_poll(store):
+        polls.append(1)
+        if len(polls) == 3:
+            store.complete("u:k", "fp", 201, [("content-type", "application/json")], b'{"id": 1}')
+
+    store, sleeps = make_store(finish_on_third_poll)
+    run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0))
+
+    record = run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0))
+    assert record["state"] == DONE
+    assert record["status"] == 201
+    assert len(sleeps) == 3
+
+def test_duplicate_gives_up_after_the_wait():
+    store, sleeps = make_store()
+    run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0))
+
+    record = run(store.claim_or_wait("u:k", "fp", wait_seconds=0.5))
+    assert record["state"] == PENDING
+    assert sum(sleeps) == pytest.approx(0.5)
+
+def test_different_request_with_same_key_is_returned_at_once():
+    store, sleeps = make_store()
+    run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0))
+
+    record = run(store.claim_or_wait("u:k", "other", wait_seconds=1.0))
+    assert record["fingerprint"] == "fp"
+    assert sleeps == []
+
+def test_released_key_can_be_claimed_again():
+    store, _ = make_store()
+    run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0))
+    store.release("u:k")
+    assert run(store.claim_or_wait("u:k", "fp", wait_seconds=1.0)) is None
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.notification import NotificationLog
+from app.models.user import SubscriptionTier, User
+from app.services.notifications import FileNotificationSender, Notification, NotificationSender, send_all
+from app.tasks import subscription_tasks
+from app.tasks.subscription_tasks import EXPIRY_NOTICE, notify_expiring_subscriptions
+
+@pytest.fixture
+def outbox_file(tmp_path, monkeypatch):
+    path = tmp_path / "notifications.log"
+    monkeypatch.setattr(settings, "notification_backend", "file")
+    monkeypatch.setattr(settings, "notification_file_path", str(path))
+    return path
+
+def sent_lines(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def add_user(db, email, ends_in, tier=SubscriptionTier.PRO):
+    user = User(
+        email=email, password_hash="x", subscription_tier=tier,
+        subscription_end_date=datetime.utcnow() + ends_in, auto_renew=True,
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+class FlakySender(NotificationSender):
+    """Fails for some recipients and tracks how many sends overlap"""
+
+    def __init__(self, failing):
+        self.failing = set(failing)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, notification):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+            if notification.to in self.failing:
+                raise ConnectionError("refused")
+        finally:
+            self.in_flight -= 1
+
+def test_send_all_writes_every_notification(tmp_path):
+    path = tmp_path / "out.log"
+    notifications = [Notification(to=f"u{i}@example.com", subject="hi", body="b", kind="test") for i in range(5)]
+
+    sent, failed = asyncio.run(send_all(FileNotificationSender(str(path)), notifications, concurrency=2))
+
+    assert len(sent) == 5 and failed == []
+    assert sorted(line["to"] for line in sent_lines(path)) == sorted(n.to for n in notifications)
+
+def test_send_all_bounds_concurrency_and_keeps_going_after_failures():
+    sender = FlakySender(failing={"u1@example.com", "u3@example.com"})
+    notifications = [Notification(to=f"u{i}@example.com", subject="hi", body="b") for i in range(6)]
+
+    sent, failed = asyncio.run(send_all(sender, notifications, concurrency=2))
+
+    assert sorted(n.to for n in failed) == ["u1@example.com", "u3@example.com"]
+    assert len(sent) == 4
+    assert sender.max_in_flight == 2
+
+def test_expiry_notices_are_sent_once_per_cycle(db, outbox_file):
+    user = add_user(db, "renewing@example.com", timedelta(days=2))
+    add_user(db, "later@example.com", timedelta(days=10))
+    add_user(db, "free@example.com", timedelta(days=1), tier=SubscriptionTier.FREE)
+
+    first = notify_expiring_subscriptions(days_before=3)
+    again = notify_expiring_subscriptions(days_before=3)
+
+    assert (first["sent"], again["candidates"]) == (1, 0)
+    assert [line["to"] for line in sent_lines(outbox_file)] == ["renewing@example.com"]
+    assert db.query(NotificationLog).filter_by(user_id=user.id, kind=EXPIRY_NOTICE).count() == 1
+
+    # A renewal moves the end date, which starts a new cycle
+    user.subscription_end_date = user.subscription_end_date + timedelta(hours=12)
+    db.commit()
+    renewed = notify_expiring_subscriptions(days_before=3)
+
+    assert renewed["sent"] == 1
+    assert db.query(NotificationLog).filter_by(user_id=user.id).count() == 2
+
+def test_recording_a_notice_twice_keeps_one_row(db):
+    user = add_user(db, "twice@example.com", timedelta(days=2))
+    notice = subscription_tasks._expiry_notice(user, datetime.utcnow())
+
+    subscription_tasks._record_notices(db, [notice])
+    subscription_tasks._record_notices(db, [notice])
+
+    assert db.query(NotificationLog).filter_by(user_id=user.id).count() == 1
+
+def test_failed_notices_are_retried_on_the_next_run(db, outbox_file, monkeypatch):
+    add_user(db, "ok@example.com", timedelta(days=1))
+    add_user(db, "down@example.com", timedelta(days=1))
+    monkeypatch.setattr(subscription_tasks, "get_notification_sender",
+                        lambda: FlakySender(failing={"down@example.com"}))
+
+    first = notify_expiring_subscriptions(days_before=3)
+    second = notify_expiring_subscriptions(days_before=3)
+
+    assert (first["sent"], first["failed"]) == (1, 1)
+    assert (second["candidates"], second["failed"]) == (1, 1)
+
+def test_candidates_are_read_in_keyset_batches(db, outbox_file, monkeypatch):
+    users = [add_user(db, f"batch{i}@example.com", timedelta(days=1)) for i in range(5)]
+    batches = []
+    send = subscription_tasks._send_expiry_notices
+
+    def recording_send(db, batch, now, sender):
+        batches.append([user.id for user in batch])
+        return send(db, batch, now, sender)
+
+    monkeypatch.setattr(subscription_tasks, "_send_expiry_notices", recording_send)
+    stats = notify_expiring_subscriptions(days_before=3, batch_size=2)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [user_id for batch in batches for user_id in batch] == sorted(user.id for user in users)
+    assert stats["candidates"] == stats["sent"] == 5
+    assert len(sent_lines(outbox_file)) == 5
+
+def test_sender_without_send_cannot_be_created():
+    class Incomplete(NotificationSender):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
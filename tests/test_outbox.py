@@ -0,0 +1,40 @@
+import pytest
+
+from app.models.outbox import OutboxEvent, OutboxStatus
+from app.services.outbox import EMAIL, OutboxDestination, OutboxService
+from app.tasks.outbox import dispatch_outbox
+
+class RecordingDestination(OutboxDestination):
+    name = EMAIL
+    concurrency = 2
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.delivered = []
+
+    async def deliver(self, event, payload):
+        if payload["email"] in self.failing:
+            raise ConnectionError("refused")
+        self.delivered.append(payload["email"])
+
+def test_destination_without_deliver_cannot_be_created():
+    class Incomplete(OutboxDestination):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_dispatch_records_sent_and_retried_events(db):
+    for email in ("ok@example.com", "down@example.com"):
+        OutboxService.enqueue(db, "subscription.activated", {"email": email})
+    db.commit()
+    destination = RecordingDestination(failing={"down@example.com"})
+
+    stats = dispatch_outbox(destinations_factory=lambda: {EMAIL: destination})
+
+    assert (stats["sent"], stats["retried"]) == (1, 1)
+    assert destination.delivered == ["ok@example.com"]
+    db.expire_all()
+    statuses = {event.status: event for event in db.query(OutboxEvent)}
+    assert statuses[OutboxStatus.SENT].attempts == 1
+    assert statuses[OutboxStatus.PENDING].last_error == "ConnectionError: refused"
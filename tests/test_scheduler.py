@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1 import subscriptions
+from app.core.config import settings
+from app.main import app
+from app.models.user import SubscriptionTier, User
+from app.services.auth import AuthService
+from app.tasks.celery_tasks import process_due_deadlines
+from app.tasks.scheduler import (
+    EXPIRE, DeadlineQueue, SubscriptionScheduler, TimingWheel, _timestamp, backfill_deadlines,
+    schedule_subscription_deadlines,
+)
+
+class MemoryQueue:
+    """DeadlineQueue's interface over a dict, in place of a Redis sorted set"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def schedule(self, kind, user_id, due_at, replace=True):
+        member = DeadlineQueue.member(kind, user_id)
+        if replace or member not in self.entries:
+            self.entries[member] = _timestamp(due_at)
+
+    def cancel(self, kind, user_id):
+        self.entries.pop(DeadlineQueue.member(kind, user_id), None)
+
+    def due_before(self, until_ts, limit=1000):
+        due = sorted((score, member) for member, score in self.entries.items() if score <= until_ts)
+        return [(member, score) for score, member in due[:limit]]
+
+    def claim(self, member, score):
+        if self.entries.get(member) != score:
+            return False
+        del self.entries[member]
+        return True
+
+def lapsed_user(db, auto_renew=True):
+    user = User(email="lapsed@example.com", password_hash="x", subscription_tier=SubscriptionTier.PRO,
+                subscription_end_date=datetime.utcnow() - timedelta(minutes=5), auto_renew=auto_renew)
+    db.add(user)
+    db.commit()
+    return user
+
+def test_deadline_tasks_without_redis():
+    assert process_due_deadlines.apply().get() == {}
+    with pytest.raises(RuntimeError, match="REDIS_URL"):
+        backfill_deadlines()
+
+def test_lapsed_auto_renew_user_keeps_a_deadline_and_expires_once_cancelled(db):
+    user = lapsed_user(db)
+    queue = MemoryQueue()
+    scheduler = SubscriptionScheduler(queue=queue, wheel=TimingWheel())
+    schedule_subscription_deadlines(user, queue)
+    member = DeadlineQueue.member(EXPIRE, user.id)
+
+    now = datetime.utcnow()
+    assert scheduler.run_due(_timestamp(now)) == {EXPIRE: 0}
+    assert queue.entries[member] == pytest.approx(_timestamp(now + timedelta(hours=1)), abs=1)
+
+    user.auto_renew = False
+    db.commit()
+    schedule_subscription_deadlines(user, queue)
+    # Picked up by the next refill of the wheel
+    later = _timestamp(now) + settings.scheduler_refill_seconds
+    assert scheduler.run_due(later) == {EXPIRE: 1}
+    assert member not in queue.entries
+    db.refresh(user)
+    assert user.subscription_tier == SubscriptionTier.FREE
+
+def test_cancel_reschedules_deadlines(db, monkeypatch):
+    user = lapsed_user(db)
+    scheduled = []
+    monkeypatch.setattr(subscriptions, "schedule_subscription_deadlines",
+                        lambda u: scheduled.append((u.id, u.auto_renew)))
+    token = AuthService.issue_tokens(user)["access_token"]
+
+    response = TestClient(app).post("/api/v1/subscriptions/cancel", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert scheduled == [(user.id, False)]
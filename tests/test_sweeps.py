@@ -0,0 +1,63 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.user import SubscriptionTier, User
+from app.tasks import subscription_tasks
+from app.tasks.celery_app import celery_app
+from app.tasks.celery_tasks import report_sweep, sweep_expired_subscriptions, sweep_expiring_notices
+
+PARTITIONS = 4
+
+@pytest.fixture
+def eager(monkeypatch):
+    monkeypatch.setitem(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setitem(celery_app.conf, "task_eager_propagates", True)
+
+def add_users(db, ends_in, auto_renew):
+    # One user at the start of each partition's id range
+    step = (1 << 128) // PARTITIONS
+    for index in range(PARTITIONS):
+        db.add(User(
+            id=uuid.UUID(int=index * step + 1), email=f"user{index}@example.com", password_hash="x",
+            subscription_tier=SubscriptionTier.BASIC, auto_renew=auto_renew,
+            subscription_end_date=datetime.utcnow() + ends_in,
+        ))
+    db.commit()
+
+def test_expiry_sweep_fans_out_and_sums_partitions(db, eager, monkeypatch):
+    add_users(db, timedelta(days=-1), auto_renew=False)
+    swept = []
+    check = subscription_tasks.check_expired_subscriptions
+
+    def recording_check(partition=None, batch_size=None):
+        swept.append(partition)
+        return check(partition=partition, batch_size=batch_size)
+
+    monkeypatch.setattr(subscription_tasks, "check_expired_subscriptions", recording_check)
+
+    summary = sweep_expired_subscriptions.delay(partitions=PARTITIONS).get()
+
+    assert sorted(swept) == [(index, PARTITIONS) for index in range(PARTITIONS)]
+    assert summary == {"kind": "expire", "partitions": PARTITIONS, "downgraded": PARTITIONS}
+    assert db.query(User).filter(User.subscription_tier == SubscriptionTier.FREE).count() == PARTITIONS
+
+def test_notice_sweep_sums_partition_stats(db, eager, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "notification_backend", "file")
+    monkeypatch.setattr(settings, "notification_file_path", str(tmp_path / "notifications.log"))
+    add_users(db, timedelta(days=1), auto_renew=True)
+
+    summary = sweep_expiring_notices.delay(partitions=PARTITIONS, days_before=3).get()
+
+    assert summary["partitions"] == PARTITIONS
+    assert (summary["candidates"], summary["sent"], summary["failed"]) == (PARTITIONS, PARTITIONS, 0)
+
+def test_report_sweep_sums_numbers_and_skips_partition_ids():
+    summary = report_sweep([
+        {"partition": 0, "sent": 2, "failed": 1, "elapsed_seconds": 0.5},
+        {"partition": 1, "sent": 3, "failed": 0, "elapsed_seconds": 0.25},
+    ], "notify")
+
+    assert summary == {"kind": "notify", "partitions": 2, "sent": 5, "failed": 1, "elapsed_seconds": 0.75}
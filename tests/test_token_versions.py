@@ -0,0 +1,36 @@
+from app.models.user import SubscriptionTier, User
+from app.services.token_versions import token_versions
+
+def add_user(db, email):
+    user = User(email=email, password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+def test_profile_change_bumps_the_cached_profile_version(db):
+    user = add_user(db, "profile@example.com")
+    assert token_versions.get(db, user.id)[2] == 0
+
+    user.full_name = "Ada"
+    db.commit()
+    assert token_versions.get(db, user.id)[2] == 1
+
+    user.subscription_tier = SubscriptionTier.PRO
+    db.commit()
+    assert token_versions.get(db, user.id)[2] == 2
+
+def test_unrelated_change_keeps_profile_version(db):
+    user = add_user(db, "login@example.com")
+
+    user.password_hash = "y"
+    db.commit()
+    db.refresh(user)
+    assert user.profile_version == 0
+
+def test_rolled_back_change_is_not_counted(db):
+    user = add_user(db, "rollback@example.com")
+
+    user.full_name = "Not saved"
+    db.flush()
+    db.rollback()
+    assert token_versions.get(db, user.id)[2] == 0
@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.plans import SUBSCRIPTION_PLANS
+from app.core.security import get_password_hash
+from app.main import app
+from app.models.user import SubscriptionTier, User
+from app.services.auth import AuthService
+from app.services.usage import usage_meter
+
+QUOTA = 3
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setitem(SUBSCRIPTION_PLANS["free"], "daily_api_quota", QUOTA)
+    return TestClient(app)
+
+@pytest.fixture
+def free_user(db):
+    user = User(email="free@example.com", password_hash=get_password_hash("secret123"),
+                subscription_tier=SubscriptionTier.FREE)
+    db.add(user)
+    db.commit()
+    return user
+
+def auth(user):
+    return {"Authorization": f"Bearer {AuthService.issue_tokens(user)['access_token']}"}
+
+def test_free_user_gets_429_once_the_quota_is_used(client, free_user):
+    headers = auth(free_user)
+    for _ in range(QUOTA):
+        assert client.get("/api/v1/access/account", headers=headers).status_code == 200
+
+    refused = client.get("/api/v1/access/account", headers=headers)
+
+    assert refused.status_code == 429
+    assert int(refused.headers["retry-after"]) > 0
+    # Refused calls are not counted
+    assert usage_meter.used_today(free_user.id) == QUOTA
+
+def test_billing_auth_and_profile_routes_are_not_counted(client, free_user):
+    headers = auth(free_user)
+    for _ in range(QUOTA):
+        client.get("/api/v1/access/account", headers=headers)
+
+    unmetered = [
+        client.get("/api/v1/users/me", headers=headers),
+        client.get("/api/v1/users/me/usage", headers=headers),
+        client.get("/api/v1/subscriptions/status", headers=headers),
+        client.get("/api/v1/subscriptions/history", headers=headers),
+        client.get("/api/v1/subscriptions/plans"),
+        client.post("/api/v1/auth/login", json={"email": "free@example.com", "password": "secret123"}),
+    ]
+
+    assert [response.status_code for response in unmetered] == [200] * len(unmetered)
+    assert usage_meter.used_today(free_user.id) == QUOTA
+    assert unmetered[1].json()["remaining_today"] == 0
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from app.services.webhook_events import WebhookProcessor, WebhookRegistry
+
+def recording_registry(calls):
+    registry = WebhookRegistry()
+    for event in ("charge.success", "invoice.payment_failed"):
+        @registry.register(event)
+        def handle(ctx, payload, event=event):
+            calls.append((event, payload.data))
+            return {"status": "success", "event": event}
+    return registry
+
+def event(name, data):
+    return SimpleNamespace(event=name, data=data)
+
+def test_events_are_applied_in_input_order(db):
+    calls = []
+    payloads = [
+        event("invoice.payment_failed", 1),
+        event("charge.success", 2),
+        event("charge.success", 3),
+        event("invoice.payment_failed", 4),
+        event("unknown.event", 5),
+        event("charge.success", 6),
+    ]
+
+    results = WebhookProcessor(db, handlers=recording_registry(calls), chunk_size=10).process(payloads)
+
+    assert [data for _, data in calls] == [1, 2, 3, 4, 6]
+    assert [r["status"] for r in results] == ["success"] * 4 + ["ignored", "success"]
+
+def test_each_chunk_of_a_run_is_committed_once(db, monkeypatch):
+    calls, commits = [], []
+    payloads = [event("charge.success", n) for n in range(5)] + [event("invoice.payment_failed", 5)]
+    processor = WebhookProcessor(db, handlers=recording_registry(calls), chunk_size=2)
+    monkeypatch.setattr(processor, "_commit", lambda activated=(): commits.append(len(calls)))
+
+    processor.process(payloads)
+
+    assert [data for _, data in calls] == list(range(6))
+    assert commits == [2, 4, 5, 6]